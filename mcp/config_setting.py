@@ -19,8 +19,41 @@ class Config:
     TWITTER_API_SECRET_KEY = os.getenv("TWITTER_API_SECRET_KEY")
     TWITTER_ACCESS_TOKEN = os.getenv("TWITTER_ACCESS_TOKEN")
     TWITTER_ACCESS_TOKEN_SECRET = os.getenv("TWITTER_ACCESS_TOKEN_SECRET")
+    TWITTER_API_BASE_URL = os.getenv("TWITTER_API_BASE_URL", "https://api.x.com/2")
+    TWITTER_MAX_WAIT = float(os.getenv("TWITTER_MAX_WAIT", 60))  # seconds a search may queue for the rate limit
+    TWEET_STREAM_SOURCE = os.getenv("TWEET_STREAM_SOURCE", "")  # "api", a replay file path, or empty to disable
+    TWEET_WATCH_LOCATIONS = os.getenv("TWEET_WATCH_LOCATIONS", "")  # comma-separated; default: catalog states, districts, towns
+    TWEET_COUNT_WINDOW = float(os.getenv("TWEET_COUNT_WINDOW", 6 * 3600))
+    TWEET_REPLAY_SPEED = float(os.getenv("TWEET_REPLAY_SPEED", 0))
+    TWEET_STORE_PATH = os.getenv("TWEET_STORE_PATH", str(Path(__file__).parent / "tweet_store.sqlite3"))
+    TWEET_POLL_INTERVAL = float(os.getenv("TWEET_POLL_INTERVAL", 0))  # seconds; 0 polls only on verification
+    TWEET_POLL_MAX_AGE = float(os.getenv("TWEET_POLL_MAX_AGE", 300))  # verification re-polls a location older than this
     AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY")
     AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
     WEATHER_LOCATION_KB_ID = os.getenv("WEATHER_LOCATION_KB_ID")
     ENDPOINT_NAME = os.getenv("ENDPOINT_NAME")
+    FLOOD_MODEL_BACKEND = os.getenv("FLOOD_MODEL_BACKEND", "sagemaker")  # "sagemaker" or "local"
+    LOCAL_FLOOD_MODEL_PATH = os.getenv("LOCAL_FLOOD_MODEL_PATH", str(Path(__file__).parent / "models" / "flood_classifier.npz"))
+    FORECAST_CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", 4096))  # 0 disables the prediction cache
+    FORECAST_CACHE_TTL = float(os.getenv("FORECAST_CACHE_TTL", 900))
+    FORECAST_CACHE_DECIMALS = int(os.getenv("FORECAST_CACHE_DECIMALS", 1))  # feature rounding for cache keys
+    FORECAST_VERSION_CHECK_INTERVAL = float(os.getenv("FORECAST_VERSION_CHECK_INTERVAL", 300))  # seconds; needs sagemaker:DescribeEndpoint(Config), 0 disables
+    BEDROCK_BATCH_ROLE_ARN = os.getenv("BEDROCK_BATCH_ROLE_ARN")
+    KB_BACKEND = os.getenv("KB_BACKEND", "bedrock")  # "bedrock" or "local"
+    LOCAL_KB_DIR = os.getenv("LOCAL_KB_DIR", str(Path(__file__).parent / "local_kb_index"))
+    LOCAL_KB_USE_ANN = os.getenv("LOCAL_KB_USE_ANN", "false").lower() == "true"
+    GEO_BOUNDARY_DIR = os.getenv("GEO_BOUNDARY_DIR", str(Path(__file__).parent.parent / "mocks"))
+    LOCATION_CACHE_PATH = os.getenv("LOCATION_CACHE_PATH", str(Path(__file__).parent / "location_cache.sqlite3"))
+    LOCATION_CACHE_TTL = int(os.getenv("LOCATION_CACHE_TTL", 7 * 24 * 3600))
+    WEATHER_STORE_PATH = os.getenv("WEATHER_STORE_PATH", str(Path(__file__).parent / "weather_store.sqlite3"))
+    WEATHER_REFRESH_INTERVAL = int(os.getenv("WEATHER_REFRESH_INTERVAL", 3600))
+    WEATHER_MAX_STALENESS = int(os.getenv("WEATHER_MAX_STALENESS", 6 * 3600))
+    HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 15))
+    HTTP_PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", 4))
+    FLOOD_WARNING_CACHE_TTL = float(os.getenv("FLOOD_WARNING_CACHE_TTL", 300))  # seconds between station-list fetches
+    FLOOD_ARCHIVE_DIR = os.getenv("FLOOD_ARCHIVE_DIR", str(Path(__file__).parent / "flood_warning_archive"))
+    WARNING_POLL_INTERVAL = float(os.getenv("WARNING_POLL_INTERVAL", 0))  # seconds; 0 disables the poller
+    WARNING_ALERT_MIN_LEVEL = os.getenv("WARNING_ALERT_MIN_LEVEL", "")  # e.g. "WARNING"; empty disables transition emails
+    FRI_OUTPUT_PATH = os.getenv("FRI_OUTPUT_PATH")  # where fri_sweep writes; unset requires --output
+    LOCATION_ALTITUDE_PATH = os.getenv("LOCATION_ALTITUDE_PATH")  # optional {location_id: metres} JSON
     BEDROCK_CONFIG = load_bedrock_config()
\ No newline at end of file
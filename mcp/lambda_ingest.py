@@ -12,6 +12,8 @@ async def lambda_handler(event, context):
     image_urls = body.get('image_urls')  # simple for demo; use presigned upload in prod
     user_id = body.get('user_id', 'anon')
     s3_bucket = body.get('s3_bucket', 'myselamat-user-posts')
+    lat, lon = body.get('lat'), body.get('lon', body.get('lng'))
+    coordinates = (lat, lon) if lat is not None and lon is not None else None
     report_id = str(uuid.uuid4())
     start_timestamp = int(time.time())
 
@@ -19,13 +21,14 @@ async def lambda_handler(event, context):
     await orchestrator.initialize()
     
     sample_text = "Pahang flooding is insane right now! 🌊 Stuck at Kota Bahru, water everywhere. Myvi vs flood = flood wins 😅 Community spirit strong though - everyone helping each other! Stay safe everyone! #PahangFloods #Malaysia #StaySafe"
-    flood_analysis = await orchestrator.process_flood_report(sample_text, image_files, image_urls, False, s3_bucket)
+    flood_analysis = await orchestrator.process_flood_report(sample_text, image_files, image_urls, False, s3_bucket, coordinates)
     print(f"   Result: {flood_analysis.get('status', 'unknown')}")
 
     end_timestamp = int(time.time())
     time_taken= end_timestamp - start_timestamp
 
     orchestrator.send_flood_email(flood_summary=flood_analysis.get('summary', 'No summary available'))
+    orchestrator.close()
     
     return {
         "statusCode": 200,
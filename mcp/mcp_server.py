@@ -27,12 +27,17 @@ from mcp.types import (
     TextContent,
     ImageContent,
     EmbeddedResource,
+    Resource,
 )
 
 # Import our existing modules
-from utils.orchestration.check_user_input import analyze_flood_post, classify_location, init_bedrock
-from utils.orchestration.tweet import search_tweets
+from utils.orchestration.check_user_input import analyze_flood_post, classify_location, init_bedrock, kb_retriever_stats
+from utils.orchestration.tweet import flood_query, search_tweets
+from utils.orchestration.tweet_stream import get_tweet_counts, get_tweet_stream, start_tweet_stream
 from utils.orchestration.weather import get_weather
+from utils.orchestration.flood_warning import get_flood_warnings
+from utils.orchestration.location_cache import get_location_cache
+from utils.orchestration.warning_transitions import get_warning_differ, start_warning_poller
 from config_setting import Config
 
 # Configure logging
@@ -59,6 +64,9 @@ async def initialize_services():
             Config.AWS_SECRET_ACCESS_KEY, 
             region_name=Config.BEDROCK_CONFIG["regions"]["N. Virginia"]
         )
+        logger.info(f"Location cache warmed with {get_location_cache().stats()['entries']} entries")
+        start_warning_poller()
+        start_tweet_stream()
         logger.info("Services initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize services: {e}")
@@ -322,17 +330,16 @@ async def handle_search_twitter(arguments: Dict[str, Any]) -> CallToolResult:
     location = arguments["location"]
     max_results = arguments.get("max_results", 10)
     
-    # Handle both single location string and list of locations
-    if isinstance(location, list):
-        # Create OR query for multiple locations
-        location_query = " OR ".join(location)
-        query = f'(banjir OR flood OR 水灾 OR natural disaster) ({location_query}) -is:retweet'
-    else:
-        # Single location
-        query = f'(banjir OR flood OR 水灾 OR natural disaster) {location} -is:retweet'
+    query = flood_query(location)
     
     try:
-        tweets = search_tweets(query, max_results)
+        if get_tweet_stream() is not None:
+            # Answer from the ingested stream instead of a search call
+            lookup = location if isinstance(location, list) else [location]
+            tweets = get_tweet_counts().search_result(lookup) or {"meta": {"result_count": 0}}
+        else:
+            # Searches can queue on the rate-limit scheduler; keep the event loop free
+            tweets = await asyncio.to_thread(search_tweets, query, max_results)
         return CallToolResult(
             content=[TextContent(type="text", text=json.dumps(tweets, indent=2))]
         )
@@ -362,41 +369,13 @@ async def handle_get_flood_warning(arguments: Dict[str, Any]) -> CallToolResult:
     locations = arguments["location"]
     
     try:
-        import requests
-        url = "https://api.data.gov.my/flood-warning"
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        flood_data = response.json()
-        
-        result = None
-        # Try from most specific (town) to broader (state)
-        for location in locations:
-            # Filter by station_name, district, or state
-            location_warnings = [
-                station for station in flood_data
-                if location.lower() in station.get("station_name", "").lower()
-                or location.lower() in station.get("station_id", "").lower()
-                or location.lower() in station.get("district", "").lower()
-                or location.lower() in station.get("state", "").lower()
-            ]
-
-            if location_warnings:  # Found match
-                location_warnings.sort(key=lambda x: x["date"])  # sort by date
-                print(f"✅ Found weather for '{location}'")
-                result = {
-                    "status": "success",
-                    "data": {
-                        "location": location,
-                        "matching_stations": location_warnings,
-                        "total_stations": len(flood_data),
-                        "matches_found": len(location_warnings)
-                    }
-                }
-                break
-
-        if result is None:
-            print(f"⚠️ None of the locations {locations} were found in API response.")
+        flood_warnings = get_flood_warnings(locations)
+        if flood_warnings is not None:
+            result = {
+                "status": "success",
+                "data": flood_warnings
+            }
+        else:
             result = {
                 "status": "error",
                 "error": "None of the locations were found in API response.",
@@ -539,6 +518,47 @@ def determine_severity_level(flood_data: Dict, twitter_data: Dict, flood_warning
     
     return severity
 
+WARNING_TRANSITIONS_URI = "flood://warnings/transitions"
+METRICS_URI = "flood://metrics"
+
+def service_metrics() -> Dict[str, Any]:
+    """Counters of the shared Bedrock services, for the metrics resource"""
+    return {
+        "structured_output": bedrock_handler.structured_stats.snapshot() if bedrock_handler else None,
+        "kb_retriever": kb_retriever_stats()
+    }
+
+@server.list_resources()
+async def handle_list_resources() -> List[Resource]:
+    """List readable resources"""
+    return [
+        Resource(
+            uri=WARNING_TRANSITIONS_URI,
+            name="Flood warning transitions",
+            description="Recent flood-warning station level changes (e.g. NORMAL -> ALERT), newest first",
+            mimeType="application/json"
+        ),
+        Resource(
+            uri=METRICS_URI,
+            name="Service metrics",
+            description="Structured-output parse outcomes and failure rate per tool, and KB retriever cache hits",
+            mimeType="application/json"
+        )
+    ]
+
+@server.read_resource()
+async def handle_read_resource(uri) -> str:
+    """Read a resource by URI"""
+    if str(uri) == WARNING_TRANSITIONS_URI:
+        events = [
+            {key: value for key, value in event.items() if key != "station"}
+            for event in get_warning_differ().recent_events()
+        ]
+        return json.dumps(events, indent=2)
+    if str(uri) == METRICS_URI:
+        return json.dumps(service_metrics(), indent=2)
+    raise ValueError(f"Unknown resource: {uri}")
+
 async def main():
     """Main entry point for the MCP server"""
     # Initialize services
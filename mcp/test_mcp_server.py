@@ -146,12 +146,300 @@ async def test_mcp_tools():
     
     print("\nNote: To test MCP tools directly, run the MCP server and use an MCP client.")
 
+async def test_structured_output_stats():
+    """Malformed toolUse responses count as parse failures in the reported rate"""
+    print("\n\n🧾 Testing Structured Output Stats")
+    print("=" * 40)
+
+    from utils.aws_client import BedrockHandler
+    from utils.orchestration.check_user_input import FLOOD_ANALYSIS_TOOL
+
+    handler = BedrockHandler(None, "amazon.nova-lite-v1:0", {}, "test-key", "test-secret")
+
+    def response(*content):
+        return {"output": {"message": {"role": "assistant", "content": list(content)}}}
+
+    analysis = {"is_flood": True, "summary": "Flooded road", "location": "Kota Bharu", "severity": "minor", "confidence": 0.9}
+    good = response({"toolUse": {"toolUseId": "1", "name": FLOOD_ANALYSIS_TOOL, "input": analysis}})
+    malformed = response({"toolUse": {"toolUseId": "2", "name": FLOOD_ANALYSIS_TOOL, "input": "{\"is_flood\": tru"}})
+
+    assert handler.extract_structured(good, FLOOD_ANALYSIS_TOOL) == analysis
+    assert handler.extract_structured(malformed, FLOOD_ANALYSIS_TOOL) is None
+    assert handler.extract_structured({"output": {}}, FLOOD_ANALYSIS_TOOL) is None
+
+    snapshot = handler.structured_stats.snapshot()
+    print(f"   {handler.structured_stats.summary()}")
+    assert snapshot["tools"][FLOOD_ANALYSIS_TOOL]["failure"] == 2
+    assert snapshot["tools"][FLOOD_ANALYSIS_TOOL]["tool_use"] == 1
+    assert abs(snapshot["parse_failure_rate"] - 2 / 3) < 1e-9
+
+async def test_transition_alert_emails():
+    """One alert email per escalating warning snapshot, through a fake Bedrock and SES"""
+    print("\n\n📧 Testing Transition Alert Emails")
+    print("=" * 40)
+
+    from utils.aws_client import BedrockHandler
+    from utils.orchestration.send_email import ALERT_EMAIL_TOOL, TransitionAlertSender
+    from utils.orchestration.warning_transitions import WarningTransitionDiffer
+
+    class FakeBedrock:
+        def __init__(self):
+            self.requests = []
+
+        def converse(self, **request):
+            self.requests.append(request)
+            summary = json.loads(request["messages"][0]["content"][-1]["text"])
+            email = {"subject": f"Flood {summary['severity']}: {summary['location']}", "body_html": f"<p>{summary['summary']}</p>"}
+            return {"output": {"message": {"role": "assistant", "content": [
+                {"toolUse": {"toolUseId": "1", "name": ALERT_EMAIL_TOOL, "input": email}}
+            ]}}}
+
+    class FakeSES:
+        def __init__(self):
+            self.sent = []
+
+        def send_email(self, email_content: dict) -> bool:
+            self.sent.append(email_content)
+            return True
+
+    def snapshot(**levels):
+        return [
+            {"station_id": station_id, "station_name": f"Station {station_id}", "district": "Kuala Krai",
+             "state": "Kelantan", "water_level_indicator": level}
+            for station_id, level in levels.items()
+        ]
+
+    bedrock, ses = FakeBedrock(), FakeSES()
+    sender = TransitionAlertSender(BedrockHandler(bedrock, "amazon.nova-lite-v1:0", {}, "test-key", "test-secret"), ses, "WARNING")
+    differ = WarningTransitionDiffer()
+    differ.subscribe_snapshot(sender)
+
+    differ.update(snapshot(A="NORMAL", B="NORMAL", C="NORMAL"))   # seeds levels
+    differ.update(snapshot(A="WARNING", B="DANGER", C="ALERT"))   # two escalations: one email
+    differ.update(snapshot(A="WARNING", B="WARNING", C="NORMAL")) # only de-escalations
+    differ.update(snapshot(A="DANGER", B="WARNING", C="NORMAL"))  # one escalation: one email
+    sender.queue.join()
+
+    print(f"   Sent {len(ses.sent)} emails: {[email['subject'] for email in ses.sent]}")
+    assert len(ses.sent) == sender.sent == 2 and len(bedrock.requests) == 2
+    assert "Station A" in ses.sent[0]["subject"] and "Station B" in ses.sent[0]["subject"]
+    assert ses.sent[0]["subject"].startswith("Flood danger") and "Station C" not in ses.sent[0]["subject"]
+
+    # A model that cannot be parsed still gets the fallback template out
+    bedrock.converse = lambda **request: {"output": {"message": {"content": [{"text": "not json"}]}}}
+    differ.update(snapshot(A="DANGER", B="DANGER", C="NORMAL"))
+    sender.queue.join()
+    assert len(ses.sent) == 3 and ses.sent[2]["subject"].startswith("Flood Alert:")
+
+async def test_local_inference_parity():
+    """Check the local flood model loader and parity check, then the endpoint if a real model is present"""
+    print("\n\n⚖️ Testing Local Inference Parity")
+    print("=" * 40)
+
+    import tempfile
+    import numpy as np
+    from config_setting import Config
+    from utils.orchestration.local_inference import (
+        ACTIVATIONS, LocalFloodModel, benchmark, check_parity, sample_rows, write_fixture_model
+    )
+    from utils.orchestration.ml_inference import FloodForecastClient, ForecastBackend
+
+    class ReferenceModel(ForecastBackend):
+        """The same network evaluated one row at a time, straight from the weight file"""
+
+        def __init__(self, path, offset=0.0):
+            weights = np.load(path)
+            self.weights = {name: weights[name] for name in weights.files}
+            self.offset = offset
+
+        def predict_proba(self, rows):
+            w = self.weights
+            probabilities = []
+            for row in rows:
+                x = (np.asarray(row) - w["mean"]) / w["scale"]
+                for i, name in enumerate(w["activations"]):
+                    x = ACTIVATIONS[str(name)](x @ w[f"W{i}"] + w[f"b{i}"])
+                probabilities.append(float(x[0]) + self.offset)
+            return probabilities
+
+    rows = sample_rows(200, seed=1).tolist()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "flood_fixture.npz")
+        write_fixture_model(path)
+        local = LocalFloodModel.from_file(path)
+
+        parity = check_parity(local, ReferenceModel(path), rows)
+        print(f"   Fixture parity: {parity}")
+        assert parity["passed"] and parity["rows"] == len(rows), "Vectorized model diverges from the reference"
+        labels = np.asarray(local.predict_proba(rows)) > local.threshold
+        assert labels.any() and not labels.all(), "Fixture should predict both labels"
+
+        drifted = check_parity(local, ReferenceModel(path, offset=0.05), rows)
+        assert not drifted["passed"] and drifted["label_mismatches"] > 0, "Parity check missed a drifted model"
+        print(f"   Local: {benchmark(local, rows)}")
+
+    if not Path(Config.LOCAL_FLOOD_MODEL_PATH).exists() or not Config.ENDPOINT_NAME:
+        print(f"   Endpoint parity skipped: no exported model at {Config.LOCAL_FLOOD_MODEL_PATH}")
+        return
+
+    local = LocalFloodModel.from_file(Config.LOCAL_FLOOD_MODEL_PATH)
+    remote = FloodForecastClient(
+        Config.ENDPOINT_NAME,
+        Config.BEDROCK_CONFIG["regions"]["N. Virginia"],
+        Config.AWS_ACCESS_KEY,
+        Config.AWS_SECRET_ACCESS_KEY
+    )
+    parity = check_parity(local, remote, rows)
+    print(f"   Endpoint parity: {parity}")
+    print(f"   Endpoint: {benchmark(remote, rows, repeats=3)}")
+    assert parity["passed"], "Local model diverges from the endpoint"
+
+async def test_twitter_search_mock():
+    """Paginated, rate-limited tweet search against the local mock API"""
+    print("\n\n🐦 Testing Twitter Search (mock API)")
+    print("=" * 40)
+
+    from concurrent.futures import ThreadPoolExecutor
+    from utils.orchestration.tweet import TwitterClient
+    from utils.orchestration.twitter_mock import MockTwitterServer, sample_tweets
+
+    mock = MockTwitterServer(sample_tweets(300), rate_limit=10, window=1).start()
+    try:
+        client = TwitterClient(mock.base_url, "test-token", max_wait=10)
+        result = client.search_recent("(banjir OR flood)", max_results=150)
+        print(f"   Paginated search: {result['meta']['result_count']} tweets in {mock.requests} requests")
+        assert result["meta"]["result_count"] == 150
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda _: client.search_recent("banjir"), range(25)))
+        print(f"   Burst of 25 searches: {mock.rejected} rejected, {client.scheduler.stats()['seconds_waited']}s queued")
+        assert mock.rejected == 0, "Scheduler let requests exceed the rate limit"
+    finally:
+        mock.stop()
+
+async def test_tweet_stream_replay():
+    """Replay recorded stream lines and check per-location counts and samples"""
+    print("\n\n📡 Testing Tweet Stream Replay")
+    print("=" * 40)
+
+    import tempfile
+    from utils.orchestration.tweet_stream import (
+        LocationMatcher, ReplaySource, TweetCounts, TweetStreamConsumer, write_replay
+    )
+    from utils.orchestration.twitter_mock import SAMPLE_LOCATIONS, sample_tweets
+
+    tweets = sample_tweets(120, seed=3)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "replay.jsonl")
+        write_replay(path, tweets)
+        counts = TweetCounts(window=3600, sample_size=5)
+        consumer = TweetStreamConsumer(ReplaySource(path), LocationMatcher(SAMPLE_LOCATIONS), counts)
+        consumer.start()
+        consumer._thread.join(10)
+        assert not consumer._thread.is_alive(), "Replay did not finish"
+
+    stats = consumer.stats()
+    print(f"   Replayed: {stats}")
+    assert stats["received"] == len(tweets) and stats["reconnects"] == 0
+
+    for location in SAMPLE_LOCATIONS:
+        expected = sorted(
+            (tweet for tweet in tweets if location.lower() in tweet["text"].lower()),
+            key=lambda tweet: int(tweet["id"]),
+            reverse=True
+        )
+        assert counts.count(location) == len(expected), f"Wrong count for {location}"
+        result = counts.search_result([location])
+        if not expected:
+            assert result is None
+            continue
+        assert result["meta"]["result_count"] == len(expected)
+        assert [tweet["id"] for tweet in result["data"]] == [tweet["id"] for tweet in expected[:5]], \
+            f"Samples for {location} are not the newest tweets"
+        print(f"   {location}: {len(expected)} tweets")
+
+async def test_tweet_stream_backoff():
+    """Reconnect delays for network errors, HTTP errors and 429s, with their caps"""
+    print("\n\n⏱️ Testing Tweet Stream Backoff")
+    print("=" * 40)
+
+    import requests
+    from utils.orchestration.tweet_stream import Backoff
+
+    def http_error(status):
+        response = requests.Response()
+        response.status_code = status
+        return requests.exceptions.HTTPError(f"{status}", response=response)
+
+    def delays(error, count):
+        backoff = Backoff()
+        return [backoff.next_delay(error) for _ in range(count)]
+
+    network = delays(requests.exceptions.ConnectionError("reset"), 70)
+    assert network[:4] == [0.25, 0.5, 0.75, 1.0] and network[-1] == 16.0 and max(network) == 16.0
+    assert delays(http_error(503), 9) == [5, 10, 20, 40, 80, 160, 320, 320, 320]
+    assert delays(http_error(429), 7) == [60, 120, 240, 480, 900, 900, 900]
+    assert delays(http_error(429), 100)[-1] == 900
+
+    backoff = Backoff()
+    backoff.next_delay(http_error(429))
+    backoff.next_delay(http_error(503))
+    backoff.reset()
+    assert backoff.next_delay(http_error(429)) == 60 and backoff.next_delay(http_error(503)) == 5
+    print("   Network, HTTP and 429 backoff sequences as expected")
+
+async def test_incremental_tweet_poll():
+    """A burst larger than the catch-up limit is stored over several polls without gaps"""
+    print("\n\n🔁 Testing Incremental Tweet Poll")
+    print("=" * 40)
+
+    import tempfile
+    from utils.orchestration.tweet import TwitterClient
+    from utils.orchestration.tweet_store import IncrementalTweetPoller, TweetStore
+    from utils.orchestration.twitter_mock import MockTwitterServer, sample_tweets
+
+    query = "(banjir OR flood)"
+    mock = MockTwitterServer(sample_tweets(50, seed=2)).start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = TweetStore(str(Path(tmp) / "tweets.db"))
+            poller = IncrementalTweetPoller(
+                TwitterClient(mock.base_url, "test-token"), store, window=7 * 24 * 3600, catch_up_limit=200
+            )
+            first = poller.poll(query)
+            print(f"   First poll: {first} tweets")
+
+            newest = int(mock.tweets[0]["id"])
+            burst = [
+                {"id": str(newest + ((k + 1) << 22)), "text": f"Banjir di Kota Bharu #{k}", "lang": "ms"}
+                for k in range(350)
+            ]
+            mock.tweets = burst[::-1] + mock.tweets
+            catch_up = [poller.poll(query) for _ in range(2)]
+            print(f"   Burst of {len(burst)} caught up as {catch_up}")
+            assert catch_up == [200, 150], "Burst was not caught up in two polls"
+
+            state = store.poll_state(query)
+            assert state["since_id"] == burst[-1]["id"] and state["until_id"] is None
+            expected = sum(1 for tweet in mock.tweets if "banjir" in tweet["text"].lower() or "flood" in tweet["text"].lower())
+            assert store.search_result(query, poller.window)["meta"]["result_count"] == first + len(burst) == expected
+            assert poller.poll(query) == 0
+    finally:
+        mock.stop()
+
 async def main():
     """Main test function"""
     print("🚨 MCP Flood Alert System - Test Suite")
     print("=" * 50)
     
     try:
+        await test_structured_output_stats()
+        await test_transition_alert_emails()
+        await test_local_inference_parity()
+        await test_tweet_stream_replay()
+        await test_tweet_stream_backoff()
+        await test_incremental_tweet_poll()
+        await test_twitter_search_mock()
         # await test_individual_components()
         await test_complete_workflow()
         # await test_mcp_tools()
@@ -1,9 +1,123 @@
 import base64
 import json
+import threading
+import time
 import uuid
-from typing import Optional, Union, Dict, List, Any
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Union, Dict, List, Any, Callable
 from pathlib import Path
 import boto3
+import requests
+from cachetools import TTLCache
+from botocore.exceptions import ClientError
+from requests.adapters import HTTPAdapter
+
+class ImageFetcher:
+    """Downloads image URLs concurrently through a shared, pooled HTTP session."""
+
+    # Formats accepted by the Bedrock converse API, detected from magic bytes
+    MAGIC_NUMBERS = [
+        (b"\x89PNG\r\n\x1a\n", "png"),
+        (b"\xff\xd8\xff", "jpeg"),
+        (b"GIF87a", "gif"),
+        (b"GIF89a", "gif"),
+    ]
+    CONTENT_TYPES = {
+        "image/png": "png",
+        "image/jpeg": "jpeg",
+        "image/jpg": "jpeg",
+        "image/gif": "gif",
+        "image/webp": "webp",
+    }
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        max_bytes: int = 5 * 1024 * 1024,
+        timeout: tuple = (3.05, 10),
+        deadline: float = 15.0,
+        chunk_size: int = 64 * 1024,
+    ):
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.deadline = deadline
+        self.chunk_size = chunk_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-fetch")
+
+    @classmethod
+    def sniff_format(cls, data: bytes, content_type: Optional[str] = None) -> Optional[str]:
+        """Detect the image format from magic bytes, falling back to the Content-Type header."""
+        for magic, image_format in cls.MAGIC_NUMBERS:
+            if data.startswith(magic):
+                return image_format
+        if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+            return "webp"
+        if content_type:
+            return cls.CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+        return None
+
+    def fetch(self, url: str, deadline_at: float) -> Optional[tuple[bytes, str]]:
+        """Stream a single image, aborting once it exceeds the byte cap or the deadline."""
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                print(f"Image download failed ({response.status_code}): {url}")
+                return None
+
+            content_length = response.headers.get("Content-Length")
+            if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+                print(f"Image exceeds {self.max_bytes} bytes, skipping: {url}")
+                return None
+
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                size += len(chunk)
+                if size > self.max_bytes:
+                    print(f"Image exceeds {self.max_bytes} bytes, skipping: {url}")
+                    return None
+                if time.monotonic() > deadline_at:
+                    print(f"Image download deadline exceeded, skipping: {url}")
+                    return None
+                chunks.append(chunk)
+            content_type = response.headers.get("Content-Type")
+
+        data = b"".join(chunks)
+        image_format = self.sniff_format(data, content_type)
+        if image_format is None:
+            print(f"Unsupported image content, skipping: {url}")
+            return None
+        return data, image_format
+
+    def _fetch_safely(self, url: str, deadline_at: float) -> Optional[tuple[bytes, str]]:
+        try:
+            return self.fetch(url, deadline_at)
+        except requests.exceptions.RequestException as e:
+            print(f"Image download failed: {url}: {str(e)}")
+            return None
+
+    def fetch_all(self, urls: List[str]) -> List[Optional[tuple[bytes, str]]]:
+        """Download all URLs concurrently within one overall deadline, preserving order."""
+        deadline_at = time.monotonic() + self.deadline
+        futures = [self.executor.submit(self._fetch_safely, url, deadline_at) for url in urls]
+        done, not_done = wait(futures, timeout=self.deadline)
+        for future in not_done:
+            future.cancel()
+        return [future.result() if future in done else None for future in futures]
+
+_image_fetcher: Optional[ImageFetcher] = None
+
+def get_image_fetcher() -> ImageFetcher:
+    """Return the process-wide image fetcher, creating it on first use."""
+    global _image_fetcher
+    if _image_fetcher is None:
+        _image_fetcher = ImageFetcher()
+    return _image_fetcher
 
 class S3Handler:
     """Handles S3-related operations for the application."""
@@ -51,6 +165,303 @@ class S3Handler:
             print(f"Error checking S3: {str(e)}")
             return False, ""
 
+class AsyncInvocationTracker:
+    """Tracks outstanding Bedrock async invocations (Nova Reel videos) on one shared poller.
+
+    Each poll lists recent async invocations in a single paginated call instead of
+    querying every job, falling back to get_async_invoke only for jobs missing from
+    the listing. The interval backs off while nothing changes and resets whenever a
+    job finishes or a new one is tracked.
+    """
+
+    TERMINAL_STATUSES = {"Completed", "Failed"}
+
+    def __init__(self, client: Any, min_interval: float = 5.0, max_interval: float = 60.0, backoff: float = 2.0):
+        self.client = client
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.api_calls = 0
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def track(self, invocation_arn: str, callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Future:
+        """Start tracking an invocation. The returned future resolves with its final status."""
+        with self._condition:
+            entry = self._pending.get(invocation_arn)
+            if entry is None:
+                entry = {
+                    "future": Future(),
+                    "callbacks": [],
+                    "submitted_at": datetime.now(timezone.utc)
+                }
+                self._pending[invocation_arn] = entry
+            if callback:
+                entry["callbacks"].append(callback)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="async-invoke-tracker", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+            return entry["future"]
+
+    def pending(self) -> List[str]:
+        with self._condition:
+            return list(self._pending)
+
+    def _list_statuses(self, submitted_after: datetime) -> Dict[str, Dict[str, Any]]:
+        statuses = {}
+        kwargs = {"submitTimeAfter": submitted_after, "maxResults": 1000}
+        while True:
+            self.api_calls += 1
+            response = self.client.list_async_invokes(**kwargs)
+            for summary in response.get("asyncInvokeSummaries", []):
+                statuses[summary["invocationArn"]] = summary
+            if not response.get("nextToken"):
+                return statuses
+            kwargs["nextToken"] = response["nextToken"]
+
+    def poll_once(self) -> int:
+        """Poll all pending invocations once. Returns how many finished."""
+        with self._condition:
+            pending = dict(self._pending)
+        if not pending:
+            return 0
+
+        earliest = min(entry["submitted_at"] for entry in pending.values())
+        try:
+            statuses = self._list_statuses(earliest - timedelta(minutes=5))
+        except Exception as e:
+            print(f"Error listing async invocations: {str(e)}")
+            statuses = {}
+
+        finished = 0
+        for invocation_arn, entry in pending.items():
+            summary = statuses.get(invocation_arn)
+            if summary is None:
+                try:
+                    self.api_calls += 1
+                    summary = self.client.get_async_invoke(invocationArn=invocation_arn)
+                except Exception as e:
+                    print(f"Error checking async invocation {invocation_arn}: {str(e)}")
+                    continue
+            if summary.get("status") not in self.TERMINAL_STATUSES:
+                continue
+
+            with self._condition:
+                self._pending.pop(invocation_arn, None)
+            result = self._result(invocation_arn, summary)
+            entry["future"].set_result(result)
+            for callback in entry["callbacks"]:
+                try:
+                    callback(result)
+                except Exception as e:
+                    print(f"Async invocation callback failed: {str(e)}")
+            finished += 1
+        return finished
+
+    @staticmethod
+    def _result(invocation_arn: str, summary: Dict[str, Any]) -> Dict[str, Any]:
+        output_uri = summary.get("outputDataConfig", {}).get("s3OutputDataConfig", {}).get("s3Uri", "")
+        result = {
+            "invocation_arn": invocation_arn,
+            "status": summary["status"],
+            "failure_message": summary.get("failureMessage"),
+            "output_uri": output_uri
+        }
+        if summary["status"] == "Completed" and output_uri:
+            # Nova Reel writes <s3Uri>/<invocation id>/output.mp4
+            bucket, _, prefix = output_uri.split("//")[1].partition("/")
+            invocation_id = invocation_arn.split("/")[-1]
+            key = f"{prefix.rstrip('/')}/{invocation_id}/output.mp4".lstrip("/")
+            result["video_uri"] = f"s3://{bucket}/{key}"
+        return result
+
+    def _run(self) -> None:
+        interval = self.min_interval
+        while True:
+            with self._condition:
+                if not self._pending:
+                    self._thread = None
+                    return
+                tracked = len(self._pending)
+                self._condition.wait(timeout=interval)
+                # A newly tracked job resets the schedule
+                if len(self._pending) > tracked:
+                    interval = self.min_interval
+
+            if self.poll_once():
+                interval = self.min_interval
+            else:
+                interval = min(interval * self.backoff, self.max_interval)
+
+class StructuredOutputStats:
+    """Counts how structured-output responses were parsed, per tool."""
+
+    def __init__(self):
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, tool_name: str, outcome: str) -> None:
+        """Record one parse outcome: "tool_use", "text_fallback" or "failure"."""
+        with self._lock:
+            counts = self.counts.setdefault(tool_name, {"tool_use": 0, "text_fallback": 0, "failure": 0})
+            counts[outcome] += 1
+
+    def parse_failure_rate(self, tool_name: Optional[str] = None) -> float:
+        """Fraction of responses that could not be parsed, for one tool or overall."""
+        with self._lock:
+            if tool_name is None:
+                selected = list(self.counts.values())
+            else:
+                selected = [self.counts[tool_name]] if tool_name in self.counts else []
+            total = sum(sum(counts.values()) for counts in selected)
+            failures = sum(counts["failure"] for counts in selected)
+        return failures / total if total else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-tool outcome counts and failure rates, plus the overall failure rate."""
+        with self._lock:
+            tools = {tool_name: dict(counts) for tool_name, counts in self.counts.items()}
+        return {
+            "tools": {
+                tool_name: {**counts, "parse_failure_rate": self.parse_failure_rate(tool_name)}
+                for tool_name, counts in tools.items()
+            },
+            "parse_failure_rate": self.parse_failure_rate()
+        }
+
+    def summary(self) -> str:
+        """One log line: the overall failure rate and the number of responses it covers."""
+        with self._lock:
+            total = sum(sum(counts.values()) for counts in self.counts.values())
+        return f"structured output parse failures {self.parse_failure_rate():.1%} of {total} responses"
+
+# Converse content blocks the text-only model cannot read
+MEDIA_CONTENT_TYPES = ("image", "document", "video")
+
+
+class ModelRouter:
+    """Picks the cheapest adequate Bedrock model per request and records each decision.
+
+    Text-only requests (and tasks pinned to text) go to the small text model,
+    requests carrying images, documents or video go to the multimodal model, and callers may
+    escalate low-confidence results to the larger model.
+    """
+
+    def __init__(
+        self,
+        text_model: str,
+        multimodal_model: str,
+        escalation_model: Optional[str] = None,
+        escalation_threshold: float = 0.6,
+        task_models: Optional[Dict[str, str]] = None,
+        history_size: int = 1000,
+    ):
+        self.text_model = text_model
+        self.multimodal_model = multimodal_model
+        self.escalation_model = escalation_model
+        self.escalation_threshold = escalation_threshold
+        self.task_models = task_models or {}
+        self.history: deque = deque(maxlen=history_size)
+        self.totals: Dict[tuple, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def route(self, task: Optional[str] = None, has_images: bool = False) -> str:
+        """Return the model id for a request; ``has_images`` covers any non-text media."""
+        if has_images:
+            return self.multimodal_model
+        return self.task_models.get(task, self.text_model)
+
+    def should_escalate(self, confidence: Optional[float]) -> bool:
+        """Whether a result with this confidence should be retried on the escalation model."""
+        if not self.escalation_model:
+            return False
+        try:
+            return float(confidence) < self.escalation_threshold
+        except (TypeError, ValueError):
+            return True
+
+    def record(self, task: Optional[str], model_id: str, latency: float, escalated: bool = False) -> None:
+        """Record one routing decision and its latency in seconds."""
+        with self._lock:
+            self.history.append({
+                "task": task,
+                "model_id": model_id,
+                "latency": latency,
+                "escalated": escalated,
+                "timestamp": time.time()
+            })
+            totals = self.totals.setdefault((task, model_id), {"calls": 0, "escalations": 0, "latency": 0.0, "max_latency": 0.0})
+            totals["calls"] += 1
+            totals["escalations"] += int(escalated)
+            totals["latency"] += latency
+            totals["max_latency"] = max(totals["max_latency"], latency)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per (task, model) call counts and latencies."""
+        with self._lock:
+            return [
+                {
+                    "task": task,
+                    "model_id": model_id,
+                    "calls": totals["calls"],
+                    "escalations": totals["escalations"],
+                    "avg_latency": totals["latency"] / totals["calls"],
+                    "max_latency": totals["max_latency"]
+                }
+                for (task, model_id), totals in self.totals.items()
+            ]
+
+class S3CachedDocument:
+    """Keeps a text object from S3 in memory, revalidating it with ETag conditional GETs.
+
+    The object is re-checked at most once per ``refresh_interval`` seconds; an
+    unchanged object costs a bodiless 304 instead of a download. ``transform``
+    runs once per new version, so callers can keep a pre-processed form. If a
+    revalidation fails, the last good version keeps being served.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        bucket: str,
+        key: str,
+        refresh_interval: float = 300.0,
+        transform: Optional[Callable[[str], str]] = None,
+    ):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.refresh_interval = refresh_interval
+        self.transform = transform
+        self.etag: Optional[str] = None
+        self.value: Optional[str] = None
+        self.checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> str:
+        """Return the cached (transformed) document, revalidating it if the interval elapsed."""
+        with self._lock:
+            if self.value is not None and time.monotonic() - self.checked_at < self.refresh_interval:
+                return self.value
+
+            request = {"Bucket": self.bucket, "Key": self.key}
+            if self.etag and self.value is not None:
+                request["IfNoneMatch"] = self.etag
+            try:
+                obj = self.client.get_object(**request)
+                text = obj["Body"].read().decode("utf-8")
+                self.value = self.transform(text) if self.transform else text
+                self.etag = obj.get("ETag")
+            except ClientError as e:
+                if e.response["Error"]["Code"] not in ("304", "NotModified"):
+                    if self.value is None:
+                        raise
+                    print(f"Error revalidating s3://{self.bucket}/{self.key}, serving cached copy: {str(e)}")
+            self.checked_at = time.monotonic()
+            return self.value
+
 class BedrockHandler:
     """Handles interactions with Bedrock models and manages messages."""
 
@@ -61,6 +472,9 @@ class BedrockHandler:
         self.is_image_model = "nova-canvas" in model_id
         self.is_video_model = "nova-reel" in model_id
         self.s3_handler = S3Handler(aws_access_key, aws_secret_access_key)
+        self.structured_stats = StructuredOutputStats()
+        self.router: Optional["ModelRouter"] = None
+        self.async_tracker = AsyncInvocationTracker(client)
 
     @staticmethod
     def assistant_message(message: str, image_data: Optional[bytes] = None) -> Dict[str, Any]:
@@ -112,17 +526,16 @@ class BedrockHandler:
 
         # Handle image URLs
         if image_urls:
-            for url in image_urls:
-                import requests
-                response = requests.get(url)
-                if response.status_code == 200:
-                    extension = url.split(".")[-1].split("?")[0].lower()
-                    new_message["content"].append({
-                        "image": {
-                            "format": extension,
-                            "source": {"bytes": response.content}
-                        }
-                    })
+            for image in get_image_fetcher().fetch_all(image_urls):
+                if image is None:
+                    continue
+                bytes_data, image_format = image
+                new_message["content"].append({
+                    "image": {
+                        "format": image_format,
+                        "source": {"bytes": bytes_data}
+                    }
+                })
 
         return new_message
 
@@ -179,8 +592,18 @@ class BedrockHandler:
         
         return base64.b64decode(response_body['images'][0])
 
-    def generate_video(self, prompt: str, s3_uri: str, uploaded_image: Optional[tuple[bytes, str]] = None) -> Dict[str, Any]:
-        """Generate a video using Nova Reel."""
+    def generate_video(
+        self,
+        prompt: str,
+        s3_uri: str,
+        uploaded_image: Optional[tuple[bytes, str]] = None,
+        on_complete: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """Generate a video using Nova Reel.
+
+        The invocation is registered with the shared async tracker; pass
+        ``on_complete`` or call ``track_video`` to be notified when it finishes.
+        """
         bucket = s3_uri.split("//")[1].split("/")[0]
         
         if not self.s3_handler.ensure_bucket_exists(bucket):
@@ -221,6 +644,8 @@ class BedrockHandler:
             outputDataConfig={"s3OutputDataConfig": {"s3Uri": s3_uri}}
         )
 
+        self.async_tracker.track(response["invocationArn"], on_complete)
+
         invocation_id = response["invocationArn"].split('/')[-1]
         return {
             "invocation_arn": response["invocationArn"],
@@ -229,7 +654,29 @@ class BedrockHandler:
                 "prefix": invocation_id
             }
         }
-    def invoke_model(self, messages: List[Dict[str, Any]]) -> Union[Dict[str, Any], bytes]:
+    def track_video(
+        self,
+        invocation_arn: str,
+        callback: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Future:
+        """Return a future that resolves when the video invocation finishes."""
+        return self.async_tracker.track(invocation_arn, callback)
+
+    def select_model(self, messages: List[Dict[str, Any]], task: Optional[str] = None) -> str:
+        """Pick the converse model for a request, using the router when one is attached."""
+        if self.router is None:
+            return self.model_id
+        return self.router.route(task, has_images=self.has_media(messages))
+
+    @staticmethod
+    def has_media(messages: List[Dict[str, Any]]) -> bool:
+        """Whether any content block is something other than text (image, document, video, ...)."""
+        return any(
+            any(key in content for key in MEDIA_CONTENT_TYPES)
+            for message in messages for content in message.get("content", [])
+        )
+
+    def invoke_model(self, messages: List[Dict[str, Any]], task: Optional[str] = None) -> Union[Dict[str, Any], bytes]:
         """Invoke the appropriate model based on type."""
         try:
             if self.is_image_model:
@@ -240,16 +687,102 @@ class BedrockHandler:
                     messages[-1].get("s3_uri")
                 )
             else:
-                return self.client.converse(
-                    modelId=self.model_id,
+                model_id = self.select_model(messages, task)
+                started = time.monotonic()
+                response = self.client.converse(
+                    modelId=model_id,
                     messages=messages,
                     inferenceConfig={"temperature": 0.0},
-                    additionalModelRequestFields={"top_k": 100} if "anthropic" in self.model_id else {}           
+                    additionalModelRequestFields={"top_k": 100} if "anthropic" in model_id else {}           
                 )
+                if self.router is not None:
+                    self.router.record(task, model_id, time.monotonic() - started)
+                return response
+        except Exception as e:
+            print(f"Error invoking model: {str(e)}")
+            return None
+
+    @staticmethod
+    def tool_config(tool_name: str, schema: Dict[str, Any], description: str = "") -> Dict[str, Any]:
+        """Build a converse toolConfig that forces the model to answer through one tool."""
+        return {
+            "tools": [{
+                "toolSpec": {
+                    "name": tool_name,
+                    "description": description or tool_name,
+                    "inputSchema": {"json": schema}
+                }
+            }],
+            "toolChoice": {"tool": {"name": tool_name}}
+        }
+
+    def invoke_structured(
+        self,
+        messages: List[Dict[str, Any]],
+        tool_name: str,
+        schema: Dict[str, Any],
+        description: str = "",
+        max_tokens: int = 512,
+        task: Optional[str] = None,
+        model_id: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Invoke a converse model whose answer must match the given JSON schema.
+
+        ``model_id`` forces a specific model (e.g. an escalation); otherwise the
+        model is picked by ``select_model``.
+        """
+        escalated = model_id is not None
+        model_id = model_id or self.select_model(messages, task)
+        try:
+            started = time.monotonic()
+            response = self.client.converse(
+                modelId=model_id,
+                messages=messages,
+                inferenceConfig={"temperature": 0.0, "maxTokens": max_tokens},
+                toolConfig=self.tool_config(tool_name, schema, description)
+            )
+            if self.router is not None:
+                self.router.record(task, model_id, time.monotonic() - started, escalated=escalated)
+            return response
         except Exception as e:
             print(f"Error invoking model: {str(e)}")
             return None
 
+    def extract_structured(self, response: Optional[Dict[str, Any]], tool_name: str) -> Optional[Dict[str, Any]]:
+        """Return the tool input from a converse response, or None if it cannot be parsed.
+
+        The forced toolUse block is already parsed JSON, so the common path does
+        no string handling at all. Plain-text JSON (optionally fenced) is still
+        accepted for models that ignore the tool choice.
+        """
+        try:
+            contents = response["output"]["message"]["content"]
+        except (TypeError, KeyError):
+            self.structured_stats.record(tool_name, "failure")
+            return None
+
+        for content in contents:
+            tool_use = content.get("toolUse")
+            if tool_use and tool_use.get("name") == tool_name and isinstance(tool_use.get("input"), dict):
+                self.structured_stats.record(tool_name, "tool_use")
+                return tool_use["input"]
+
+        model_output = " ".join(c["text"] for c in contents if "text" in c).strip()
+        if model_output.startswith("```"):
+            model_output = model_output.strip("`")
+            if model_output.lower().startswith("json"):
+                model_output = model_output[4:]
+            model_output = model_output.strip()
+        try:
+            parsed = json.loads(model_output)
+        except ValueError:
+            parsed = None
+        if not isinstance(parsed, dict):
+            self.structured_stats.record(tool_name, "failure")
+            return None
+        self.structured_stats.record(tool_name, "text_fallback")
+        return parsed
+
     def invoke_model_with_stream(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Invoke model with streaming."""
         if self.is_image_model or self.is_video_model:
@@ -300,6 +833,85 @@ class KBHandler:
             for i, doc in enumerate(docs)
         }
     
+class CachedKBRetriever:
+    """Long-lived knowledge base retriever with an LRU+TTL result cache and batched lookups.
+
+    Implements the same ``get_relevant_docs`` contract as ``KBHandler``. Queries
+    are cached on their whitespace/case-normalized text, and a batch of queries
+    is resolved concurrently with at most ``max_concurrency`` retrieve calls in
+    flight.
+    """
+
+    def __init__(self, kb_handler: KBHandler, maxsize: int = 1024, ttl: float = 3600.0, max_concurrency: int = 4):
+        self.kb_handler = kb_handler
+        self.cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="kb-retrieve")
+
+    @staticmethod
+    def cache_key(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def _cached(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            docs = self.cache.get(key)
+            if docs is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return docs
+
+    def _retrieve(self, key: str, query: str) -> List[Dict[str, Any]]:
+        docs = self.kb_handler.get_relevant_docs(query)
+        with self._lock:
+            self.cache[key] = docs
+        return docs
+
+    def get_relevant_docs(self, query: str) -> List[Dict[str, Any]]:
+        """Retrieve relevant documents, serving repeated queries from the cache."""
+        key = self.cache_key(query)
+        docs = self._cached(key)
+        return docs if docs is not None else self._retrieve(key, query)
+
+    def get_relevant_docs_batch(self, queries: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Retrieve documents for many queries concurrently. Returns ``{query: docs}``."""
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        futures = {}
+        for query in dict.fromkeys(queries):
+            key = self.cache_key(query)
+            if key in futures:
+                continue
+            docs = self._cached(key)
+            if docs is not None:
+                results[query] = docs
+            else:
+                futures[key] = (query, self.executor.submit(self._retrieve, key, query))
+
+        for key, (query, future) in futures.items():
+            try:
+                docs = future.result()
+            except Exception as e:
+                print(f"Error retrieving KB documents for '{query}': {str(e)}")
+                docs = []
+            for original in queries:
+                if self.cache_key(original) == key:
+                    results[original] = docs
+        return results
+
+    parse_kb_output_to_string = staticmethod(KBHandler.parse_kb_output_to_string)
+    parse_kb_output_to_reference = staticmethod(KBHandler.parse_kb_output_to_reference)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self.cache)
+        }
+
 class SESHandler:
     """Handles ses-related operations for the application."""
     
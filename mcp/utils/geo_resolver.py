@@ -0,0 +1,281 @@
+"""
+Coordinate-based location resolution over the boundary files in ``mocks/``.
+
+State polygons (geoBoundaries ADM1) and mukim zones are held behind a uniform
+grid of bounding boxes; a point only runs the even-odd ray-casting test
+against the few polygons registered in its grid cell. Batches bucket their
+points into cells and test every (point, candidate polygon) pair in a few
+array passes, so they stay fast however widely the points are spread.
+"""
+
+import json
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config_setting import Config
+from utils.weather.gazetteer import get_gazetteer
+
+STATE_BOUNDARIES_FILE = "geoBoundaries-MYS-ADM1_simplified.geojson"
+MUKIM_ZONES_FILE = "kb_mukim_zones_1km_decagons.json"
+
+# Points tested per vectorized block, bounding the (points x edges) work arrays
+POINT_BLOCK_SIZE = 4096
+# (point, edge) pairs tested per block in PolygonLayer.locate_many
+EDGE_BLOCK_SIZE = 1 << 20
+
+
+def _ring_edges(rings: List[Sequence[Sequence[float]]]) -> np.ndarray:
+    """Stack the edges of all rings (outer and holes) as rows of x1, y1, x2, y2."""
+    edges = []
+    for ring in rings:
+        coords = np.asarray(ring, dtype=np.float64)[:, :2]
+        edges.append(np.hstack([coords, np.roll(coords, -1, axis=0)]))
+    return np.vstack(edges)
+
+
+def points_in_polygon(lons: np.ndarray, lats: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Even-odd ray casting for many points against one polygon's edges."""
+    inside = np.zeros(len(lons), dtype=bool)
+    x1, y1, x2, y2 = edges[:, 0], edges[:, 1], edges[:, 2], edges[:, 3]
+    for start in range(0, len(lons), POINT_BLOCK_SIZE):
+        px = lons[start:start + POINT_BLOCK_SIZE, None]
+        py = lats[start:start + POINT_BLOCK_SIZE, None]
+        crosses = (y1 > py) != (y2 > py)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_intersect = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+        inside[start:start + POINT_BLOCK_SIZE] = np.count_nonzero(crosses & (px < x_intersect), axis=1) % 2 == 1
+    return inside
+
+
+class PolygonLayer:
+    """One boundary level (e.g. states) indexed by a uniform grid of bounding boxes.
+
+    Each polygon's edges are also bucketed by grid row, so a point is only
+    tested against the edges whose latitude span overlaps its own row.
+    """
+
+    def __init__(self, attributes: List[Dict[str, Any]], polygons: List[np.ndarray], cell_size: float = 0.1):
+        self.attributes = attributes
+        self.cell_size = cell_size
+        self.bboxes = np.array([
+            [edges[:, [0, 2]].min(), edges[:, [1, 3]].min(), edges[:, [0, 2]].max(), edges[:, [1, 3]].max()]
+            for edges in polygons
+        ])
+        self.grid: Dict[tuple, List[int]] = defaultdict(list)
+        self.row_edges: Dict[tuple, np.ndarray] = {}
+        for index, (edges, (min_x, min_y, max_x, max_y)) in enumerate(zip(polygons, self.bboxes)):
+            rows = range(self._cell(min_y), self._cell(max_y) + 1)
+            for i in range(self._cell(min_x), self._cell(max_x) + 1):
+                for j in rows:
+                    self.grid[(i, j)].append(index)
+
+            edge_low = np.minimum(edges[:, 1], edges[:, 3])
+            edge_high = np.maximum(edges[:, 1], edges[:, 3])
+            for j in rows:
+                band_low, band_high = j * cell_size, (j + 1) * cell_size
+                self.row_edges[(index, j)] = edges[(edge_high >= band_low) & (edge_low <= band_high)]
+
+        # The same tables as flat sorted arrays for locate_many
+        self.cell_keys, self.cell_offsets, cells = _flatten(self.grid)
+        self.cell_polygons = np.array([polygon for cell in cells for polygon in self.grid[cell]], dtype=np.int64)
+        self.band_keys, self.band_offsets, bands = _flatten(self.row_edges)
+        self.band_edges = np.vstack([self.row_edges[band] for band in bands]) if bands else np.empty((0, 4))
+
+    def _cell(self, value: float) -> int:
+        return int(np.floor(value / self.cell_size))
+
+    def locate(self, lon: float, lat: float) -> int:
+        """Index of the polygon containing one point, or -1."""
+        row = self._cell(lat)
+        for polygon in self.grid.get((self._cell(lon), row), ()):
+            min_x, min_y, max_x, max_y = self.bboxes[polygon]
+            if not (min_x <= lon <= max_x and min_y <= lat <= max_y):
+                continue
+            edges = self.row_edges[(polygon, row)]
+            if len(edges) and points_in_polygon(np.array([lon]), np.array([lat]), edges)[0]:
+                return polygon
+        return -1
+
+    def locate_many(self, lons: np.ndarray, lats: np.ndarray) -> np.ndarray:
+        """Index of the polygon containing each point, or -1.
+
+        Grid lookup, bounding-box filter and ray casting all run as array
+        operations over (point, candidate polygon) pairs, so the cost does not
+        depend on how many distinct cells the points fall in.
+        """
+        result = np.full(len(lons), -1, dtype=np.int64)
+        if not len(lons) or not len(self.cell_keys):
+            return result
+        cell_x = np.floor(lons / self.cell_size).astype(np.int64)
+        cell_y = np.floor(lats / self.cell_size).astype(np.int64)
+
+        # Each point paired with every polygon registered in its cell, in registration order
+        keys = _grid_key(cell_x, cell_y)
+        slot = np.minimum(np.searchsorted(self.cell_keys, keys), len(self.cell_keys) - 1)
+        counts = np.where(self.cell_keys[slot] == keys, np.diff(self.cell_offsets)[slot], 0)
+        pair_point = np.repeat(np.arange(len(lons)), counts)
+        pair_polygon = self.cell_polygons[np.repeat(self.cell_offsets[slot], counts) + _ranks(counts)]
+
+        box = self.bboxes[pair_polygon]
+        px, py = lons[pair_point], lats[pair_point]
+        in_box = (px >= box[:, 0]) & (px <= box[:, 2]) & (py >= box[:, 1]) & (py <= box[:, 3])
+        pair_point, pair_polygon = pair_point[in_box], pair_polygon[in_box]
+
+        # Each pair's edges are those of its polygon's band for the point's grid row
+        band_keys = _grid_key(pair_polygon, cell_y[pair_point])
+        band = np.minimum(np.searchsorted(self.band_keys, band_keys), len(self.band_keys) - 1)
+        edge_counts = np.where(self.band_keys[band] == band_keys, np.diff(self.band_offsets)[band], 0)
+        inside = np.zeros(len(pair_point), dtype=bool)
+        edge_totals = np.cumsum(edge_counts)
+        start = 0
+        while start < len(pair_point):
+            # Blocks of pairs holding about EDGE_BLOCK_SIZE edges bound the work arrays
+            done = edge_totals[start - 1] if start else 0
+            stop = max(start + 1, int(np.searchsorted(edge_totals, done + EDGE_BLOCK_SIZE, side="right")))
+            block_counts = edge_counts[start:stop]
+            edge_pair = np.repeat(np.arange(stop - start), block_counts)
+            edges = self.band_edges[np.repeat(self.band_offsets[band[start:stop]], block_counts) + _ranks(block_counts)]
+            x = lons[pair_point[start:stop]][edge_pair]
+            y = lats[pair_point[start:stop]][edge_pair]
+            x1, y1, x2, y2 = edges[:, 0], edges[:, 1], edges[:, 2], edges[:, 3]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                crossing = ((y1 > y) != (y2 > y)) & (x < x1 + (y - y1) * (x2 - x1) / (y2 - y1))
+            inside[start:stop] = np.bincount(edge_pair, weights=crossing, minlength=stop - start) % 2 == 1
+            start = stop
+
+        # Pairs are ordered by point, then candidate; keep each point's first hit
+        hit_points, first = np.unique(pair_point[inside], return_index=True)
+        result[hit_points] = pair_polygon[inside][first]
+        return result
+
+
+def _grid_key(i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """One sortable int64 per (i, j) pair of grid coordinates or (polygon, row)."""
+    return (np.asarray(i, dtype=np.int64) << 32) + (np.asarray(j, dtype=np.int64) + (1 << 31))
+
+
+def _ranks(counts: np.ndarray) -> np.ndarray:
+    """0..count-1 for each group of a ``np.repeat(..., counts)`` expansion."""
+    return np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+def _flatten(groups: Dict[tuple, Any]) -> tuple:
+    """Sorted keys, offsets and concatenated values of a dict keyed by integer pairs."""
+    keys = sorted(groups)
+    sizes = [len(groups[key]) for key in keys]
+    return (
+        _grid_key([i for i, _ in keys], [j for _, j in keys]),
+        np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64),
+        keys
+    )
+
+
+class GeoResolver:
+    """Resolves coordinates to state, district and mukim."""
+
+    def __init__(self, states: PolygonLayer, mukims: Optional[PolygonLayer] = None):
+        self.states = states
+        self.mukims = mukims
+
+    @classmethod
+    def from_files(cls, boundary_dir: Path) -> "GeoResolver":
+        with open(boundary_dir / STATE_BOUNDARIES_FILE, encoding="utf-8") as f:
+            features = json.load(f)["features"]
+        state_attributes, state_polygons = [], []
+        for feature in features:
+            geometry = feature["geometry"]
+            polygons = geometry["coordinates"] if geometry["type"] == "MultiPolygon" else [geometry["coordinates"]]
+            state_attributes.append({"state": _canonical_name(feature["properties"]["shapeName"], "State")})
+            state_polygons.append(_ring_edges([ring for polygon in polygons for ring in polygon]))
+
+        mukims = None
+        mukim_path = boundary_dir / MUKIM_ZONES_FILE
+        if mukim_path.exists():
+            with open(mukim_path, encoding="utf-8") as f:
+                zones = json.load(f)
+            mukim_attributes = [parse_zone_id(zone["districtId"]) for zone in zones]
+            mukims = PolygonLayer(mukim_attributes, [_ring_edges(zone["polygon"]) for zone in zones], cell_size=0.02)
+
+        return cls(PolygonLayer(state_attributes, state_polygons), mukims)
+
+    def resolve_many(self, lats: Sequence[float], lons: Sequence[float]) -> List[Optional[Dict[str, Any]]]:
+        """Resolve many points at once. Each result holds state, district and mukim (or None)."""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        state_index = self.states.locate_many(lons, lats)
+        mukim_index = self.mukims.locate_many(lons, lats) if self.mukims else np.full(len(lons), -1)
+
+        results = []
+        for state, mukim in zip(state_index, mukim_index):
+            if state == -1 and mukim == -1:
+                results.append(None)
+                continue
+            result = {"state": None, "district": None, "mukim": None}
+            if mukim != -1:
+                result.update(self.mukims.attributes[mukim])
+            if state != -1:
+                result["state"] = self.states.attributes[state]["state"]
+            results.append(result)
+        return results
+
+    def resolve(self, lat: float, lon: float) -> Optional[Dict[str, Any]]:
+        """Resolve a single point to state, district and mukim (or None)."""
+        state = self.states.locate(lon, lat)
+        mukim = self.mukims.locate(lon, lat) if self.mukims else -1
+        if state == -1 and mukim == -1:
+            return None
+        result = {"state": None, "district": None, "mukim": None}
+        if mukim != -1:
+            result.update(self.mukims.attributes[mukim])
+        if state != -1:
+            result["state"] = self.states.attributes[state]["state"]
+        return result
+
+    def classify(self, lat: float, lon: float) -> Optional[Dict[str, Any]]:
+        """Resolve a point into the ``classify_location`` result structure, or None if outside all boundaries."""
+        resolved = self.resolve(lat, lon)
+        if resolved is None:
+            return None
+        ordered_locations = [name for name in (resolved["mukim"], resolved["district"], resolved["state"]) if name]
+        return {
+            "district": resolved["district"],
+            "state": resolved["state"],
+            "division": None,
+            "recreation_centre": None,
+            "town": None,
+            "mukim": resolved["mukim"],
+            "ordered_locations": ordered_locations,
+            "coordinates": {"lat": lat, "lon": lon},
+            "raw_response": None
+        }
+
+
+def parse_zone_id(zone_id: str) -> Dict[str, str]:
+    """Split a zone's districtId ("STATE:DISTRICT:Mukim Name") into catalog-spelled names."""
+    state, district, mukim = zone_id.split(":", 2)
+    return {
+        "state": _canonical_name(state.replace("_", " ").title(), "State"),
+        "district": _canonical_name(district.replace("_", " ").title(), "District"),
+        "mukim": mukim.removeprefix("Mukim ").strip(),
+        "zone_id": zone_id
+    }
+
+
+def _canonical_name(name: str, category: str) -> str:
+    """Map a boundary-file name onto the weather catalog spelling when it matches exactly."""
+    match = get_gazetteer().lookup(name)
+    if match["kind"] == "exact":
+        for record in match["records"]:
+            if record["category"] == category:
+                return record["location_name"]
+    return name
+
+
+@lru_cache(maxsize=1)
+def get_geo_resolver() -> GeoResolver:
+    """Return the process-wide resolver, loading the boundary files on first use."""
+    return GeoResolver.from_files(Path(Config.GEO_BOUNDARY_DIR))
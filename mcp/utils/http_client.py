@@ -0,0 +1,228 @@
+"""
+Shared HTTP client for the public data APIs (data.gov.my).
+
+One pooled keep-alive session with retries on transient errors, compressed
+transfer, conditional revalidation (``If-None-Match`` / ``If-Modified-Since``)
+against an in-memory validator cache, a concurrency limit per host and a
+deadline on every request. The deadline covers the whole call: the wait for a
+host slot, every retry and its backoff, and reading the body (checked between
+chunks, so one slow read can overrun it by up to a socket read timeout).
+Transfer and latency figures are kept for ``stats()``.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config_setting import Config
+
+# Statuses retried (after Retry-After or backoff) while the deadline allows
+RETRY_STATUSES = (429, 502, 503, 504)
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class HttpClient:
+    """Pooled, revalidating HTTP client with per-host concurrency limits."""
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        per_host_limit: int = 4,
+        timeout: float = 15.0,
+        connect_timeout: float = 3.05,
+        cache_size: int = 128,
+        retries: int = 2,
+        backoff_factor: float = 0.3,
+    ):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.connect_timeout = connect_timeout
+        self.per_host_limit = per_host_limit
+        self.cache_size = cache_size
+
+        self.session = requests.Session()
+        # Retries happen in get(), where they can be held to the call's deadline
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate", "Accept": "application/json"})
+
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        # (url, query) -> (etag, last_modified, payload), least recently used first
+        self._validators: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.requests_made = 0
+        self.not_modified = 0
+        self.bytes_received = 0
+        self.latencies: deque = deque(maxlen=1000)
+
+    def _slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_slots[host]
+
+    def get(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> requests.Response:
+        """
+        GET through the pooled session. ``timeout`` is the deadline for the
+        whole call: slot wait, attempts, backoff and body. Connection errors,
+        timeouts and ``RETRY_STATUSES`` are retried up to ``retries`` times
+        while the deadline leaves room; otherwise the last error is raised or
+        the last response returned.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        attempt = 0
+        while True:
+            try:
+                response, error = self._attempt(url, params, headers, deadline), None
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                response, error = None, e
+                delay = self.backoff_factor * 2 ** attempt
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                retry_after = response.headers.get("Retry-After", "")
+                delay = float(retry_after) if retry_after.isdigit() else self.backoff_factor * 2 ** attempt
+
+            if attempt == self.retries or time.monotonic() + delay >= deadline:
+                if error is not None:
+                    raise error
+                return response
+            time.sleep(delay)
+            attempt += 1
+
+    def _attempt(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, str]],
+        deadline: float,
+    ) -> requests.Response:
+        """One request, with its body read in full before ``deadline``."""
+        slot = self._slot(url)
+        if not slot.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise requests.exceptions.Timeout(f"No free connection slot for {urlsplit(url).netloc} before the deadline")
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise requests.exceptions.Timeout(f"Deadline reached before requesting {url}")
+            started = time.perf_counter()
+            response = self.session.get(
+                url,
+                params=params,
+                headers=headers,
+                timeout=(min(self.connect_timeout, remaining), remaining),
+                stream=True
+            )
+            try:
+                # The read timeout bounds each socket read; the deadline bounds the whole body
+                chunks = []
+                for chunk in response.iter_content(READ_CHUNK_SIZE):
+                    chunks.append(chunk)
+                    if time.monotonic() > deadline:
+                        raise requests.exceptions.Timeout(f"Deadline reached while reading {url}")
+                response._content = b"".join(chunks)
+            finally:
+                response.close()
+        finally:
+            slot.release()
+
+        with self._lock:
+            self.requests_made += 1
+            self.not_modified += response.status_code == 304
+            # Content-Length is the compressed size on the wire when gzip was negotiated
+            wire_length = response.headers.get("Content-Length")
+            self.bytes_received += int(wire_length) if wire_length and wire_length.isdigit() else len(response.content)
+            self.latencies.append(time.perf_counter() - started)
+        return response
+
+    def conditional_get(
+        self,
+        url: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> requests.Response:
+        """GET revalidated against validators the caller persisted; a 304 is returned as-is."""
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        response = self.get(url, params=params, headers=headers, timeout=timeout)
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+
+    def get_json(self, url: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Any:
+        """
+        GET and decode JSON, revalidating against the last response for the
+        same URL and query so an unchanged resource is not transferred again.
+        """
+        key = f"{url}?{urlencode(sorted((params or {}).items()), doseq=True)}"
+        with self._lock:
+            cached = self._validators.get(key)
+        etag, last_modified, payload = cached or (None, None, None)
+
+        response = self.conditional_get(url, etag, last_modified, params=params, timeout=timeout)
+        if response.status_code == 304 and cached:
+            with self._lock:
+                self._validators.move_to_end(key)
+            return payload
+
+        payload = response.json()
+        etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+        if etag or last_modified:
+            with self._lock:
+                self._validators[key] = (etag, last_modified, payload)
+                self._validators.move_to_end(key)
+                while len(self._validators) > self.cache_size:
+                    self._validators.popitem(last=False)
+        return payload
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self.latencies)
+
+        def percentile(q: float) -> float:
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0.0
+
+        return {
+            "requests": self.requests_made,
+            "not_modified": self.not_modified,
+            "bytes_received": self.bytes_received,
+            "p50_latency": percentile(0.5),
+            "p95_latency": percentile(0.95),
+            "p99_latency": percentile(0.99)
+        }
+
+
+_http_client: Optional[HttpClient] = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """Return the process-wide HTTP client."""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = HttpClient(
+                per_host_limit=Config.HTTP_PER_HOST_LIMIT,
+                timeout=Config.HTTP_TIMEOUT
+            )
+        return _http_client
@@ -0,0 +1,238 @@
+"""
+Offline local vector index standing in for the Bedrock location knowledge base.
+
+The location catalog is embedded once into a float32 matrix saved as ``.npy``
+next to a JSON metadata file; at query time the matrix is memory-mapped and
+searched with a single vectorized cosine-similarity product. Embeddings come
+from a deterministic hashed character n-gram embedder, so building and
+querying the index needs no network access.
+
+The metadata records a hash of the indexed documents and the embedder's
+settings; ``load_or_build`` rebuilds an index whose catalog or embedder has
+since changed. Select it with ``KB_BACKEND=local``; rebuild by hand with
+``python -m utils.local_kb --build``.
+"""
+
+import hashlib
+import json
+import re
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from utils.aws_client import KBHandler
+
+DEFAULT_CATALOG_PATH = Path(__file__).parent / "weather" / "weather_api_locations.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "metadata.json"
+ANN_FILE = "ann.bin"
+
+
+class HashingEmbedder:
+    """Embeds text as L2-normalized hashed character n-gram counts."""
+
+    name = "hashing-char-ngram"
+
+    def __init__(self, dim: int = 512, ngram_range: tuple = (2, 4)):
+        self.dim = dim
+        self.ngram_range = tuple(ngram_range)
+
+    def config(self) -> Dict[str, Any]:
+        """Settings that change the embeddings; stored with an index built by this embedder."""
+        return {"name": self.name, "dim": self.dim, "ngram_range": list(self.ngram_range)}
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            normalized = f" {re.sub(r'[^a-z0-9]+', ' ', text.lower()).strip()} "
+            for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+                for i in range(len(normalized) - n + 1):
+                    digest = zlib.crc32(normalized[i:i + n].encode("utf-8"))
+                    # Low bits pick the bucket, the top bit the sign, to reduce collision bias
+                    matrix[row, digest % self.dim] += 1.0 if digest & 0x80000000 else -1.0
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+
+def catalog_documents(catalog_path: Path = DEFAULT_CATALOG_PATH) -> List[Dict[str, Any]]:
+    """One retrievable document per catalog location."""
+    with open(catalog_path, encoding="utf-8") as f:
+        grouped = json.load(f)
+    return [
+        {
+            "text": f"{location['location_name']} ({category}, location_id {location['location_id']})",
+            "metadata": {"location_id": location["location_id"], "category": category}
+        }
+        for category, locations in grouped.items()
+        for location in locations
+    ]
+
+
+def documents_hash(documents: List[Dict[str, Any]]) -> str:
+    return hashlib.sha256(json.dumps(documents, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+class LocalKBHandler:
+    """Drop-in for ``KBHandler`` that searches a local, memory-mapped embedding index.
+
+    With ``use_ann`` and the optional ``hnswlib`` package installed, queries go
+    through a persisted HNSW graph; otherwise search is exact, which is
+    sub-millisecond at catalog scale.
+    """
+
+    def __init__(
+        self,
+        index_dir: str,
+        kb_params: Optional[Dict[str, Any]] = None,
+        use_ann: bool = False,
+    ):
+        self.index_dir = Path(index_dir)
+        with open(self.index_dir / METADATA_FILE, encoding="utf-8") as f:
+            metadata = json.load(f)
+        self.documents = metadata["documents"]
+        self.embedder = HashingEmbedder(dim=metadata["dim"], ngram_range=metadata.get("ngram_range", (2, 4)))
+        self.embeddings = np.load(self.index_dir / EMBEDDINGS_FILE, mmap_mode="r")
+        self.number_of_results = (kb_params or {}).get("vectorSearchConfiguration", {}).get("numberOfResults", 5)
+        self.ann_index = self._load_ann() if use_ann else None
+
+    @classmethod
+    def build(
+        cls,
+        index_dir: str,
+        documents: Optional[List[Dict[str, Any]]] = None,
+        embedder: Optional[HashingEmbedder] = None,
+    ) -> None:
+        """Embed the documents (the location catalog by default) and persist the index."""
+        documents = documents if documents is not None else catalog_documents()
+        embedder = embedder or HashingEmbedder()
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+
+        embeddings = embedder.embed([doc["text"] for doc in documents])
+        np.save(index_dir / EMBEDDINGS_FILE, embeddings)
+        with open(index_dir / METADATA_FILE, "w", encoding="utf-8") as f:
+            json.dump({
+                "embedder": embedder.name,
+                "dim": embedder.dim,
+                "ngram_range": list(embedder.ngram_range),
+                "catalog_hash": documents_hash(documents),
+                "documents": documents
+            }, f, ensure_ascii=False)
+        (index_dir / ANN_FILE).unlink(missing_ok=True)
+
+    @staticmethod
+    def is_current(index_dir: str, documents: List[Dict[str, Any]], embedder: HashingEmbedder) -> bool:
+        """Whether the index exists and was built from these documents with this embedder."""
+        metadata_path = Path(index_dir) / METADATA_FILE
+        if not metadata_path.exists():
+            return False
+        with open(metadata_path, encoding="utf-8") as f:
+            metadata = json.load(f)
+        built_with = {
+            "name": metadata.get("embedder"),
+            "dim": metadata.get("dim"),
+            "ngram_range": metadata.get("ngram_range")
+        }
+        return metadata.get("catalog_hash") == documents_hash(documents) and built_with == embedder.config()
+
+    @classmethod
+    def load_or_build(
+        cls,
+        index_dir: str,
+        kb_params: Optional[Dict[str, Any]] = None,
+        use_ann: bool = False,
+        documents: Optional[List[Dict[str, Any]]] = None,
+        embedder: Optional[HashingEmbedder] = None,
+    ) -> "LocalKBHandler":
+        """Load the index, (re)building it first if it is missing or stale."""
+        documents = documents if documents is not None else catalog_documents()
+        embedder = embedder or HashingEmbedder()
+        if not cls.is_current(index_dir, documents, embedder):
+            if (Path(index_dir) / METADATA_FILE).exists():
+                print("⚠️ Local KB index was built from another catalog or embedder; rebuilding")
+            cls.build(index_dir, documents, embedder)
+        return cls(index_dir, kb_params, use_ann=use_ann)
+
+    def _load_ann(self):
+        try:
+            import hnswlib
+        except ImportError:
+            print("hnswlib is not installed, falling back to exact search")
+            return None
+
+        index = hnswlib.Index(space="ip", dim=self.embeddings.shape[1])
+        ann_path = self.index_dir / ANN_FILE
+        if ann_path.exists():
+            index.load_index(str(ann_path), max_elements=len(self.documents))
+        else:
+            index.init_index(max_elements=len(self.documents), ef_construction=200, M=16)
+            index.add_items(np.asarray(self.embeddings), np.arange(len(self.documents)))
+            index.save_index(str(ann_path))
+        index.set_ef(max(50, self.number_of_results * 2))
+        return index
+
+    def _search(self, queries: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Top-k (indices, scores) per query row, best first."""
+        k = min(self.number_of_results, len(self.documents))
+        if self.ann_index is not None:
+            labels, distances = self.ann_index.knn_query(queries, k=k)
+            return labels, 1.0 - distances
+
+        scores = queries @ self.embeddings.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    def _results(self, indices: np.ndarray, scores: np.ndarray) -> List[Dict[str, Any]]:
+        return [
+            {
+                "content": {"text": self.documents[index]["text"]},
+                "location": {"type": "LOCAL", "localLocation": {"path": str(self.index_dir)}},
+                "metadata": self.documents[index]["metadata"],
+                "score": float(score)
+            }
+            for index, score in zip(indices, scores)
+        ]
+
+    def get_relevant_docs(self, prompt: str) -> List[Dict[str, Any]]:
+        """Retrieve relevant documents, in the same shape as a Bedrock retrieve call."""
+        indices, scores = self._search(self.embedder.embed([prompt]))
+        return self._results(indices[0], scores[0])
+
+    def get_relevant_docs_batch(self, queries: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Retrieve documents for many queries with one matrix product."""
+        if not queries:
+            return {}
+        indices, scores = self._search(self.embedder.embed(queries))
+        return {query: self._results(indices[row], scores[row]) for row, query in enumerate(queries)}
+
+    parse_kb_output_to_string = staticmethod(KBHandler.parse_kb_output_to_string)
+    parse_kb_output_to_reference = staticmethod(KBHandler.parse_kb_output_to_reference)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from config_setting import Config
+
+    parser = argparse.ArgumentParser(description="Build or query the local location index")
+    parser.add_argument("--build", action="store_true", help="Rebuild the index from the location catalog")
+    parser.add_argument("query", nargs="*", default=["Kota Bharu"])
+    args = parser.parse_args()
+
+    if args.build:
+        LocalKBHandler.build(Config.LOCAL_KB_DIR)
+        print(f"✅ Local KB index written to {Config.LOCAL_KB_DIR}")
+
+    kb = LocalKBHandler.load_or_build(Config.LOCAL_KB_DIR, Config.BEDROCK_CONFIG["kb_configs"])
+    for query in args.query:
+        started = time.perf_counter()
+        docs = kb.get_relevant_docs(query)
+        elapsed = (time.perf_counter() - started) * 1e3
+        print(f"{query!r} ({elapsed:.3f} ms):")
+        for doc in docs:
+            print(f"  {doc['score']:.3f}  {doc['content']['text']}")
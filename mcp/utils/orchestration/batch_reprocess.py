@@ -0,0 +1,299 @@
+"""
+Backlog reprocessing through Bedrock batch inference.
+
+Historical posts are written as gatekeeper prompts in the JSONL layout expected by
+``create_model_invocation_job``; the job is submitted and tracked, and its output
+is merged back into the report records by ``recordId``. ``LocalBatchRunner`` reads
+the same JSONL and produces the same ``.out`` file locally for testing.
+"""
+
+import argparse
+import base64
+import json
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import boto3
+
+from config_setting import Config
+from utils.aws_client import BedrockHandler, S3Handler
+from utils.orchestration.check_user_input import (
+    FLOOD_ANALYSIS_PROMPT,
+    FLOOD_ANALYSIS_SCHEMA,
+    FLOOD_ANALYSIS_TOOL,
+    classify_locations,
+    init_bedrock,
+    kb_retriever_stats,
+)
+
+# Bedrock rejects batch jobs with fewer records than this
+MIN_BATCH_RECORDS = 100
+TERMINAL_JOB_STATUSES = {"Completed", "PartiallyCompleted", "Failed", "Stopped", "Expired"}
+
+
+def build_batch_record(record_id: str, text_input: str, image_urls: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Build one batch input record holding the gatekeeper prompt for a post."""
+    message = BedrockHandler.user_message(
+        message=text_input,
+        context=FLOOD_ANALYSIS_PROMPT,
+        image_urls=image_urls
+    )
+    # invoke_model bodies carry image bytes as base64 strings
+    for content in message["content"]:
+        if "image" in content:
+            source = content["image"]["source"]
+            source["bytes"] = base64.b64encode(source["bytes"]).decode("utf-8")
+
+    tool_config = BedrockHandler.tool_config(
+        FLOOD_ANALYSIS_TOOL,
+        FLOOD_ANALYSIS_SCHEMA,
+        description="Record whether a post reports a flood, and where."
+    )
+    return {
+        "recordId": record_id,
+        "modelInput": {
+            "schemaVersion": "messages-v1",
+            "messages": [message],
+            "inferenceConfig": {"temperature": 0.0, "max_new_tokens": 512},
+            "toolConfig": tool_config
+        }
+    }
+
+
+def write_batch_input(posts: Iterable[Dict[str, Any]], path: str) -> int:
+    """
+    Write gatekeeper prompts for a backlog of posts as batch input JSONL.
+
+    Each post needs ``report_id`` and ``text_input``; ``image_urls`` is optional.
+    Returns the number of records written.
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for post in posts:
+            record = build_batch_record(
+                post.get("report_id") or str(uuid.uuid4()),
+                post.get("text_input", ""),
+                post.get("image_urls")
+            )
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    if count < MIN_BATCH_RECORDS:
+        print(f"⚠️ {count} records written; Bedrock batch jobs need at least {MIN_BATCH_RECORDS}.")
+    return count
+
+
+class BedrockBatchJob:
+    """Submits and tracks a Bedrock model-invocation batch job."""
+
+    def __init__(self, bedrock_client: Any, s3_handler: S3Handler, role_arn: str, model_id: str):
+        self.client = bedrock_client
+        self.s3_handler = s3_handler
+        self.role_arn = role_arn
+        self.model_id = model_id
+
+    def submit(self, input_path: str, bucket: str, prefix: str = "batch", job_name: Optional[str] = None) -> str:
+        """Upload the input JSONL and start the batch job. Returns the job ARN."""
+        if not self.s3_handler.ensure_bucket_exists(bucket):
+            raise Exception(f"Failed to create/verify S3 bucket: {bucket}")
+
+        job_name = job_name or f"flood-backlog-{uuid.uuid4().hex[:8]}"
+        input_key = f"{prefix}/input/{job_name}/{Path(input_path).name}"
+        self.s3_handler.client.upload_file(input_path, bucket, input_key)
+
+        response = self.client.create_model_invocation_job(
+            jobName=job_name,
+            roleArn=self.role_arn,
+            modelId=self.model_id,
+            inputDataConfig={"s3InputDataConfig": {"s3Uri": f"s3://{bucket}/{input_key}"}},
+            outputDataConfig={"s3OutputDataConfig": {"s3Uri": f"s3://{bucket}/{prefix}/output/"}}
+        )
+        return response["jobArn"]
+
+    def status(self, job_arn: str) -> Dict[str, Any]:
+        """Return the current job description."""
+        return self.client.get_model_invocation_job(jobIdentifier=job_arn)
+
+    def wait(self, job_arn: str, poll_interval: float = 60.0, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Poll until the job reaches a terminal status."""
+        started = time.monotonic()
+        while True:
+            job = self.status(job_arn)
+            print(f"Batch job {job_arn.split('/')[-1]}: {job['status']}")
+            if job["status"] in TERMINAL_JOB_STATUSES:
+                return job
+            if timeout is not None and time.monotonic() - started > timeout:
+                raise TimeoutError(f"Batch job {job_arn} did not finish within {timeout} seconds")
+            time.sleep(poll_interval)
+
+    def download_outputs(self, job_arn: str, local_dir: str) -> List[str]:
+        """Download the job's ``.jsonl.out`` files and return their local paths."""
+        job = self.status(job_arn)
+        output_uri = job["outputDataConfig"]["s3OutputDataConfig"]["s3Uri"]
+        bucket, _, prefix = output_uri.split("//")[1].partition("/")
+        prefix = f"{prefix.rstrip('/')}/{job_arn.split('/')[-1]}/"
+
+        Path(local_dir).mkdir(parents=True, exist_ok=True)
+        paths = []
+        paginator = self.s3_handler.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                if obj["Key"].endswith(".out"):
+                    local_path = str(Path(local_dir) / Path(obj["Key"]).name)
+                    self.s3_handler.client.download_file(bucket, obj["Key"], local_path)
+                    paths.append(local_path)
+        return paths
+
+
+class LocalBatchRunner:
+    """
+    Local stand-in for a batch job: processes batch input JSONL record by record
+    and writes a ``.out`` file in the same format Bedrock produces.
+    """
+
+    def __init__(self, invoke: Callable[[Dict[str, Any]], Dict[str, Any]]):
+        self.invoke = invoke
+
+    @classmethod
+    def from_bedrock(cls, bedrock_handler: BedrockHandler) -> "LocalBatchRunner":
+        """Runner that sends each record to the on-demand invoke_model API."""
+        def invoke(model_input: Dict[str, Any]) -> Dict[str, Any]:
+            response = bedrock_handler.client.invoke_model(
+                modelId=bedrock_handler.model_id,
+                body=json.dumps(model_input),
+                accept="application/json",
+                contentType="application/json"
+            )
+            return json.loads(response["body"].read())
+        return cls(invoke)
+
+    def run(self, input_path: str, output_path: Optional[str] = None) -> str:
+        output_path = output_path or f"{input_path}.out"
+        with open(input_path, encoding="utf-8") as src, open(output_path, "w", encoding="utf-8") as dst:
+            for line in src:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                result = {"recordId": record["recordId"], "modelInput": record["modelInput"]}
+                try:
+                    result["modelOutput"] = self.invoke(record["modelInput"])
+                except Exception as e:
+                    result["error"] = {"errorMessage": str(e)}
+                dst.write(json.dumps(result, ensure_ascii=False) + "\n")
+        return output_path
+
+
+def merge_batch_outputs(
+    output_paths: List[str],
+    records: Dict[str, Dict[str, Any]],
+    bedrock_handler: BedrockHandler
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Merge batch outputs back into report records keyed by report id.
+
+    Each matched record gains a ``flood_analysis`` entry shaped like the result
+    of ``analyze_flood_post``.
+    """
+    for output_path in output_paths:
+        with open(output_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                record = records.get(result.get("recordId"))
+                if record is None:
+                    print(f"⚠️ Skipping batch output with no matching report_id: {result.get('recordId')!r}")
+                    continue
+
+                response = result.get("modelOutput")
+                parsed = bedrock_handler.extract_structured(response, FLOOD_ANALYSIS_TOOL) if response else None
+                if parsed is None:
+                    parsed = {
+                        "is_flood": False,
+                        "summary": "Unable to parse model output",
+                        "location": None,
+                        "severity": "unknown",
+                        "confidence": 0.0
+                    }
+                record["flood_analysis"] = {
+                    "is_flood": parsed.get("is_flood", False),
+                    "summary": parsed.get("summary", ""),
+                    "location": parsed.get("location", ""),
+                    "severity": parsed.get("severity", "unknown"),
+                    "confidence": parsed.get("confidence", 0.0),
+                    "raw_response": response,
+                    "error": result.get("error")
+                }
+    return records
+
+
+def classify_report_locations(
+    records: Dict[str, Dict[str, Any]],
+    bedrock_handler: BedrockHandler,
+    bedrock_agent_runtime_client: Any,
+    s3_handler: Optional[S3Handler]
+) -> int:
+    """
+    Classify the locations of merged flood reports together, so their KB
+    lookups run as one batch. Each flood record gains ``location_data``.
+    Returns the number of distinct locations classified.
+    """
+    flooded = [
+        record for record in records.values()
+        if record.get("flood_analysis", {}).get("is_flood") and record["flood_analysis"].get("location")
+    ]
+    classified = classify_locations(
+        bedrock_handler,
+        bedrock_agent_runtime_client,
+        [record["flood_analysis"]["location"] for record in flooded],
+        s3_handler
+    )
+    for record in flooded:
+        record["location_data"] = classified[record["flood_analysis"]["location"]]
+    return len(classified)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reprocess a backlog of posts with Bedrock batch inference")
+    parser.add_argument("posts", help="JSONL file of posts with report_id, text_input and optional image_urls")
+    parser.add_argument("--mode", choices=["local", "bedrock"], default="local")
+    parser.add_argument("--bucket", default="myselamat-user-posts")
+    parser.add_argument("--output", default="backlog_results.json")
+    parser.add_argument("--skip-locations", action="store_true", help="Do not classify the flood reports' locations")
+    args = parser.parse_args()
+
+    with open(args.posts, encoding="utf-8") as f:
+        posts = [json.loads(line) for line in f if line.strip()]
+    for post in posts:
+        # Posts without an id get one here so their batch output can be merged back
+        post["report_id"] = post.get("report_id") or str(uuid.uuid4())
+    records = {post["report_id"]: post for post in posts}
+    input_path = f"{args.posts}.batch.jsonl"
+    write_batch_input(posts, input_path)
+
+    bedrock_handler, bedrock_agent_runtime_client = init_bedrock()
+    region = Config.BEDROCK_CONFIG["regions"]["N. Virginia"]
+    s3_handler = S3Handler(Config.AWS_ACCESS_KEY, Config.AWS_SECRET_ACCESS_KEY, region_name=region)
+    if args.mode == "local":
+        output_paths = [LocalBatchRunner.from_bedrock(bedrock_handler).run(input_path)]
+    else:
+        bedrock_client = boto3.client(
+            "bedrock",
+            region_name=region,
+            aws_access_key_id=Config.AWS_ACCESS_KEY,
+            aws_secret_access_key=Config.AWS_SECRET_ACCESS_KEY
+        )
+        job = BedrockBatchJob(bedrock_client, s3_handler, Config.BEDROCK_BATCH_ROLE_ARN, bedrock_handler.model_id)
+        job_arn = job.submit(input_path, args.bucket)
+        job.wait(job_arn)
+        output_paths = job.download_outputs(job_arn, f"{args.posts}.batch_out")
+
+    merged = merge_batch_outputs(output_paths, records, bedrock_handler)
+    if not args.skip_locations:
+        located = classify_report_locations(merged, bedrock_handler, bedrock_agent_runtime_client, s3_handler)
+        print(f"📍 Classified {located} report locations; KB retriever {kb_retriever_stats()}")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(list(merged.values()), f, indent=2, ensure_ascii=False)
+    print(f"✅ Merged {len(merged)} records into {args.output}")
+    print(f"📊 Batch {bedrock_handler.structured_stats.summary()}")
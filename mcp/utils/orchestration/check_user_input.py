@@ -1,8 +1,12 @@
 import json
+import re
 import boto3
 from pathlib import Path
-from typing import Dict, Any, Optional
-from utils.aws_client import BedrockHandler, KBHandler, S3Handler
+from typing import Dict, Any, List, Optional, Union
+from utils.aws_client import BedrockHandler, CachedKBRetriever, KBHandler, ModelRouter, S3CachedDocument, S3Handler
+from utils.local_kb import LocalKBHandler
+from utils.weather.gazetteer import get_gazetteer
+from utils.orchestration.location_cache import get_location_cache
 import base64
 import time
 from config_setting import Config
@@ -29,6 +33,7 @@ def init_bedrock():
     )
 
     bedrock_handler = BedrockHandler(bedrock_runtime, model_id, params, Config.AWS_ACCESS_KEY, Config.AWS_SECRET_ACCESS_KEY)
+    bedrock_handler.router = init_model_router()
 
     bedrock_agent_runtime_client = boto3.client(
         "bedrock-agent-runtime",
@@ -39,7 +44,55 @@ def init_bedrock():
 
     return bedrock_handler, bedrock_agent_runtime_client
 
-        
+def init_model_router() -> Optional[ModelRouter]:
+    """Build the per-request model router from the "model_routing" config section."""
+    routing = Config.BEDROCK_CONFIG.get("model_routing")
+    if not routing:
+        return None
+
+    models = Config.BEDROCK_CONFIG["multimodal_llms"]["N. Virginia"]
+    escalation_model = routing.get("escalation_model")
+    return ModelRouter(
+        text_model=models[routing["text_model"]]["model"],
+        multimodal_model=models[routing["multimodal_model"]]["model"],
+        escalation_model=models[escalation_model]["model"] if escalation_model else None,
+        escalation_threshold=routing.get("escalation_confidence_threshold", 0.6),
+        task_models={
+            task: models[name]["model"] for task, name in routing.get("task_models", {}).items()
+        }
+    )
+
+FLOOD_ANALYSIS_TOOL = "record_flood_analysis"
+FLOOD_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "is_flood": {"type": "boolean", "description": "Whether the post indicates a flood"},
+        "summary": {"type": "string", "description": "One or two sentence summary of the post"},
+        "location": {"type": "string", "description": "Exact location string as it appears in the post"},
+        "severity": {"type": "string", "enum": ["minor", "moderate", "severe", "critical", "unknown"]},
+        "confidence": {"type": "number", "description": "Confidence in is_flood between 0 and 1"}
+    },
+    "required": ["is_flood", "summary", "location", "severity", "confidence"]
+}
+
+FLOOD_ANALYSIS_PROMPT = (
+    "You are a flood detection assistant. "
+    "Given a text description and optional images, determine if it indicates a flood. "
+    "If yes, summarize the post, extract the exact location string as it appears in the post, "
+    "Classify severity into one of: [minor, moderate, severe, critical]. "
+    f"Record your answer with the {FLOOD_ANALYSIS_TOOL} tool."
+)
+
+LOCATION_CLASSIFICATION_TOOL = "record_location_classification"
+LOCATION_CLASSIFICATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        key: {"type": "string", "description": f'Matching {key.replace("_", " ")}, or "None" if it does not apply'}
+        for key in ["district", "state", "division", "recreation_centre", "town"]
+    },
+    "required": ["district", "state", "division", "recreation_centre", "town"]
+}
+
 def analyze_flood_post(
     bedrock_handler: BedrockHandler,
     text_input: str,
@@ -68,17 +121,10 @@ def analyze_flood_post(
             "summary": str,
             "location": str,
             "severity": str,
+            "confidence": float,
             "raw_response": dict
         }
     """
-    system_prompt = (
-        "You are a flood detection assistant. "
-        "Given a text description and optional images, determine if it indicates a flood. "
-        "If yes, summarize the post, extract the exact location string as it appears in the post, "
-        "Classify severity into one of: [minor, moderate, severe, critical]. "
-        "Respond in JSON format with keys: is_flood, summary, location, severity."
-    )
-
     if save_to_s3 and image_files:
         image_urls = []
         for img_path in image_files:
@@ -94,39 +140,49 @@ def analyze_flood_post(
               
         user_message = bedrock_handler.user_message(
             message=text_input,
-            context=system_prompt,
+            context=FLOOD_ANALYSIS_PROMPT,
             image_urls=image_urls
         )
     else:
         user_message = bedrock_handler.user_message(
             message=text_input,
-            context=system_prompt,
+            context=FLOOD_ANALYSIS_PROMPT,
             uploaded_files=image_files,
             image_urls=image_urls        
         )
 
-    # Call the Nova model
-    response = bedrock_handler.invoke_model([user_message])
-
-    # Extract structured JSON from model output
-    try:
-        contents = response["output"]["message"]["content"]
-        model_output = " ".join([c["text"] for c in contents if "text" in c])
+    # Call the Nova model, forcing the answer through the analysis tool
+    response = bedrock_handler.invoke_structured(
+        [user_message],
+        FLOOD_ANALYSIS_TOOL,
+        FLOOD_ANALYSIS_SCHEMA,
+        description="Record whether a post reports a flood, and where.",
+        task="flood_analysis"
+    )
 
-        # Strip Markdown fences if present
-        if model_output.strip().startswith("```"):
-            model_output = model_output.strip("`")   # remove backticks
-            if model_output.lower().startswith("json"):
-                model_output = model_output[4:]  # drop "json" after ```
-            model_output = model_output.strip()
+    parsed = bedrock_handler.extract_structured(response, FLOOD_ANALYSIS_TOOL)
 
-        parsed = json.loads(model_output)
-    except Exception:
+    # Retry low-confidence answers once on the larger model
+    router = bedrock_handler.router
+    if router is not None and router.should_escalate((parsed or {}).get("confidence")):
+        escalated_response = bedrock_handler.invoke_structured(
+            [user_message],
+            FLOOD_ANALYSIS_TOOL,
+            FLOOD_ANALYSIS_SCHEMA,
+            description="Record whether a post reports a flood, and where.",
+            task="flood_analysis",
+            model_id=router.escalation_model
+        )
+        escalated = bedrock_handler.extract_structured(escalated_response, FLOOD_ANALYSIS_TOOL)
+        if escalated is not None:
+            response, parsed = escalated_response, escalated
+    if parsed is None:
         parsed = {
             "is_flood": False,
             "summary": "Unable to parse model output",
             "location": None,
-            "severity": "unknown"
+            "severity": "unknown",
+            "confidence": 0.0
         }
 
     return {
@@ -134,78 +190,182 @@ def analyze_flood_post(
         "summary": parsed.get("summary", ""),
         "location": parsed.get("location", ""),
         "severity": parsed.get("severity", "unknown"),
+        "confidence": parsed.get("confidence", 0.0),
         "raw_response": response
     }    
 
+LOCATION_REFERENCE_BUCKET = "myselamat-us"
+LOCATION_REFERENCE_KEY = "weather_api_locations.md"
+_location_reference: Optional[S3CachedDocument] = None
+
+def trim_location_reference(text: str) -> str:
+    """
+    Compact the location reference guide for prompting.
+
+    Keeps the category and region headings and the "- Name: Id" entries, one
+    line per group, and drops the prose, blank lines and usage guidelines.
+    """
+    lines = []
+    category = group = ""
+    entries: list[str] = []
+
+    def flush():
+        if entries:
+            heading = f"{category} / {group}" if group else category
+            lines.append(f"{heading}: " + ", ".join(entries))
+            entries.clear()
+
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if line.startswith("## ") and not line.startswith("### ") and category:
+            # Everything after the location listing is usage guidance
+            break
+        if line.startswith("### "):
+            flush()
+            category, group = re.sub(r"\s*(Locations\s*)?\(.*\)$", "", line[4:]), ""
+        elif re.fullmatch(r"\*{1,2}[^*]+:\*{1,2}", line):
+            flush()
+            group = re.sub(r"\s*\(.*\)", "", line.strip("*").rstrip(":"))
+        elif line.startswith("- ") and category:
+            entries.append(line[2:].replace(": ", "="))
+    flush()
+    return "\n".join(lines)
+
+def get_location_reference(s3_handler: S3Handler) -> str:
+    """Return the trimmed location reference, kept in memory and revalidated by ETag."""
+    global _location_reference
+    if _location_reference is None:
+        _location_reference = S3CachedDocument(
+            s3_handler.client,
+            LOCATION_REFERENCE_BUCKET,
+            LOCATION_REFERENCE_KEY,
+            transform=trim_location_reference
+        )
+    return _location_reference.get()
+
+_kb_retriever: Optional[Union[CachedKBRetriever, LocalKBHandler]] = None
+
+def get_kb_retriever(bedrock_agent_runtime_client) -> Union[CachedKBRetriever, LocalKBHandler]:
+    """Return the long-lived location KB retriever, creating it on first use.
+
+    ``Config.KB_BACKEND = "local"`` selects the offline local vector index.
+    """
+    global _kb_retriever
+    if Config.KB_BACKEND == "local":
+        if not isinstance(_kb_retriever, LocalKBHandler):
+            _kb_retriever = LocalKBHandler.load_or_build(
+                Config.LOCAL_KB_DIR,
+                Config.BEDROCK_CONFIG["kb_configs"],
+                use_ann=Config.LOCAL_KB_USE_ANN
+            )
+        return _kb_retriever
+
+    if not isinstance(_kb_retriever, CachedKBRetriever) or _kb_retriever.kb_handler.client is not bedrock_agent_runtime_client:
+        _kb_retriever = CachedKBRetriever(KBHandler(
+            bedrock_agent_runtime_client,
+            Config.BEDROCK_CONFIG["kb_configs"],
+            kb_id=Config.WEATHER_LOCATION_KB_ID
+        ))
+    return _kb_retriever
+
+def kb_retriever_stats() -> Optional[Dict[str, Any]]:
+    """Cache hit/miss counts of the location KB retriever, or None before first use or for the local index."""
+    if isinstance(_kb_retriever, CachedKBRetriever):
+        return _kb_retriever.stats()
+    return None
+
+def resolve_location_locally(location: str) -> Optional[Dict[str, Any]]:
+    """Resolve a place name from the gazetteer or the classification cache, without Bedrock."""
+    # Resolve unambiguous catalog names locally; only ambiguous or unknown names reach Bedrock
+    resolved = get_gazetteer().classify(location)
+    if resolved is not None:
+        print('classify_location resolved by gazetteer: ', resolved['ordered_locations'])
+        return resolved
+
+    cached = get_location_cache().get(location)
+    if cached is not None:
+        print('classify_location cache hit: ', cached['ordered_locations'])
+        return {**cached, "raw_response": None}
+    return None
+
 def classify_location(
         bedrock_handler: BedrockHandler,
         bedrock_agent_runtime_client, 
         location: str,
         s3_handler: Optional[S3Handler],
     ):
+    resolved = resolve_location_locally(location)
+    if resolved is not None:
+        return resolved
+
+    # Retrieve on the bare place name: better relevance, and repeat names hit the cache
+    retriever = get_kb_retriever(bedrock_agent_runtime_client)
+    docs = retriever.get_relevant_docs(location)
+    return classify_location_with_model(bedrock_handler, retriever, location, docs, s3_handler)
+
+def classify_locations(
+        bedrock_handler: BedrockHandler,
+        bedrock_agent_runtime_client,
+        locations: List[str],
+        s3_handler: Optional[S3Handler],
+    ) -> Dict[str, Dict[str, Any]]:
+    """
+    Classify many place names. Names the gazetteer and cache cannot answer
+    have their KB documents retrieved in one concurrent batch before the
+    model is called for each. Returns ``{location: result}``.
+    """
+    results = {location: resolve_location_locally(location) for location in dict.fromkeys(locations)}
+    pending = [location for location, result in results.items() if result is None]
+    if pending:
+        retriever = get_kb_retriever(bedrock_agent_runtime_client)
+        docs_by_location = retriever.get_relevant_docs_batch(pending)
+        for location in pending:
+            results[location] = classify_location_with_model(
+                bedrock_handler, retriever, location, docs_by_location.get(location, []), s3_handler
+            )
+    return results
+
+def classify_location_with_model(
+        bedrock_handler: BedrockHandler,
+        retriever: Union[CachedKBRetriever, LocalKBHandler],
+        location: str,
+        docs: List[Dict[str, Any]],
+        s3_handler: Optional[S3Handler],
+    ) -> Dict[str, Any]:
+    """Classify a place name with the model, given the KB documents retrieved for it."""
     base_prompt = f"""
     You are a location classification assistant for Malaysian geography.  
-    Given a location name, identify the most accurate category for it.  
-    Return the results in strict JSON format with the following keys:  
-    
-    {{
-      "district": "... or None",
-      "state": "... or None",
-      "division": "... or None",
-      "recreation_centre": "... or None",
-      "town": "... or None"
-    }}
+    Given a location name, identify the most accurate category for it  
+    and record it with the {LOCATION_CLASSIFICATION_TOOL} tool.  
 
     If a field does not apply, return it as "None".  
-    Only return the JSON object, nothing else.  
 
     Location: {location}
     """
-    retriever = KBHandler(
-        bedrock_agent_runtime_client,
-        Config.BEDROCK_CONFIG["kb_configs"],
-        kb_id=Config.WEATHER_LOCATION_KB_ID
-    )
-   
-    docs = retriever.get_relevant_docs(base_prompt)
     kb_context = retriever.parse_kb_output_to_string(docs) if docs else ''
     # --- Step 2: Combine docs + base prompt ---
     final_prompt = base_prompt
     if kb_context:
         final_prompt += f"\n\nRelevant references:\n{kb_context}"
     else:
-        obj = s3_handler.client.get_object(
-            Bucket="myselamat-us",
-            Key="weather_api_locations.md"
-        )
-        reference_text = obj["Body"].read().decode("utf-8")
+        reference_text = get_location_reference(s3_handler)
         final_prompt += f"\n\nRelevant references:\n{reference_text}"
     
     user_message = bedrock_handler.user_message(
         message=final_prompt,
     )
-    # Call the Nova model
-    response = bedrock_handler.invoke_model([user_message])
+    # Call the Nova model, forcing the answer through the classification tool
+    response = bedrock_handler.invoke_structured(
+        [user_message],
+        LOCATION_CLASSIFICATION_TOOL,
+        LOCATION_CLASSIFICATION_SCHEMA,
+        description="Record the Malaysian administrative categories of a place name.",
+        task="location_classification"
+    )
     print('classify_location response: ', response)
 
-    # Extract structured JSON from model output
-    try:
-        contents = response["output"]["message"]["content"]
-        model_output = " ".join([c["text"] for c in contents if "text" in c])
-
-        # Strip Markdown fences if present
-        if model_output.strip().startswith("```"):
-            model_output = model_output.strip("`")   # remove backticks
-            if model_output.lower().startswith("json"):
-                model_output = model_output[4:]  # drop "json" after ```
-            model_output = model_output.strip()
-
-        parsed = json.loads(model_output)
-        # Order results by granularity
-        priority_order = ["town", "recreation_centre", "district", "division", "state"]
-        ordered_locations = [parsed[key] for key in priority_order if parsed.get(key) and parsed[key] != "None"]
-        print('ordered_locations: ', ordered_locations)
-    except Exception:
+    parsed = bedrock_handler.extract_structured(response, LOCATION_CLASSIFICATION_TOOL)
+    if parsed is None:
         parsed = {
             "district": None,
             "state": None,
@@ -213,8 +373,13 @@ def classify_location(
             "recreation_centre": None,
             "town": None
         }
+
+    # Order results by granularity
+    priority_order = ["town", "recreation_centre", "district", "division", "state"]
+    ordered_locations = [parsed[key] for key in priority_order if parsed.get(key) and parsed[key] != "None"]
+    print('ordered_locations: ', ordered_locations)
     
-    return {
+    result = {
         "district": parsed.get("district", "unknown"),
         "state": parsed.get("state", "unknown"),
         "division": parsed.get("division", "unknown"),
@@ -222,7 +387,10 @@ def classify_location(
         "town": parsed.get("town", "unknown"),
         "ordered_locations": ordered_locations,
         "raw_response": response
-    }   
+    }
+    if ordered_locations:
+        get_location_cache().put(location, result)
+    return result
 
 if __name__ == "__main__":
     bedrock_handler, bedrock_agent_runtime_client = init_bedrock()
@@ -17,10 +17,18 @@ from utils.aws_client import SESHandler
 # Add the current directory to Python path for imports
 sys.path.append(str(Path(__file__).parent))
 
-from utils.orchestration.check_user_input import analyze_flood_post, classify_location, init_bedrock
+from utils.orchestration.check_user_input import analyze_flood_post, classify_location, init_bedrock, kb_retriever_stats
+from utils.orchestration.location_cache import get_location_cache
+from utils.geo_resolver import get_geo_resolver
+from utils.orchestration.flood_features import get_feature_builder
 from utils.orchestration.ml_inference import forecast_flood
-from utils.orchestration.tweet import search_tweets
+from utils.orchestration.tweet import flood_query
+from utils.orchestration.tweet_store import get_tweet_poller
+from utils.orchestration.tweet_stream import get_tweet_counts, get_tweet_stream, start_tweet_stream
 from utils.orchestration.weather import get_weather
+from utils.weather.gazetteer import normalize_location_name
+from utils.orchestration.flood_warning import get_flood_warnings
+from utils.orchestration.warning_transitions import get_warning_differ, start_warning_poller
 from config_setting import Config
 from utils.aws_client import S3Handler
 
@@ -37,6 +45,9 @@ class FloodAlertOrchestrator:
         self.s3_handler = None
         self.initialized = False
         self.ses_client = None
+        self.active_escalations: Dict[str, Dict[str, Any]] = {}
+        self._unsubscribe_transitions = None
+        self._unsubscribe_stream = None
     
     async def initialize(self):
         """Initialize all required services"""
@@ -53,6 +64,18 @@ class FloodAlertOrchestrator:
                 Config.AWS_SECRET_ACCESS_KEY, 
                 region_name=Config.BEDROCK_CONFIG["regions"]["N. Virginia"]
             )
+            warmed = get_location_cache().stats()["entries"]
+            logger.info(f"Location cache warmed with {warmed} entries")
+            self._unsubscribe_transitions = [get_warning_differ().subscribe(self._on_warning_transition)]
+            if Config.WARNING_ALERT_MIN_LEVEL:
+                from utils.orchestration.send_email import transition_alert_subscriber
+                self._unsubscribe_transitions.append(get_warning_differ().subscribe_snapshot(
+                    transition_alert_subscriber(self.bedrock_handler, self.ses_client, Config.WARNING_ALERT_MIN_LEVEL)
+                ))
+            start_warning_poller()
+            tweet_stream = start_tweet_stream()
+            if tweet_stream is not None:
+                self._unsubscribe_stream = tweet_stream.subscribe(self._on_stream_tweet)
             self.initialized = True
             logger.info("Services initialized successfully")
         except Exception as e:
@@ -64,7 +87,8 @@ class FloodAlertOrchestrator:
                                  image_files: Optional[list] = None,
                                  image_urls: Optional[list] = None,
                                  save_to_s3: bool = False,
-                                 s3_bucket: Optional[str] = None) -> Dict[str, Any]:
+                                 s3_bucket: Optional[str] = None,
+                                 coordinates: Optional[tuple] = None) -> Dict[str, Any]:
         """
         Complete workflow for processing a flood report
         
@@ -73,6 +97,8 @@ class FloodAlertOrchestrator:
             image_files: Optional list of image file paths
             save_to_s3: Whether to save images to S3
             s3_bucket: S3 bucket name for image storage
+            coordinates: Optional (lat, lon) of the reporter; resolved locally
+                in preference to classifying the text location
             
         Returns:
             Complete flood report with all data sources
@@ -96,6 +122,7 @@ class FloodAlertOrchestrator:
         )
         
         logger.info(f"Flood analysis result: {flood_analysis['is_flood']}")
+        logger.info(f"Bedrock {self.bedrock_handler.structured_stats.summary()}")
         
         # If MLLM determines it's not a flood, stop processing
         if not flood_analysis['is_flood']:
@@ -109,9 +136,19 @@ class FloodAlertOrchestrator:
         # Step 2: MCP orchestration - gather additional data
         logger.info("Step 2: MCP orchestration - gathering additional data")
         
+        # Resolve coordinates against the boundary index when the report has them
+        location_data = None
+        if coordinates:
+            lat, lon = coordinates
+            location_data = get_geo_resolver().classify(float(lat), float(lon))
+            if location_data:
+                logger.info(f"Resolved coordinates ({lat}, {lon}) to {location_data['ordered_locations']}")
+            else:
+                logger.warning(f"Coordinates ({lat}, {lon}) are outside the boundary index")
+
         # Extract location from flood analysis
         location = flood_analysis.get('location', '')
-        if not location:
+        if not location_data and not location:
             logger.warning("No location found in flood analysis")
             return {
                 "status": "incomplete",
@@ -120,22 +157,27 @@ class FloodAlertOrchestrator:
             }
         
         # Classify location
-        logger.info(f"Classifying location: {location}")
-        location_data = classify_location(
-            self.bedrock_handler,
-            self.bedrock_agent_runtime_client,
-            location,
-            self.s3_handler
-        )
+        if not location_data:
+            logger.info(f"Classifying location: {location}")
+            location_data = classify_location(
+                self.bedrock_handler,
+                self.bedrock_agent_runtime_client,
+                location,
+                self.s3_handler
+            )
+            if location_data.get("raw_response") is not None:
+                logger.info(f"KB retriever {kb_retriever_stats()}")
 
         # Step 3: Model flood prediction using forecast_flood
         logger.info("Step 3: Model flood prediction using trained classification ML")
 
-        model_input = {
-            "inputs": [12.5, 0.0, 5.0, 8.2, 0.0, 10.1, 3.0, 0.0, 1.2, 6.3, 150.0, 1.0]
-        }
         try:
-            model_pred_result = forecast_flood(model_input)
+            model_input = get_feature_builder().build_for_locations(location_data['ordered_locations'])
+            logger.info(f"Model input: {model_input['inputs']}")
+            if model_input["imputed"]:
+                logger.warning(f"Imputed model features: {model_input['imputed']}")
+            model_pred_result = forecast_flood({"inputs": model_input["inputs"]})
+            model_pred_result["imputed_features"] = model_input["imputed"]
         except Exception as e:
             logger.error(f"Model prediction failed: {e}")
             model_pred_result = {"status":"failed", "error": str(e)}
@@ -144,7 +186,7 @@ class FloodAlertOrchestrator:
         # Search Twitter for additional reports
         logger.info("Searching Twitter for additional flood reports...")
         twitter_q = [location_data['ordered_locations'][0], 'Malaysia']
-        twitter_data = await self._search_twitter_flood_reports(twitter_q)
+        twitter_data = await self._search_twitter_flood_reports(twitter_q, location_data['ordered_locations'])
         
         # Get weather forecast
         logger.info("Getting weather forecast...")
@@ -171,22 +213,28 @@ class FloodAlertOrchestrator:
         logger.info("Flood report processing completed successfully")
         return consolidated_report
     
-    async def _search_twitter_flood_reports(self, location) -> Dict[str, Any]:
+    async def _search_twitter_flood_reports(self, location, ordered_locations: Optional[list] = None) -> Dict[str, Any]:
         """Search Twitter for flood reports in the area"""
         try:
-            # Handle both single location string and list of locations
-            if isinstance(location, list):
-                # Create OR query for multiple locations
-                location_query = " OR ".join(location)
-                query = f'(banjir OR flood OR 水灾 OR natural disaster) ({location_query}) -is:retweet'
-            else:
-                # Single location
-                query = f'(banjir OR flood OR 水灾 OR natural disaster) {location} -is:retweet'
-            tweets = search_tweets(query, max_results=10)
+            query = flood_query(location)
+            if get_tweet_stream() is not None:
+                # Ingested stream tweets answer the lookup without a search call
+                lookup = ordered_locations or (location if isinstance(location, list) else [location])
+                tweets = get_tweet_counts().search_result(lookup) or {"meta": {"result_count": 0}}
+                return {
+                    "status": "success",
+                    "data": tweets,
+                    "query": query,
+                    "source": "stream"
+                }
+            # New tweets since the location's last poll, then counts and samples from the local store
+            # An inline poll can queue on the rate-limit scheduler; keep the event loop free
+            tweets = await asyncio.to_thread(get_tweet_poller().lookup, location)
             return {
                 "status": "success",
                 "data": tweets,
-                "query": query
+                "query": query,
+                "source": "poll"
             }
         except Exception as e:
             logger.error(f"Twitter search failed: {e}")
@@ -212,41 +260,52 @@ class FloodAlertOrchestrator:
                 "data": []
             }
     
+    def _on_warning_transition(self, event: Dict[str, Any]):
+        """Track stations currently escalated above NORMAL"""
+        if event["level"] == "NORMAL":
+            self.active_escalations.pop(event["station_id"], None)
+        else:
+            self.active_escalations[event["station_id"]] = event
+        if event["escalated"]:
+            logger.warning(
+                f"Station {event['station_id']} ({event['district']}, {event['state']}) "
+                f"escalated {event['previous_level']} -> {event['level']}"
+            )
+
+    def _on_stream_tweet(self, tweet: Dict[str, Any], locations: list):
+        """Surface streamed flood tweets from districts with an escalated warning station"""
+        escalated = {
+            normalize_location_name(event["district"]) for event in self.active_escalations.values() if event.get("district")
+        }
+        overlap = escalated.intersection(locations)
+        if overlap:
+            logger.warning(f"Flood tweet {tweet.get('id')} from escalated area {sorted(overlap)}: {tweet.get('text', '')[:140]}")
+
+    def close(self):
+        """Stop receiving warning transitions and streamed tweets"""
+        for unsubscribe in self._unsubscribe_transitions or []:
+            unsubscribe()
+        self._unsubscribe_transitions = None
+        if self._unsubscribe_stream:
+            self._unsubscribe_stream()
+            self._unsubscribe_stream = None
+
     async def _get_flood_warnings(self, locations: str) -> Dict[str, Any]:
         """Get official flood warnings"""
         try:
-            import requests
-            url = "https://api.data.gov.my/flood-warning"
-            response = requests.get(url)
-            response.raise_for_status()
-            
-            flood_data = response.json()
-            
-            # Try from most specific (town) to broader (state)
-            for location in locations:
-                # Filter by station_name, district, or state
-                flood_warnings = [
-                    station for station in flood_data
-                    if location.lower() in station.get("station_name", "").lower()
-                    or location.lower() in station.get("station_id", "").lower()
-                    or location.lower() in station.get("district", "").lower()
-                    or location.lower() in station.get("state", "").lower()
-                ]
-
-                if flood_warnings:  # Found match
-                    print(f"✅ Found flood warning for '{location}'")
-                    return {
-                        "status": "success",
-                        "data": {
-                            "location": location,
-                            "matching_stations": flood_warnings,
-                            "total_stations": len(flood_data),
-                            "matches_found": len(flood_warnings)
-                        }
-                    }
-
-            print(f"⚠️ None of the locations {locations} were found in API response.")
-            return None
+            flood_warnings = get_flood_warnings(locations)
+            if flood_warnings is None:
+                return None
+            get_warning_differ().update(flood_warnings["matching_stations"])
+            station_ids = {station.get("station_id") for station in flood_warnings["matching_stations"]}
+            flood_warnings["recent_transitions"] = [
+                {key: value for key, value in event.items() if key != "station"}
+                for event in get_warning_differ().recent_events(station_ids=station_ids, limit=20)
+            ]
+            return {
+                "status": "success",
+                "data": flood_warnings
+            }
             
         except Exception as e:
             logger.error(f"Flood warning API failed: {e}")
@@ -320,7 +379,7 @@ class FloodAlertOrchestrator:
             context=system_prompt
         )
 
-        response =self.bedrock_handler.invoke_model([user_message])
+        response =self.bedrock_handler.invoke_model([user_message], task="report_summary")
 
         summary = None
         try:
@@ -0,0 +1,174 @@
+"""
+Feature vectors for the flood classification endpoint.
+
+The model takes 12 features per location: daily rainfall for the 10 days
+ending on the report day (oldest first), altitude in metres and a continent
+code. The forecast feed carries no rainfall amounts, so each day's rainfall is
+estimated from the forecast conditions kept in the weather store (which
+retains past days). Altitude comes from an optional ``{location_id: metres}``
+table, defaulting to ``DEFAULT_ALTITUDE_M``.
+
+Values that are fills rather than data for the location (days the store has
+no forecast for, the default altitude) are reported alongside each row by
+name, so callers can tell how much of a prediction rests on imputation.
+
+Rows are built for many locations with one store query and cached per
+(location, day) until the next weather refresh.
+"""
+
+import json
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from cachetools import TTLCache
+
+from config_setting import Config
+from utils.orchestration.flood_schema import (
+    CONTINENT_ASIA, DEFAULT_ALTITUDE_M, FEATURE_NAMES, NUM_FEATURES, RAINFALL_DAYS
+)
+from utils.orchestration.weather_store import WeatherStore, get_weather_store
+
+# Estimated millimetres for a forecast period, by condition keyword (first match wins)
+CONDITION_RAINFALL_MM = [
+    ("tiada hujan", 0.0),
+    ("ribut petir", 20.0),
+    ("hujan lebat", 30.0),
+    ("hujan", 10.0),
+    ("berjerebu", 0.0),
+    ("berangin", 0.0),
+]
+# Scales the estimate by how widespread the forecast says the rain is
+COVERAGE_FACTORS = [
+    ("satu dua tempat", 0.3),
+    ("beberapa tempat", 0.6),
+    ("menyeluruh", 1.5),
+]
+FORECAST_PERIODS = ("morning_forecast", "afternoon_forecast", "night_forecast")
+
+
+def estimate_rainfall(condition: Optional[str]) -> float:
+    """Estimated rainfall in mm for one forecast condition text (Malay)."""
+    if not condition:
+        return np.nan
+    text = condition.lower()
+    amount = next((mm for keyword, mm in CONDITION_RAINFALL_MM if keyword in text), 0.0)
+    factor = next((scale for keyword, scale in COVERAGE_FACTORS if keyword in text), 1.0)
+    return amount * factor
+
+
+def daily_rainfall(entry: Dict) -> float:
+    """Estimated rainfall for a forecast day, summing its morning, afternoon and night periods."""
+    periods = [estimate_rainfall(entry.get(period)) for period in FORECAST_PERIODS]
+    if all(np.isnan(periods)):
+        return estimate_rainfall(entry.get("summary_forecast")) * len(FORECAST_PERIODS)
+    return float(np.nansum(periods))
+
+
+class FloodFeatureBuilder:
+    """Builds (n, 12) feature matrices from the weather store."""
+
+    def __init__(self, store: WeatherStore, altitudes: Optional[Dict[str, float]] = None, cache_ttl: float = 3600):
+        self.store = store
+        self.altitudes = altitudes or {}
+        self._cache: TTLCache = TTLCache(maxsize=4096, ttl=cache_ttl)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def load_altitudes(path: Optional[str]) -> Dict[str, float]:
+        if not path or not Path(path).exists():
+            return {}
+        with open(path, encoding="utf-8") as f:
+            return {location_id: float(metres) for location_id, metres in json.load(f).items()}
+
+    def _rainfall_matrix(self, location_ids: List[str], day: date) -> np.ndarray:
+        """(n, RAINFALL_DAYS) estimated rainfall, NaN where the store has no forecast."""
+        start = day - timedelta(days=RAINFALL_DAYS - 1)
+        matrix = np.full((len(location_ids), RAINFALL_DAYS), np.nan)
+        rows = {location_id: row for row, location_id in enumerate(location_ids)}
+        for location_id, entry_date, entry in self.store.daily_entries(location_ids, start.isoformat(), day.isoformat()):
+            offset = (date.fromisoformat(entry_date[:10]) - start).days
+            matrix[rows[location_id], offset] = daily_rainfall(entry)
+        return matrix
+
+    def build(self, location_ids: Sequence[str], day: Optional[date] = None) -> np.ndarray:
+        """Feature matrix with one row per location id, in order."""
+        return self.build_with_imputed(location_ids, day)[0]
+
+    def build_with_imputed(self, location_ids: Sequence[str], day: Optional[date] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Feature matrix and a same-shaped mask of the values that were imputed."""
+        day = day or date.today()
+        features = np.empty((len(location_ids), NUM_FEATURES))
+        imputed = np.zeros((len(location_ids), NUM_FEATURES), dtype=bool)
+        with self._lock:
+            cached = [self._cache.get((location_id, day)) for location_id in location_ids]
+        missing = [location_id for location_id, row in zip(location_ids, cached) if row is None]
+
+        if missing:
+            rainfall = self._rainfall_matrix(missing, day)
+            # Days the store never saw take the location's mean over the days it did
+            known = ~np.isnan(rainfall)
+            means = np.where(known.any(axis=1), np.nansum(rainfall, axis=1) / np.maximum(known.sum(axis=1), 1), 0.0)
+            rainfall = np.where(known, rainfall, means[:, None])
+
+            built = np.column_stack([
+                rainfall,
+                [self.altitudes.get(location_id, DEFAULT_ALTITUDE_M) for location_id in missing],
+                np.full(len(missing), CONTINENT_ASIA)
+            ])
+            built_imputed = np.column_stack([
+                ~known,
+                [location_id not in self.altitudes for location_id in missing],
+                np.zeros(len(missing), dtype=bool)
+            ])
+            with self._lock:
+                for location_id, row, mask in zip(missing, built, built_imputed):
+                    self._cache[(location_id, day)] = (row, mask)
+            rows = dict(zip(missing, zip(built, built_imputed)))
+            cached = [entry if entry is not None else rows[location_id] for location_id, entry in zip(location_ids, cached)]
+
+        for index, (row, mask) in enumerate(cached):
+            features[index] = row
+            imputed[index] = mask
+        return features, imputed
+
+    def build_for_locations(self, ordered_locations: Sequence[str], day: Optional[date] = None) -> Dict[str, Any]:
+        """
+        Model input for a report: features for the most specific of the
+        ``classify_location`` names that the weather store knows, with the
+        names of the features that were imputed.
+        """
+        self.store.ensure_fresh()
+        location_id = next(
+            (ids[0] for ids in (self.store.location_ids(name) for name in ordered_locations) if ids),
+            None
+        )
+        if location_id is None:
+            print(f"⚠️ No weather history for {list(ordered_locations)}; using default features")
+            features = np.concatenate([np.zeros(RAINFALL_DAYS), [DEFAULT_ALTITUDE_M, CONTINENT_ASIA]])
+            imputed = np.array(FEATURE_NAMES) != "continent"
+        else:
+            features, imputed = self.build_with_imputed([location_id], day)
+            features, imputed = features[0], imputed[0]
+        return {
+            "inputs": [round(float(value), 3) for value in features],
+            "location_id": location_id,
+            "imputed": [name for name, flag in zip(FEATURE_NAMES, imputed) if flag]
+        }
+
+
+_feature_builder: Optional[FloodFeatureBuilder] = None
+
+
+def get_feature_builder() -> FloodFeatureBuilder:
+    """Return the process-wide feature builder."""
+    global _feature_builder
+    if _feature_builder is None:
+        _feature_builder = FloodFeatureBuilder(
+            get_weather_store(),
+            altitudes=FloodFeatureBuilder.load_altitudes(Config.LOCATION_ALTITUDE_PATH),
+            cache_ttl=Config.WEATHER_REFRESH_INTERVAL
+        )
+    return _feature_builder
@@ -0,0 +1,14 @@
+"""
+Input layout of the flood classification model.
+
+Kept free of other project imports so model backends, the feature builder and
+tools can share it without pulling in the weather store or AWS clients.
+"""
+
+RAINFALL_DAYS = 10
+NUM_FEATURES = RAINFALL_DAYS + 2
+# Rainfall days are numbered back from the report day (rainfall_d0)
+FEATURE_NAMES = [f"rainfall_d{RAINFALL_DAYS - 1 - day}" for day in range(RAINFALL_DAYS)] + ["altitude_m", "continent"]
+DEFAULT_ALTITUDE_M = 150.0
+# Continent code used in training; every location served here is in Asia
+CONTINENT_ASIA = 1.0
@@ -0,0 +1,130 @@
+"""
+Official flood warnings from the data.gov.my ``flood-warning`` API.
+
+Each candidate location is one filtered request: ``icontains=<location>@<column>``
+on the column the name belongs to (state or district per the gazetteer, a
+station id as such, anything else the station name), with an ``include``
+projection of the columns the report reads and a row limit, so only matching
+stations are transferred. If a filtered request fails, the national station
+list (cached for ``FLOOD_WARNING_CACHE_TTL``) is matched locally instead.
+"""
+
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+
+import requests
+
+from config_setting import Config
+from utils.http_client import get_http_client
+from utils.weather.gazetteer import get_gazetteer
+
+FLOOD_WARNING_URL = "https://api.data.gov.my/flood-warning"
+MATCH_FIELDS = ("station_name", "station_id", "district", "state")
+# Columns read by the report, the transition differ and the archive
+WARNING_COLUMNS = (
+    "station_id", "station_name", "district", "state", "latitude", "longitude",
+    "water_level_current", "water_level_indicator", "water_level_trend", "water_level_update_datetime",
+    "water_level_normal_level", "water_level_alert_level", "water_level_warning_level", "water_level_danger_level",
+)
+MAX_STATIONS = 200
+STATION_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]*\d[A-Za-z0-9_-]*")
+
+_stations: Optional[List[Dict[str, Any]]] = None
+_stations_fetched_at = 0.0
+_stations_lock = threading.Lock()
+
+
+def fetch_stations() -> List[Dict[str, Any]]:
+    """All flood-warning stations, fetched at most once per cache TTL. Used when filtered queries fail."""
+    global _stations, _stations_fetched_at
+    with _stations_lock:
+        if _stations is None or time.time() - _stations_fetched_at >= Config.FLOOD_WARNING_CACHE_TTL:
+            _stations = get_http_client().get_json(FLOOD_WARNING_URL)
+            _stations_fetched_at = time.time()
+        return _stations
+
+
+def match_stations(stations: List[Dict[str, Any]], location: str) -> List[Dict[str, Any]]:
+    """Stations whose name, id, district or state contains the location."""
+    needle = location.lower()
+    return [
+        station for station in stations
+        if any(needle in (station.get(field) or "").lower() for field in MATCH_FIELDS)
+    ]
+
+
+def location_column(location: str) -> str:
+    """The station column a location name is filtered on."""
+    if STATION_ID_PATTERN.fullmatch(location.strip()):
+        return "station_id"
+    match = get_gazetteer().lookup(location)
+    categories = {record["category"] for record in match["records"]} if match["kind"] == "exact" else set()
+    if "State" in categories:
+        return "state"
+    if categories & {"District", "Division"}:
+        return "district"
+    return "station_name"
+
+
+def query_stations(location: str) -> List[Dict[str, Any]]:
+    """Stations matching a location, filtered and projected by the API in one request."""
+    stations = get_http_client().get_json(
+        FLOOD_WARNING_URL,
+        params={
+            "icontains": f"{location}@{location_column(location)}",
+            "include": ",".join(WARNING_COLUMNS),
+            "limit": MAX_STATIONS
+        }
+    )
+    if not isinstance(stations, list):
+        raise ValueError(f"unexpected flood-warning response: {str(stations)[:200]}")
+    return stations
+
+
+def _result(location: str, warnings: List[Dict[str, Any]], total_stations: Optional[int]) -> Dict[str, Any]:
+    warnings.sort(key=lambda station: station.get("date", ""))
+    print(f"✅ Found flood warning for '{location}'")
+    return {
+        "location": location,
+        "matching_stations": warnings,
+        # Unknown when the API filtered the dataset for us
+        "total_stations": total_stations,
+        "matches_found": len(warnings)
+    }
+
+
+def get_flood_warnings(locations: Union[str, List[str]]) -> Optional[Dict[str, Any]]:
+    """
+    Find flood-warning stations for the first matching location.
+
+    Args:
+        locations: Location name, or a list ordered from most specific (town) to broadest (state)
+
+    Returns:
+        dict: ``location``, ``matching_stations``, ``total_stations`` and ``matches_found``,
+        or None if no station matched any location.
+    """
+    if isinstance(locations, str):
+        locations = [locations]
+
+    try:
+        # Try from most specific (town) to broader (state)
+        for location in locations:
+            warnings = query_stations(location)
+            if warnings:
+                return _result(location, warnings, None)
+        print(f"⚠️ None of the locations {locations} were found in API response.")
+        return None
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"⚠️ Filtered flood-warning query failed ({e}), matching the cached station list")
+
+    stations = fetch_stations()
+    for location in locations:
+        warnings = match_stations(stations, location)
+        if warnings:
+            return _result(location, warnings, len(stations))
+
+    print(f"⚠️ None of the locations {locations} were found in API response.")
+    return None
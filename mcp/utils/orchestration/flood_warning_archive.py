@@ -0,0 +1,273 @@
+"""
+Historical archive of flood-warning station readings.
+
+A collector snapshots the data.gov.my ``flood-warning`` feed on a schedule and
+appends readings that changed since the previous snapshot to a Parquet dataset
+partitioned by reading date (``date=YYYY-MM-DD/``). Files are sorted by
+station and reading time so per-station range scans read little beyond the
+partitions in range; ``compact`` merges a day's snapshot files into one.
+
+Run from ``mcp/`` with ``python -m utils.orchestration.flood_warning_archive``.
+"""
+
+import argparse
+import functools
+import json
+import math
+import operator
+import os
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from config_setting import Config
+from utils.http_client import get_http_client
+from utils.orchestration.flood_warning import FLOOD_WARNING_URL
+from utils.orchestration.warning_transitions import get_warning_differ
+
+SCHEMA = pa.schema([
+    ("station_id", pa.string()),
+    ("station_name", pa.string()),
+    ("district", pa.string()),
+    ("state", pa.string()),
+    ("latitude", pa.float64()),
+    ("longitude", pa.float64()),
+    ("reading_time", pa.timestamp("s")),
+    ("collected_at", pa.timestamp("s")),
+    ("water_level", pa.float64()),
+    ("water_level_trend", pa.string()),
+    ("water_level_indicator", pa.string()),
+    # The full feed row, so fields not promoted to columns are still recoverable
+    ("record", pa.string()),
+])
+PARTITION_SCHEMA = pa.schema([("date", pa.string())])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+LAST_READINGS_FILE = "_last_readings.json"
+# Columns identifying one reading; the same fields make up a station's fingerprint
+READING_KEY = ("station_id", "reading_time", "water_level")
+
+# Feed field names tried in order for each promoted column
+FIELD_CANDIDATES = {
+    "reading_time": ("water_level_update_datetime", "date"),
+    "water_level": ("water_level_current", "water_level"),
+}
+
+
+def _first(row: Dict[str, Any], column: str) -> Any:
+    for field in FIELD_CANDIDATES.get(column, (column,)):
+        if row.get(field) not in (None, ""):
+            return row[field]
+    return None
+
+
+def _to_float(value: Any) -> Optional[float]:
+    """Float value, or None when missing, malformed or NaN (NaN never equals itself in a fingerprint)."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+def _to_datetime(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+class FloodWarningArchive:
+    """Append-only, date-partitioned Parquet archive of station readings."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._last_path = self.root / LAST_READINGS_FILE
+        self._last: Dict[str, List[Any]] = {}
+        if self._last_path.exists():
+            with open(self._last_path, encoding="utf-8") as f:
+                self._last = json.load(f)
+
+    def _rows(self, stations: List[Dict[str, Any]], collected_at: datetime) -> Tuple[List[Dict[str, Any]], Dict[str, List[Any]]]:
+        """
+        Feed rows whose reading differs from the last one archived for the
+        station, and the fingerprints to record once they are written.
+        """
+        rows, fingerprints = [], {}
+        for station in stations:
+            station_id = station.get("station_id")
+            if not station_id:
+                continue
+            reading_time = _to_datetime(_first(station, "reading_time")) or collected_at
+            water_level = _to_float(_first(station, "water_level"))
+            fingerprint = [reading_time.isoformat(), water_level]
+            if fingerprints.get(station_id, self._last.get(station_id)) == fingerprint:
+                continue
+            fingerprints[station_id] = fingerprint
+            rows.append({
+                "station_id": station_id,
+                "station_name": station.get("station_name"),
+                "district": station.get("district"),
+                "state": station.get("state"),
+                "latitude": _to_float(station.get("latitude")),
+                "longitude": _to_float(station.get("longitude")),
+                "reading_time": reading_time,
+                "collected_at": collected_at,
+                "water_level": water_level,
+                "water_level_trend": station.get("water_level_trend"),
+                "water_level_indicator": station.get("water_level_indicator"),
+                "record": json.dumps(station, ensure_ascii=False, default=str),
+            })
+        return rows, fingerprints
+
+    def append(self, stations: List[Dict[str, Any]], collected_at: Optional[datetime] = None) -> int:
+        """
+        Archive the changed readings from one feed snapshot. Returns the number
+        of rows written. Fingerprints are only recorded once every partition
+        file is in place, so a failed write is retried by the next snapshot.
+        """
+        collected_at = (collected_at or datetime.now()).replace(microsecond=0)
+        rows, fingerprints = self._rows(stations, collected_at)
+        if not rows:
+            return 0
+
+        table = pa.Table.from_pylist(rows, schema=SCHEMA)
+        table = table.sort_by([("station_id", "ascending"), ("reading_time", "ascending")])
+        days = pc.strftime(table["reading_time"], format="%Y-%m-%d")
+        for day in pc.unique(days).to_pylist():
+            partition = self.root / f"date={day}"
+            partition.mkdir(exist_ok=True)
+            part = table.filter(pc.equal(days, day))
+            # Dot-prefixed until complete, so scans never read a partial file
+            tmp_path = partition / f".part-{uuid.uuid4().hex[:8]}.tmp"
+            pq.write_table(part, tmp_path)
+            os.replace(tmp_path, partition / f"part-{collected_at:%H%M%S}-{uuid.uuid4().hex[:8]}.parquet")
+
+        self._last.update(fingerprints)
+        tmp_path = self._last_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._last, f)
+        os.replace(tmp_path, self._last_path)
+        return len(rows)
+
+    def dataset(self) -> ds.Dataset:
+        return ds.dataset(
+            self.root,
+            format="parquet",
+            schema=pa.unify_schemas([SCHEMA, PARTITION_SCHEMA]),
+            partitioning=PARTITIONING,
+            exclude_invalid_files=True
+        )
+
+    def scan(
+        self,
+        station_ids: Optional[List[str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        columns: Optional[List[str]] = None,
+    ) -> pa.Table:
+        """Readings in [start, end) for the given stations, pruning partitions outside the range."""
+        clauses = []
+        if start is not None:
+            clauses.append(ds.field("date") >= start.strftime("%Y-%m-%d"))
+            clauses.append(ds.field("reading_time") >= pa.scalar(start, pa.timestamp("s")))
+        if end is not None:
+            clauses.append(ds.field("date") <= end.strftime("%Y-%m-%d"))
+            clauses.append(ds.field("reading_time") < pa.scalar(end, pa.timestamp("s")))
+        if station_ids:
+            clauses.append(ds.field("station_id").isin(station_ids))
+        expression = functools.reduce(operator.and_, clauses) if clauses else None
+
+        table = self.dataset().to_table(columns=columns, filter=expression)
+        return table.sort_by([("station_id", "ascending"), ("reading_time", "ascending")])
+
+    def water_level_series(
+        self,
+        station_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(reading times as datetime64[s], water levels) for one station."""
+        table = self.scan([station_id], start, end, columns=["station_id", "reading_time", "water_level"])
+        times = table["reading_time"].to_numpy()
+        levels = table["water_level"].to_numpy(zero_copy_only=False)
+        return times, levels
+
+    def compact(self, day: date) -> int:
+        """
+        Merge one day's snapshot files into a single sorted file, keeping the
+        first-collected copy of readings archived more than once (e.g. a
+        snapshot retried after a failed write). Returns the row count.
+        """
+        partition = self.root / f"date={day.isoformat()}"
+        files = sorted(partition.glob("*.parquet"))
+        if len(files) < 2:
+            return 0
+        table = pa.concat_tables([pq.read_table(path, schema=SCHEMA) for path in files])
+        table = table.sort_by([(column, "ascending") for column in (*READING_KEY, "collected_at")])
+        table = table.filter(_first_of_each(table, READING_KEY))
+        tmp_path = partition / f".compact-{uuid.uuid4().hex[:8]}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, partition / f"part-compacted-{uuid.uuid4().hex[:8]}.parquet")
+        for path in files:
+            path.unlink()
+        return table.num_rows
+
+
+def _first_of_each(table: pa.Table, key: Tuple[str, ...]) -> np.ndarray:
+    """Mask of the first row of each run of equal ``key`` values in a sorted table."""
+    first = np.ones(table.num_rows, dtype=bool)
+    if table.num_rows < 2:
+        return first
+    differs = np.zeros(table.num_rows - 1, dtype=bool)
+    for column in key:
+        values = table[column]
+        # Nulls compare equal to each other here, unlike NaN
+        nulls = values.is_null().to_numpy(zero_copy_only=False)
+        filled = values.to_numpy(zero_copy_only=False)
+        differs |= (nulls[1:] != nulls[:-1]) | (~nulls[1:] & ~nulls[:-1] & (filled[1:] != filled[:-1]))
+    first[1:] = differs
+    return first
+
+
+def collect_once(archive: "FloodWarningArchive") -> int:
+    """Snapshot the feed once and archive the changed readings."""
+    stations = get_http_client().get_json(FLOOD_WARNING_URL)
+    get_warning_differ().update(stations)
+    written = archive.append(stations)
+    print(f"✅ Archived {written} changed readings from {len(stations)} stations")
+    return written
+
+
+def get_flood_warning_archive() -> FloodWarningArchive:
+    return FloodWarningArchive(Config.FLOOD_ARCHIVE_DIR)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collect flood-warning readings into the Parquet archive")
+    parser.add_argument("--interval", type=float, default=0, help="Seconds between snapshots; 0 collects once")
+    parser.add_argument("--compact", action="store_true", help="Compact yesterday's partition and exit")
+    args = parser.parse_args()
+
+    archive = get_flood_warning_archive()
+    if args.compact:
+        print(f"✅ Compacted {archive.compact(date.today() - timedelta(days=1))} rows")
+    else:
+        while True:
+            try:
+                collect_once(archive)
+            except Exception as e:
+                print("❌ Flood-warning snapshot failed:", e)
+            if not args.interval:
+                break
+            time.sleep(args.interval)
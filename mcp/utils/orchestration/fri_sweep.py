@@ -0,0 +1,173 @@
+"""
+Nationwide flood-risk sweep producing the FRI zone file.
+
+The dashboards (``frontend/map.js``, ``authority.js``, ``sos.js``) read
+``fri.latest.json``: one entry per mukim zone with its polygon and a
+GREEN/YELLOW/ORANGE/RED level. The sweep maps every zone to the most specific
+weather location the store knows (mukim, then district, then state), builds
+one feature row per distinct location, runs the flood model once over all of
+them and turns the probabilities into levels.
+
+Only zones whose level changed are rewritten; the file itself is replaced
+atomically, and not at all when no level changed.
+
+Run from ``mcp/`` with ``python -m utils.orchestration.fri_sweep --output
+<path>`` (or set ``FRI_OUTPUT_PATH``). There is deliberately no default: the
+tracked ``mocks/fri.latest.json`` is only overwritten when named explicitly.
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config_setting import Config
+from utils.geo_resolver import MUKIM_ZONES_FILE, parse_zone_id
+from utils.orchestration.flood_features import FloodFeatureBuilder, get_feature_builder
+from utils.orchestration.flood_schema import NUM_FEATURES
+from utils.orchestration.ml_inference import ForecastBackend, get_forecast_client
+
+# Upper probability bound of each level, in increasing severity
+LEVEL_THRESHOLDS = [
+    ("GREEN", 0.3),
+    ("YELLOW", 0.5),
+    ("ORANGE", 0.75),
+    ("RED", float("inf")),
+]
+
+
+def probability_levels(probabilities: np.ndarray) -> List[str]:
+    """FRI level for each flood probability."""
+    bounds = np.array([bound for _, bound in LEVEL_THRESHOLDS[:-1]])
+    names = [name for name, _ in LEVEL_THRESHOLDS]
+    return [names[index] for index in np.searchsorted(bounds, probabilities, side="right")]
+
+
+def load_zones(path: Path) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class FloodRiskSweep:
+    """Scores every mukim zone in one batch and merges the levels into the FRI file."""
+
+    def __init__(self, zones: List[Dict[str, Any]], builder: FloodFeatureBuilder, backend: ForecastBackend):
+        self.zones = zones
+        self.builder = builder
+        self.backend = backend
+
+    def zone_locations(self) -> List[Optional[Tuple[str, str]]]:
+        """(weather location id, matched name) per zone, or None when no level of the zone is known."""
+        store = self.builder.store
+        resolved: Dict[str, List[str]] = {}
+        locations = []
+        for zone in self.zones:
+            names = parse_zone_id(zone["districtId"])
+            match = None
+            for name in (names["mukim"], names["district"], names["state"]):
+                if name not in resolved:
+                    resolved[name] = store.location_ids(name)
+                if resolved[name]:
+                    match = (resolved[name][0], name)
+                    break
+            locations.append(match)
+        return locations
+
+    def score(self, day: Optional[date] = None) -> Dict[str, Dict[str, Any]]:
+        """Level and probability per zone id, from one model call over the distinct locations."""
+        self.builder.store.ensure_fresh()
+        locations = self.zone_locations()
+        location_ids = sorted({match[0] for match in locations if match})
+        by_location = {}
+        if location_ids:
+            features, imputed = self.builder.build_with_imputed(location_ids, day)
+            # Neighbouring zones often fall back to the same district; score each distinct row once
+            unique_rows, inverse = np.unique(features, axis=0, return_inverse=True)
+            probabilities = np.asarray(self.backend.predict_proba(unique_rows.tolist()))[inverse.ravel()]
+            by_location = dict(zip(location_ids, zip(probabilities, probability_levels(probabilities), imputed.sum(axis=1))))
+
+        scores = {}
+        for zone, match in zip(self.zones, locations):
+            if match is None:
+                continue
+            location_id, name = match
+            probability, level, imputed_count = by_location[location_id]
+            reasons = [f"Flood probability {probability:.2f} from the {name} forecast ({location_id})"]
+            if imputed_count:
+                reasons.append(f"{imputed_count} of {NUM_FEATURES} model features imputed")
+            scores[zone["districtId"]] = {
+                "level": level,
+                "reasons": reasons,
+                "probability": round(float(probability), 4)
+            }
+        return scores
+
+    def merge(self, current: List[Dict[str, Any]], scores: Dict[str, Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        New FRI entries: zones whose level changed take the new score, every
+        other entry is carried over unchanged. Returns (entries, changed count).
+        """
+        updated_at = datetime.now().replace(microsecond=0).isoformat()
+        by_id = {entry["districtId"]: entry for entry in current}
+        entries, changed = [], 0
+        for zone in self.zones:
+            zone_id = zone["districtId"]
+            previous = by_id.get(zone_id)
+            score = scores.get(zone_id)
+            if score is None or (previous is not None and previous.get("level") == score["level"]):
+                entries.append(previous or zone)
+                continue
+            entry = dict(previous or zone)
+            entry.update(score, updated_at=updated_at)
+            entries.append(entry)
+            changed += 1
+        return entries, changed
+
+    def run(self, output_path: str, day: Optional[date] = None, dry_run: bool = False) -> int:
+        """Score all zones and rewrite the FRI file if any level changed. Returns the changed count."""
+        current = load_zones(Path(output_path)) if Path(output_path).exists() else []
+        entries, changed = self.merge(current, self.score(day))
+        if changed and not dry_run:
+            tmp_path = f"{output_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, output_path)
+        return changed
+
+
+def get_flood_risk_sweep() -> FloodRiskSweep:
+    return FloodRiskSweep(
+        load_zones(Path(Config.GEO_BOUNDARY_DIR) / MUKIM_ZONES_FILE),
+        get_feature_builder(),
+        get_forecast_client()
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score every mukim zone and update the FRI zone file")
+    parser.add_argument(
+        "--output",
+        default=Config.FRI_OUTPUT_PATH,
+        required=not Config.FRI_OUTPUT_PATH,
+        help="FRI file to update (defaults to FRI_OUTPUT_PATH)"
+    )
+    parser.add_argument("--interval", type=float, default=0, help="Seconds between sweeps; 0 sweeps once")
+    parser.add_argument("--dry-run", action="store_true", help="Score zones without writing the file")
+    args = parser.parse_args()
+
+    sweep = get_flood_risk_sweep()
+    while True:
+        try:
+            started = time.perf_counter()
+            changed = sweep.run(args.output, dry_run=args.dry_run)
+            print(f"✅ Swept {len(sweep.zones)} zones in {time.perf_counter() - started:.2f}s; {changed} level changes")
+        except Exception as e:
+            print("❌ Flood-risk sweep failed:", e)
+        if not args.interval:
+            break
+        time.sleep(args.interval)
@@ -0,0 +1,214 @@
+"""
+In-process CPU inference for the flood classifier.
+
+Loads an exported copy of the endpoint's model and serves the same
+``forecast_flood`` contract without a network round trip. Two export formats
+are supported:
+
+- ``.npz`` NumPy weights of the dense network: ``W0, b0, W1, b1, ...``,
+  ``activations`` (one per layer: relu, tanh, sigmoid or linear) and optional
+  ``mean`` / ``scale`` arrays for input standardization;
+- ``.onnx``, run with ``onnxruntime`` when that package is installed.
+
+``save_npz`` writes the ``.npz`` format from a dense network's weights, e.g.
+those exported from the training notebook. ``write_fixture_model`` writes a
+small seeded network in the same format so the loader, the parity check and
+the benchmark can run without the real model or the endpoint.
+
+Select it with ``FLOOD_MODEL_BACKEND=local``. ``check_parity`` and
+``benchmark`` compare it against the endpoint; run them with
+``python -m utils.orchestration.local_inference``.
+"""
+
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.orchestration.flood_schema import NUM_FEATURES
+from utils.orchestration.ml_inference import ForecastBackend
+
+ACTIVATIONS: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "relu": lambda x: np.maximum(x, 0.0),
+    "tanh": np.tanh,
+    "sigmoid": lambda x: np.exp(-np.logaddexp(0.0, -x)),
+    "linear": lambda x: x,
+}
+
+
+class LocalFloodModel(ForecastBackend):
+    """Runs the exported classifier on CPU, vectorized over the batch."""
+
+    def __init__(self, predict: Callable[[np.ndarray], np.ndarray], version: str):
+        self._predict = predict
+        self.version = version
+
+    @classmethod
+    def from_npz(cls, path: str) -> "LocalFloodModel":
+        weights = np.load(path, allow_pickle=False)
+        activations = [str(name) for name in weights["activations"]]
+        layers = [
+            (weights[f"W{i}"].astype(np.float64), weights[f"b{i}"].astype(np.float64), ACTIVATIONS[name])
+            for i, name in enumerate(activations)
+        ]
+        mean = weights["mean"] if "mean" in weights else None
+        scale = weights["scale"] if "scale" in weights else None
+
+        def predict(features: np.ndarray) -> np.ndarray:
+            x = features
+            if mean is not None:
+                x = (x - mean) / scale
+            for W, b, activation in layers:
+                x = activation(x @ W + b)
+            return x[:, 0]
+
+        return cls(predict, version=f"npz:{Path(path).stem}")
+
+    @classmethod
+    def from_onnx(cls, path: str) -> "LocalFloodModel":
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("onnxruntime is required to serve an ONNX flood model; export .npz weights instead")
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = 1
+        session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        input_name = session.get_inputs()[0].name
+
+        def predict(features: np.ndarray) -> np.ndarray:
+            output = session.run(None, {input_name: features.astype(np.float32)})[0]
+            return np.asarray(output, dtype=np.float64).reshape(len(features), -1)[:, -1]
+
+        return cls(predict, version=f"onnx:{Path(path).stem}")
+
+    @classmethod
+    def from_file(cls, path: str) -> "LocalFloodModel":
+        if not Path(path).exists():
+            raise FileNotFoundError(f"Local flood model not found: {path}")
+        return cls.from_onnx(path) if path.endswith(".onnx") else cls.from_npz(path)
+
+    def predict_array(self, features: np.ndarray) -> np.ndarray:
+        """Flood probabilities for an (n, 12) feature array."""
+        features = np.asarray(features, dtype=np.float64).reshape(-1, NUM_FEATURES)
+        return self._predict(features)
+
+    def predict_proba(self, rows: Sequence[Sequence[float]]) -> List[float]:
+        return self.predict_array(np.asarray(rows, dtype=np.float64)).tolist()
+
+
+def save_npz(
+    path: str,
+    layers: Sequence[Tuple[np.ndarray, np.ndarray]],
+    activations: Sequence[str],
+    mean: Optional[np.ndarray] = None,
+    scale: Optional[np.ndarray] = None,
+) -> None:
+    """Write dense-network weights (one ``(W, b)`` per layer) in the format ``from_npz`` loads."""
+    unknown = set(activations) - set(ACTIVATIONS)
+    if unknown or len(activations) != len(layers):
+        raise ValueError(f"Need one known activation per layer, got {list(activations)}")
+    arrays: Dict[str, np.ndarray] = {"activations": np.array(activations)}
+    for i, (W, b) in enumerate(layers):
+        arrays[f"W{i}"], arrays[f"b{i}"] = np.asarray(W, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    if mean is not None:
+        arrays["mean"], arrays["scale"] = np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+
+
+def write_fixture_model(path: str, hidden: int = 16, seed: int = 0) -> None:
+    """
+    Write a small seeded 12-``hidden``-1 network standardized on ``sample_rows``.
+    Its probabilities spread across both labels, so parity checks exercise the threshold.
+    """
+    rng = np.random.default_rng(seed)
+    rows = sample_rows(2000, seed)
+    mean, scale = rows.mean(axis=0), rows.std(axis=0)
+    scale[scale == 0] = 1.0
+    layers = [
+        (rng.normal(0, 1 / np.sqrt(NUM_FEATURES), (NUM_FEATURES, hidden)), rng.normal(0, 0.1, hidden)),
+        (rng.normal(0, 1 / np.sqrt(hidden), (hidden, 1)), np.zeros(1)),
+    ]
+    save_npz(path, layers, ["relu", "sigmoid"], mean, scale)
+
+
+def check_parity(
+    local: ForecastBackend,
+    remote: ForecastBackend,
+    rows: Sequence[Sequence[float]],
+    atol: float = 1e-4,
+) -> Dict[str, Any]:
+    """Compare local and endpoint probabilities (and labels) on the same rows."""
+    local_probabilities = np.asarray(local.predict_proba(rows))
+    remote_probabilities = np.asarray(remote.predict_proba(rows))
+    differences = np.abs(local_probabilities - remote_probabilities)
+    label_mismatches = int(np.sum(
+        (local_probabilities > local.threshold) != (remote_probabilities > remote.threshold)
+    ))
+    return {
+        "rows": len(rows),
+        "max_abs_diff": float(differences.max()) if len(rows) else 0.0,
+        "label_mismatches": label_mismatches,
+        "passed": bool(len(rows) == 0 or (differences.max() <= atol and label_mismatches == 0))
+    }
+
+
+def benchmark(backend: ForecastBackend, rows: Sequence[Sequence[float]], repeats: int = 20) -> Dict[str, float]:
+    """Median latency of a single-row forecast and of one batch call over all rows."""
+    single, batched = [], []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        backend.forecast_flood({"inputs": list(rows[0])})
+        single.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        backend.forecast_flood_batch(rows)
+        batched.append(time.perf_counter() - started)
+    return {
+        "single_row_us": float(np.median(single) * 1e6),
+        "batch_ms": float(np.median(batched) * 1e3),
+        "batch_rows": len(rows),
+        "per_row_us": float(np.median(batched) * 1e6 / max(len(rows), 1))
+    }
+
+
+def sample_rows(count: int = 1000, seed: int = 0) -> np.ndarray:
+    """Plausible feature rows: 10 days of rainfall (mm), altitude (m) and the continent code."""
+    rng = np.random.default_rng(seed)
+    rainfall = rng.gamma(shape=0.8, scale=12.0, size=(count, NUM_FEATURES - 2))
+    altitude = rng.uniform(0, 1500, size=(count, 1))
+    return np.hstack([rainfall, altitude, np.ones((count, 1))])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from config_setting import Config
+    from utils.orchestration.ml_inference import FloodForecastClient
+
+    parser = argparse.ArgumentParser(description="Benchmark the local flood model and check it against the endpoint")
+    parser.add_argument("--model", default=Config.LOCAL_FLOOD_MODEL_PATH)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--parity", action="store_true", help="Also compare against the SageMaker endpoint")
+    parser.add_argument("--write-fixture", action="store_true", help="Write a seeded fixture model to --model first")
+    args = parser.parse_args()
+
+    if args.write_fixture:
+        write_fixture_model(args.model)
+        print(f"✅ Fixture model written to {args.model}")
+    local = LocalFloodModel.from_file(args.model)
+    rows = sample_rows(args.rows).tolist()
+    print(f"Local ({local.version}): {benchmark(local, rows)}")
+
+    if args.parity:
+        remote = FloodForecastClient(
+            Config.ENDPOINT_NAME,
+            Config.BEDROCK_CONFIG["regions"]["N. Virginia"],
+            Config.AWS_ACCESS_KEY,
+            Config.AWS_SECRET_ACCESS_KEY
+        )
+        print(f"Endpoint: {benchmark(remote, rows[:100], repeats=3)}")
+        print(f"Parity: {check_parity(local, remote, rows)}")
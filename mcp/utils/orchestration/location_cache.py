@@ -0,0 +1,107 @@
+"""
+Persistent cache of classify_location results.
+
+Entries are keyed on the normalized place name (case, whitespace and common
+Malay/English spelling variants folded together) and stored in a local SQLite
+file in WAL mode, so they survive restarts and are shared by every worker
+process on the host. Live entries are loaded into memory at startup.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from config_setting import Config
+from utils.weather.gazetteer import normalize_location_name
+
+
+class LocationCache:
+    """SQLite-backed TTL cache of location classifications with hit-rate metrics."""
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, warm: bool = True):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._memory: Dict[str, tuple[float, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS location_cache ("
+            "key TEXT PRIMARY KEY, result TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+        if warm:
+            self.warm()
+
+    @staticmethod
+    def key(location: str) -> str:
+        return normalize_location_name(location)
+
+    def warm(self) -> int:
+        """Load all unexpired entries into memory and drop expired ones. Returns the count loaded."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            self.conn.execute("DELETE FROM location_cache WHERE created_at < ?", (cutoff,))
+            self.conn.commit()
+            rows = self.conn.execute("SELECT key, result, created_at FROM location_cache").fetchall()
+            self._memory = {key: (created_at, json.loads(result)) for key, result, created_at in rows}
+            return len(self._memory)
+
+    def get(self, location: str) -> Optional[Dict[str, Any]]:
+        """Return the cached classification, checking the shared store on a memory miss."""
+        key = self.key(location)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None or now - entry[0] > self.ttl:
+                # Another worker may have classified (or re-classified) it since we loaded it
+                row = self.conn.execute(
+                    "SELECT result, created_at FROM location_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row:
+                    entry = (row[1], json.loads(row[0]))
+                    self._memory[key] = entry
+
+            if entry is None or now - entry[0] > self.ttl:
+                self._memory.pop(key, None)
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def put(self, location: str, result: Dict[str, Any]) -> None:
+        """Store a classification, without the raw model response."""
+        key = self.key(location)
+        value = {k: v for k, v in result.items() if k != "raw_response"}
+        now = time.time()
+        with self._lock:
+            self._memory[key] = (now, value)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO location_cache (key, result, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now)
+            )
+            self.conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._memory)
+        }
+
+
+_location_cache: Optional[LocationCache] = None
+
+
+def get_location_cache() -> LocationCache:
+    """Return the process-wide location cache, warming it from disk on first use."""
+    global _location_cache
+    if _location_cache is None:
+        _location_cache = LocationCache(Config.LOCATION_CACHE_PATH, ttl=Config.LOCATION_CACHE_TTL)
+    return _location_cache
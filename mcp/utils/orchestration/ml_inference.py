@@ -1,36 +1,304 @@
 import json
-from config_setting import Config
-from sagemaker.predictor import Predictor
-from sagemaker.session import Session
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence
+
 import boto3
+import numpy as np
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import BotoCoreError, ClientError
+from cachetools import TTLCache
 
-def forecast_flood(input_data):
-    # Create boto3 session with region``
-    boto_sess = boto3.Session(
-        Config.AWS_ACCESS_KEY, 
-        Config.AWS_SECRET_ACCESS_KEY, 
-        region_name=Config.BEDROCK_CONFIG["regions"]["N. Virginia"]
-    )  
-
-    sm_sess = Session(boto_session=boto_sess)
-
-    predictor = Predictor(endpoint_name=Config.ENDPOINT_NAME, sagemaker_session=sm_sess)
-    # Convert input to JSON string
-    payload = json.dumps(input_data)
-
-    # Call the endpoint
-    response = predictor.predict(payload, initial_args={"ContentType": "application/json"})
-
-    # Parse response
-    result = json.loads(response)
-    probability = result["prediction"][0][0]
-
-    # Threshold to classify
-    if probability > 0.5:
-        return {'status': 'success', 'model_prediction': "High Risk of Flood", 'flood_probability': probability} 
-    else:
+from config_setting import Config
+
+FLOOD_THRESHOLD = 0.5
+
+
+class ForecastBackend(ABC):
+    """
+    The ``forecast_flood`` contract shared by every backend; subclasses
+    implement ``predict_proba``.
+    """
+
+    threshold = FLOOD_THRESHOLD
+    version: Optional[str] = None
+
+    def model_version(self) -> Optional[str]:
+        """Identifier of the model currently serving predictions, if known."""
+        return self.version
+
+    @abstractmethod
+    def predict_proba(self, rows: Sequence[Sequence[float]]) -> List[float]:
+        """Flood probability for each feature row, in order."""
+
+    def result(self, probability: float) -> Dict[str, Any]:
+        """Classify a flood probability the way callers of forecast_flood expect."""
+        if probability > self.threshold:
+            return {'status': 'success', 'model_prediction': "High Risk of Flood", 'flood_probability': probability}
         return {'status': 'success', 'model_prediction': "Low Risk of Flood", 'flood_probability': probability}
 
+    def forecast_flood(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Single prediction for ``{"inputs": [12 floats]}``."""
+        return self.result(self.predict_proba([input_data["inputs"]])[0])
+
+    def forecast_flood_batch(self, rows: Sequence[Sequence[float]]) -> List[Dict[str, Any]]:
+        """One forecast_flood-style result per feature row, in order."""
+        return [self.result(probability) for probability in self.predict_proba(rows)]
+
+
+class FloodForecastClient(ForecastBackend):
+    """
+    Long-lived client for the flood classification endpoint.
+
+    Holds one ``sagemaker-runtime`` client (and its connection pool) for the
+    life of the process. Batches send many 12-feature rows in one request as
+    ``{"inputs": [[...], [...]]}``; the endpoint answers with one
+    ``prediction`` row per input row.
+
+    The model version (endpoint config and variant models) is read by a
+    daemon thread every ``version_check_interval`` seconds, never on the
+    prediction path; 0 disables it. That lookup needs
+    ``sagemaker:DescribeEndpoint`` and ``sagemaker:DescribeEndpointConfig`` on
+    top of ``sagemaker:InvokeEndpoint``; without them the version stays None
+    and the prediction cache simply never invalidates on a model change.
+    """
+
+    def __init__(
+        self,
+        endpoint_name: str,
+        region_name: str,
+        aws_access_key_id: Optional[str] = None,
+        aws_secret_access_key: Optional[str] = None,
+        max_batch_size: int = 500,
+        threshold: float = FLOOD_THRESHOLD,
+        version_check_interval: float = 300,
+    ):
+        self.endpoint_name = endpoint_name
+        self.max_batch_size = max_batch_size
+        self.threshold = threshold
+        self.version_check_interval = version_check_interval
+        self._version_lock = threading.Lock()
+        self._stop = threading.Event()
+        credentials = dict(
+            region_name=region_name,
+            aws_access_key_id=aws_access_key_id,
+            aws_secret_access_key=aws_secret_access_key
+        )
+        self.client = boto3.client(
+            "sagemaker-runtime",
+            config=BotoConfig(
+                max_pool_connections=10,
+                connect_timeout=3,
+                read_timeout=30,
+                tcp_keepalive=True,
+                retries={"max_attempts": 3, "mode": "adaptive"}
+            ),
+            **credentials
+        )
+        self.control_client = None
+        if version_check_interval:
+            self.control_client = boto3.client(
+                "sagemaker",
+                config=BotoConfig(connect_timeout=3, read_timeout=5, retries={"max_attempts": 2, "mode": "standard"}),
+                **credentials
+            )
+            threading.Thread(target=self._watch_version, name="forecast-version", daemon=True).start()
+
+    def refresh_version(self) -> Optional[str]:
+        """
+        Read the endpoint config and production-variant models behind the
+        endpoint. Keeps the last known version when the lookup fails.
+        """
+        try:
+            endpoint = self.control_client.describe_endpoint(EndpointName=self.endpoint_name)
+            endpoint_config = self.control_client.describe_endpoint_config(
+                EndpointConfigName=endpoint["EndpointConfigName"]
+            )
+            models = ",".join(variant["ModelName"] for variant in endpoint_config["ProductionVariants"])
+            with self._version_lock:
+                self.version = f"{endpoint['EndpointConfigName']}:{models}"
+        except (BotoCoreError, ClientError, KeyError) as e:
+            print(f"⚠️ Could not read the flood endpoint's model version: {e}")
+        return self.model_version()
+
+    def _watch_version(self):
+        while True:
+            self.refresh_version()
+            if self._stop.wait(self.version_check_interval):
+                return
+
+    def model_version(self) -> Optional[str]:
+        """The last version read by the background check; no network call."""
+        with self._version_lock:
+            return self.version
+
+    def close(self) -> None:
+        """Stop the background version check."""
+        self._stop.set()
+
+    def _invoke(self, payload: Dict[str, Any]) -> List[float]:
+        response = self.client.invoke_endpoint(
+            EndpointName=self.endpoint_name,
+            ContentType="application/json",
+            Accept="application/json",
+            Body=json.dumps(payload)
+        )
+        result = json.loads(response["Body"].read())
+        return [float(row[0]) for row in result["prediction"]]
+
+    def predict_proba(self, rows: Sequence[Sequence[float]]) -> List[float]:
+        """Flood probability per feature row, chunked into ``max_batch_size`` requests."""
+        probabilities = []
+        for start in range(0, len(rows), self.max_batch_size):
+            chunk = [[float(value) for value in row] for row in rows[start:start + self.max_batch_size]]
+            probabilities.extend(self._invoke({"inputs": chunk}))
+        return probabilities
+
+    def forecast_flood(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Single prediction, sending the payload unchanged."""
+        return self.result(self._invoke(input_data)[0])
+
+
+class CachedForecastBackend(ForecastBackend):
+    """
+    Prediction cache in front of another backend.
+
+    Keys are the feature row rounded to ``decimals`` places together with the
+    backend's model version; entries expire after ``ttl`` seconds and the
+    cache is cleared whenever the model version changes. Only the rows that
+    miss are sent to the wrapped backend.
+    """
+
+    def __init__(self, backend: ForecastBackend, maxsize: int = 4096, ttl: float = 900, decimals: int = 1):
+        self.backend = backend
+        self.threshold = backend.threshold
+        self.decimals = decimals
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._cache_version: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def model_version(self) -> Optional[str]:
+        return self.backend.model_version()
+
+    def _current_version(self) -> Optional[str]:
+        version = self.backend.model_version()
+        with self._lock:
+            if version != self._cache_version:
+                if self._cache_version is not None:
+                    print(f"🔄 Flood model changed ({self._cache_version} -> {version}); clearing prediction cache")
+                    self.invalidations += 1
+                self._cache.clear()
+                self._cache_version = version
+        return version
+
+    def _keys(self, rows: Sequence[Sequence[float]], version: Optional[str]) -> List[tuple]:
+        quantized = np.round(np.asarray(rows, dtype=np.float64), self.decimals) + 0.0  # folds -0.0 into 0.0
+        return [(version, tuple(row)) for row in quantized.tolist()]
+
+    def predict_proba(self, rows: Sequence[Sequence[float]]) -> List[float]:
+        if not len(rows):
+            return []
+        keys = self._keys(rows, self._current_version())
+        with self._lock:
+            probabilities = [self._cache.get(key) for key in keys]
+        missing = {}
+        for index, (key, probability) in enumerate(zip(keys, probabilities)):
+            if probability is None:
+                missing.setdefault(key, []).append(index)
+
+        if missing:
+            first_rows = [rows[indexes[0]] for indexes in missing.values()]
+            computed = self.backend.predict_proba(first_rows)
+            with self._lock:
+                for (key, indexes), probability in zip(missing.items(), computed):
+                    self._cache[key] = probability
+                    for index in indexes:
+                        probabilities[index] = probability
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(rows) - len(missing)
+        return probabilities
+
+    def forecast_flood(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        key = self._keys([input_data["inputs"]], self._current_version())[0]
+        with self._lock:
+            probability = self._cache.get(key)
+        if probability is not None:
+            with self._lock:
+                self.hits += 1
+            return self.result(probability)
+
+        result = self.backend.forecast_flood(input_data)
+        with self._lock:
+            self._cache[key] = result["flood_probability"]
+            self.misses += 1
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "invalidations": self.invalidations,
+                "model_version": self._cache_version
+            }
+
+
+_forecast_client: Optional[ForecastBackend] = None
+_forecast_client_lock = threading.Lock()
+
+
+def get_forecast_client() -> ForecastBackend:
+    """
+    Return the process-wide forecast backend, created on first use:
+    the SageMaker endpoint, or the in-process model when
+    ``FLOOD_MODEL_BACKEND=local``, behind the prediction cache unless
+    ``FORECAST_CACHE_SIZE=0``.
+    """
+    global _forecast_client
+    with _forecast_client_lock:
+        if _forecast_client is not None:
+            return _forecast_client
+        if Config.FLOOD_MODEL_BACKEND == "local":
+            from utils.orchestration.local_inference import LocalFloodModel
+            backend = LocalFloodModel.from_file(Config.LOCAL_FLOOD_MODEL_PATH)
+        else:
+            backend = FloodForecastClient(
+                Config.ENDPOINT_NAME,
+                Config.BEDROCK_CONFIG["regions"]["N. Virginia"],
+                Config.AWS_ACCESS_KEY,
+                Config.AWS_SECRET_ACCESS_KEY,
+                version_check_interval=Config.FORECAST_VERSION_CHECK_INTERVAL
+            )
+        if Config.FORECAST_CACHE_SIZE > 0:
+            backend = CachedForecastBackend(
+                backend,
+                maxsize=Config.FORECAST_CACHE_SIZE,
+                ttl=Config.FORECAST_CACHE_TTL,
+                decimals=Config.FORECAST_CACHE_DECIMALS
+            )
+        _forecast_client = backend
+        return _forecast_client
+
+
+def forecast_flood(input_data):
+    return get_forecast_client().forecast_flood(input_data)
+
+
+def forecast_flood_batch(rows):
+    return get_forecast_client().forecast_flood_batch(rows)
+
 # -------------------------------
 # Test the function
 # -------------------------------
@@ -42,5 +310,8 @@ if __name__ == "__main__":
     dummy_data = {
         "inputs": [12.5, 0.0, 5.0, 8.2, 0.0, 10.1, 3.0, 0.0, 1.2, 6.3, 150.0, 1.0]
     }
-    prediction, prob = forecast_flood(dummy_data)
-    print(f"Prediction: {prediction}, Probability: {prob}")
+    result = forecast_flood(dummy_data)
+    print(f"Prediction: {result['model_prediction']}, Probability: {result['flood_probability']}")
+
+    batch = forecast_flood_batch([dummy_data["inputs"], [0.0] * 10 + [150.0, 1.0]])
+    print(f"Batch: {[r['flood_probability'] for r in batch]}")
@@ -1,50 +1,72 @@
 import boto3, json
+import queue
+import threading
+from typing import Union
 
 from config_setting import Config
-from check_user_input import init_bedrock
 from utils.aws_client import BedrockHandler, SESHandler
 
+ALERT_EMAIL_TOOL = "record_alert_email"
+ALERT_EMAIL_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "subject": {"type": "string", "description": "Email subject line"},
+        "body_html": {"type": "string", "description": "Email body as HTML"}
+    },
+    "required": ["subject", "body_html"]
+}
+
 def send_flood_email(
         bedrock_handler: BedrockHandler,
         ses_handler: SESHandler,
-        flood_summary: str
+        flood_summary: Union[str, dict]
     ) -> dict:
     """
-    Uses Bedrock invoke_model to generate a contextual flood alert email.
+    Uses Bedrock structured output to generate a contextual flood alert email.
+    ``flood_summary`` is free text or a dict with location, severity and summary.
     """
-    system_prompt = """
+    system_prompt = f"""
     You are a disaster alert assistant.
-    Given a JSON flood summary, write a clear and professional email to citizens.
+    Given a flood summary, write a clear and professional email to citizens.
     - Include flood location and severity.
     - Provide a short summary of the situation.
     - Add a polite request to confirm if the flood occurrence is accurate.
     - Email tone should be urgent but reassuring.
     - End with a call-to-action button linking to a confirmation page.
-    Respond only in JSON with keys: subject, body_html.
+    Record the email with the {ALERT_EMAIL_TOOL} tool.
     """
+    summary = flood_summary if isinstance(flood_summary, dict) else {"summary": flood_summary}
 
-    user_message = bedrock_handler.user_message(
-        message=flood_summary,
-        context=system_prompt,
-    )
-
-    # Call the Nova model
-    response = bedrock_handler.invoke_model([user_message])
-
-    model_output = json.loads(response["body"])
     try:
-        text_output = model_output["content"][0]["text"]
-        email_json = json.loads(text_output)
-    except Exception:
+        user_message = bedrock_handler.user_message(
+            message=flood_summary if isinstance(flood_summary, str) else json.dumps(flood_summary, ensure_ascii=False),
+            context=system_prompt,
+        )
+        # Call the Nova model, forcing the answer through the email tool
+        response = bedrock_handler.invoke_structured(
+            [user_message],
+            ALERT_EMAIL_TOOL,
+            ALERT_EMAIL_SCHEMA,
+            description="Record the subject and HTML body of a flood alert email.",
+            max_tokens=2048,
+            task="alert_email"
+        )
+        email_json = bedrock_handler.extract_structured(response, ALERT_EMAIL_TOOL)
+    except Exception as e:
+        print(f"⚠️ Alert email generation failed: {e}")
+        email_json = None
+
+    if not email_json or not email_json.get("subject") or not email_json.get("body_html"):
         # fallback template if parsing fails
         email_json = {
-            "subject": f"Flood Alert: {flood_summary.get('location')}",
+            "subject": f"Flood Alert: {summary.get('location') or 'your area'}",
             "body_html": f"""
                 <h2>🚨 Flood Alert</h2>
-                <p>Location: {flood_summary.get('location')}</p>
-                <p>Severity: {flood_summary.get('severity')}</p>
+                <p>Location: {summary.get('location', 'unknown')}</p>
+                <p>Severity: {summary.get('severity', 'unknown')}</p>
+                <p>{summary.get('summary', '')}</p>
                 <p>Please confirm if this flood is happening near you.</p>
-                <a href="https://example.com/confirm?flood_id={flood_summary.get('id', '123')}"
+                <a href="https://example.com/confirm?flood_id={summary.get('id', '123')}"
                    style="display:inline-block;padding:10px 20px;background:#007bff;color:white;
                    text-decoration:none;border-radius:5px;">
                    Confirm Flood Report
@@ -53,9 +75,91 @@ def send_flood_email(
         }
 
     ses_handler.send_email(email_json)
+    return email_json
+
+
+class TransitionAlertSender:
+    """
+    Warning-snapshot subscriber that emails one alert per snapshot in which
+    stations escalated to ``min_level`` or above.
+
+    The subscriber only queues the snapshot's escalations; a daemon thread
+    writes and sends the email, so ``WarningTransitionDiffer.update`` never
+    waits on Bedrock or SES.
+    """
+
+    def __init__(
+            self,
+            bedrock_handler: BedrockHandler,
+            ses_handler: SESHandler,
+            min_level: str = "WARNING",
+            max_pending: int = 100
+        ):
+        self.bedrock_handler = bedrock_handler
+        self.ses_handler = ses_handler
+        self.min_level = min_level
+        self.queue: "queue.Queue[list]" = queue.Queue(maxsize=max_pending)
+        self.sent = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="transition-alerts", daemon=True)
+        self._thread.start()
+
+    def __call__(self, events: list) -> None:
+        from utils.orchestration.warning_transitions import level_rank
+
+        escalations = [
+            event for event in events
+            if event["escalated"] and level_rank(event["level"]) >= level_rank(self.min_level)
+        ]
+        if not escalations:
+            return
+        try:
+            self.queue.put_nowait(escalations)
+        except queue.Full:
+            self.dropped += 1
+            print(f"⚠️ Alert queue full; dropped an alert for {len(escalations)} stations")
+
+    def _run(self) -> None:
+        while True:
+            escalations = self.queue.get()
+            try:
+                self.send(escalations)
+                self.sent += 1
+            except Exception as e:
+                print(f"❌ Transition alert email failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    def send(self, escalations: list) -> None:
+        """Email one alert covering every escalated station of a snapshot."""
+        from utils.orchestration.warning_transitions import level_rank
+
+        lines, locations = [], []
+        for event in escalations:
+            location = ", ".join(part for part in (event["station_name"], event["district"], event["state"]) if part)
+            locations.append(location)
+            lines.append(f"Station {event['station_id']} ({location}) rose from {event['previous_level']} to {event['level']}.")
+        severity = max((event["level"] for event in escalations), key=level_rank)
+        send_flood_email(self.bedrock_handler, self.ses_handler, {
+            "id": escalations[0]["station_id"],
+            "location": "; ".join(dict.fromkeys(locations)),
+            "severity": severity.lower(),
+            "summary": " ".join(lines)
+        })
+
+
+def transition_alert_subscriber(
+        bedrock_handler: BedrockHandler,
+        ses_handler: SESHandler,
+        min_level: str = "WARNING"
+    ) -> TransitionAlertSender:
+    """Build the snapshot subscriber that emails escalation alerts in the background."""
+    return TransitionAlertSender(bedrock_handler, ses_handler, min_level)
 
 # Example usage
 if __name__ == "__main__":
+    from utils.orchestration.check_user_input import init_bedrock
+
     bedrock_handler, bedrock_agent_runtime_client = init_bedrock()
     ses_client = SESHandler(
         Config.AWS_ACCESS_KEY, 
@@ -65,5 +169,5 @@ if __name__ == "__main__":
     dummy_summary = "Heavy rains caused severe flooding in Klang town." \
     "location: Klang, Selangor"\
     "severity: severe"
-    send_flood_email(dummy_summary)
+    send_flood_email(bedrock_handler, ses_client, dummy_summary)
     print("Flood alert email sent.")
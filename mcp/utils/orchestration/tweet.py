@@ -1,29 +1,323 @@
+"""
+Twitter/X API v2 client for flood-report verification.
+
+One pooled keep-alive session per process, recent-search pagination through
+``next_token`` up to a result budget, and a ``RateLimitScheduler`` shared by
+every caller. The scheduler reads ``x-rate-limit-remaining`` /
+``x-rate-limit-reset`` from each response, spaces requests out once the window
+runs low and queues callers until the window resets when it is spent, so
+lookups under load wait for capacity instead of failing with 429.
+
+``TWITTER_API_BASE_URL`` points the client at ``twitter_mock`` for local runs.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 from config_setting import Config
 
-# Load Bearer Token from environment variable
-BEARER_TOKEN = Config.TWITTER_BEARER_TOKEN
+SEARCH_PATH = "/tweets/search/recent"
+STREAM_PATH = "/tweets/search/stream"
+STREAM_RULES_PATH = "/tweets/search/stream/rules"
+# Seconds without data (the stream's keep-alives included) before a connection is presumed dead
+STREAM_READ_TIMEOUT = 30.0
+FLOOD_KEYWORDS = ["banjir", "flood", "水灾", "natural disaster"]
+# Page size bounds for recent search
+MIN_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+TWEET_FIELDS = "author_id,created_at,geo,lang"
+PLACE_FIELDS = "full_name,country,country_code,geo,place_type"
+
+
+class RateLimitExceeded(Exception):
+    """The rate-limit window would not reset within the caller's maximum wait."""
+
+
+class RateLimitScheduler:
+    """
+    Per-endpoint view of the API's rate-limit windows, shared by all callers.
+
+    Each ``acquire`` reserves one request from the known window. When the
+    remaining share drops below ``pace_fraction`` of the limit, requests are
+    spread evenly over the time left to the reset; when nothing remains,
+    callers wait for the reset.
+    """
+
+    def __init__(self, pace_fraction: float = 0.2, probe_timeout: float = 15.0):
+        self.pace_fraction = pace_fraction
+        self.probe_timeout = probe_timeout
+        # endpoint -> {"limit", "remaining", "reset", "next_slot"}
+        self._windows: Dict[str, Dict[str, float]] = {}
+        # endpoint -> start of the request sent to learn an unknown window
+        self._probes: Dict[str, float] = {}
+        self._condition = threading.Condition()
+        self.waited = 0.0
+
+    def _delay(self, endpoint: str, now: float) -> float:
+        """Seconds until the next request may start (0 when it may start now)."""
+        window = self._windows.get(endpoint)
+        if window is None or now >= window["reset"]:
+            # Unknown window: one request at a time until a response reports it
+            probe = self._probes.get(endpoint)
+            return 0.0 if probe is None else max(0.0, probe + self.probe_timeout - now)
+        if window["remaining"] <= 0:
+            return window["reset"] - now
+        if window["remaining"] < window["limit"] * self.pace_fraction:
+            return max(0.0, window["next_slot"] - now)
+        return 0.0
+
+    def acquire(self, endpoint: str, max_wait: float) -> None:
+        """
+        Block until a request to ``endpoint`` fits the window, or raise
+        RateLimitExceeded. Async callers run the client off the event loop
+        (``asyncio.to_thread``) since this can wait up to ``max_wait``.
+        """
+        deadline = time.time() + max_wait
+        with self._condition:
+            while True:
+                now = time.time()
+                delay = self._delay(endpoint, now)
+                if delay <= 0:
+                    window = self._windows.get(endpoint)
+                    if window is None or now >= window["reset"]:
+                        self._windows.pop(endpoint, None)
+                        self._probes[endpoint] = now
+                        return
+                    window["remaining"] -= 1
+                    if window["remaining"] < window["limit"] * self.pace_fraction:
+                        window["next_slot"] = now + (window["reset"] - now) / max(window["remaining"], 1)
+                    return
+                probing = endpoint not in self._windows or now >= self._windows[endpoint]["reset"]
+                if probing and now < deadline:
+                    # The probe usually answers long before its timeout
+                    delay = min(delay, deadline - now)
+                elif now + delay > deadline:
+                    raise RateLimitExceeded(
+                        f"Rate limit for {endpoint} allows the next request in {delay:.0f}s, beyond the {max_wait:.0f}s wait"
+                    )
+                self._condition.wait(delay)
+                self.waited += time.time() - now
+
+    def release(self, endpoint: str) -> None:
+        """End a probe whose request failed without reporting the window."""
+        with self._condition:
+            self._probes.pop(endpoint, None)
+            self._condition.notify_all()
+
+    def update(self, endpoint: str, headers: Dict[str, str]) -> None:
+        """Record the window reported by a response's rate-limit headers."""
+        try:
+            limit = int(headers["x-rate-limit-limit"])
+            remaining = int(headers["x-rate-limit-remaining"])
+            reset = float(headers["x-rate-limit-reset"])
+        except (KeyError, ValueError):
+            self.release(endpoint)
+            return
+        with self._condition:
+            self._probes.pop(endpoint, None)
+            window = self._windows.get(endpoint)
+            if window is not None and window["reset"] == reset:
+                # Responses can arrive out of order; keep the lower count for the same window
+                remaining = min(remaining, window["remaining"])
+            self._windows[endpoint] = {
+                "limit": limit,
+                "remaining": remaining,
+                "reset": reset,
+                "next_slot": window["next_slot"] if window else 0.0
+            }
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "windows": {endpoint: dict(window) for endpoint, window in self._windows.items()},
+                "seconds_waited": round(self.waited, 3)
+            }
+
+
+class TwitterClient:
+    """Pooled, rate-limit-aware client for the v2 recent-search endpoint."""
+
+    def __init__(
+        self,
+        base_url: str,
+        bearer_token: Optional[str],
+        scheduler: Optional[RateLimitScheduler] = None,
+        pool_size: int = 10,
+        timeout: float = 15.0,
+        max_wait: float = 60.0,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.scheduler = scheduler or RateLimitScheduler()
+        self.timeout = timeout
+        self.max_wait = max_wait
+
+        self.session = requests.Session()
+        # 429s are left to the scheduler, which knows when the window resets
+        retry = Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504), allowed_methods=frozenset(["GET"]))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Authorization": f"Bearer {bearer_token}", "Accept-Encoding": "gzip, deflate"})
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Dict[str, Any]] = None,
+        attempts: int = 3,
+    ) -> Dict[str, Any]:
+        """Call an API path within the rate limit, waiting out a 429 up to ``max_wait``."""
+        for _ in range(attempts):
+            self.scheduler.acquire(path, self.max_wait)
+            try:
+                response = self.session.request(method, f"{self.base_url}{path}", params=params, json=json, timeout=self.timeout)
+            except requests.exceptions.RequestException:
+                self.scheduler.release(path)
+                raise
+            self.scheduler.update(path, response.headers)
+            if response.status_code == 429:
+                continue
+            if response.status_code not in (200, 201):
+                raise requests.exceptions.HTTPError(f"Error: {response.status_code} {response.text}", response=response)
+            return response.json()
+        raise RateLimitExceeded(f"Still rate limited on {path} after {attempts} attempts")
+
+    def get(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        return self.request("GET", path, params=params)
+
+    def search_recent(
+        self,
+        query: str,
+        max_results: int = 10,
+        since_id: Optional[str] = None,
+        until_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Recent tweets matching ``query`` (newer than ``since_id``, older than
+        ``until_id``), following ``next_token`` until ``max_results`` tweets
+        are collected or the results run out. Returns one response in the
+        API's shape (``data``, ``includes``, ``meta``); ``meta.truncated`` is
+        set when the budget ran out before the results did.
+        """
+        tweets: List[Dict[str, Any]] = []
+        places: Dict[str, Dict[str, Any]] = {}
+        next_token = None
+        while len(tweets) < max_results:
+            params = {
+                "query": query,
+                "max_results": min(MAX_PAGE_SIZE, max(MIN_PAGE_SIZE, max_results - len(tweets))),
+                "tweet.fields": TWEET_FIELDS,
+                "expansions": "geo.place_id",
+                "place.fields": PLACE_FIELDS
+            }
+            if since_id:
+                params["since_id"] = since_id
+            if until_id:
+                params["until_id"] = until_id
+            if next_token:
+                params["next_token"] = next_token
+
+            page = self.get(SEARCH_PATH, params)
+            tweets.extend(page.get("data", []))
+            for place in page.get("includes", {}).get("places", []):
+                places[place["id"]] = place
+            next_token = page.get("meta", {}).get("next_token")
+            if not next_token:
+                break
+
+        # Results are newest first, so anything left over is older than what is returned
+        truncated = bool(next_token) or len(tweets) > max_results
+        tweets = tweets[:max_results]
+        result: Dict[str, Any] = {"meta": {"result_count": len(tweets)}}
+        if truncated:
+            result["meta"]["truncated"] = True
+        if tweets:
+            ids = [int(tweet["id"]) for tweet in tweets]
+            result["data"] = tweets
+            result["meta"].update(newest_id=str(max(ids)), oldest_id=str(min(ids)))
+        if places:
+            result["includes"] = {"places": list(places.values())}
+        return result
+
+    def stream_rules(self) -> List[Dict[str, Any]]:
+        """The filtered stream's current rules (``id``, ``value``, ``tag``)."""
+        return self.get(STREAM_RULES_PATH, {}).get("data", [])
+
+    def sync_stream_rules(self, rules: List[Dict[str, str]]) -> Dict[str, int]:
+        """Make the stream's rules exactly ``rules``, only adding and deleting the difference."""
+        current = self.stream_rules()
+        wanted = {rule["value"] for rule in rules}
+        stale = [rule["id"] for rule in current if rule["value"] not in wanted]
+        existing = {rule["value"] for rule in current}
+        missing = [rule for rule in rules if rule["value"] not in existing]
+        if stale:
+            self.request("POST", STREAM_RULES_PATH, json={"delete": {"ids": stale}})
+        if missing:
+            self.request("POST", STREAM_RULES_PATH, json={"add": missing})
+        return {"added": len(missing), "deleted": len(stale)}
+
+    def open_stream(self, read_timeout: float = STREAM_READ_TIMEOUT) -> requests.Response:
+        """
+        Connect to the filtered stream. The response is left open for
+        ``iter_lines``; the API sends a keep-alive newline every 20 seconds, so
+        ``read_timeout`` detects a stalled connection.
+        """
+        self.scheduler.acquire(STREAM_PATH, self.max_wait)
+        try:
+            response = self.session.get(
+                f"{self.base_url}{STREAM_PATH}",
+                params={"tweet.fields": TWEET_FIELDS, "expansions": "geo.place_id", "place.fields": PLACE_FIELDS},
+                stream=True,
+                timeout=(3.05, read_timeout)
+            )
+        except requests.exceptions.RequestException:
+            self.scheduler.release(STREAM_PATH)
+            raise
+        self.scheduler.update(STREAM_PATH, response.headers)
+        if response.status_code != 200:
+            response.close()
+        response.raise_for_status()
+        return response
+
+
+def flood_query(location) -> str:
+    """Recent-search query for flood posts about one location or any of a list."""
+    keywords = " OR ".join(FLOOD_KEYWORDS)
+    if isinstance(location, list):
+        return f'({keywords}) ({" OR ".join(location)}) -is:retweet'
+    return f'({keywords}) {location} -is:retweet'
+
+
+_twitter_client: Optional[TwitterClient] = None
+_twitter_client_lock = threading.Lock()
+
+
+def get_twitter_client() -> TwitterClient:
+    """Return the process-wide Twitter client; its scheduler paces every caller."""
+    global _twitter_client
+    with _twitter_client_lock:
+        if _twitter_client is None:
+            _twitter_client = TwitterClient(
+                Config.TWITTER_API_BASE_URL,
+                Config.TWITTER_BEARER_TOKEN,
+                timeout=Config.HTTP_TIMEOUT,
+                max_wait=Config.TWITTER_MAX_WAIT
+            )
+        return _twitter_client
+
 
 def search_tweets(query, max_results=10):
-    return {}
-    url = "https://api.x.com/2/tweets/search/recent"
-    headers = {
-        "Authorization": f"Bearer {BEARER_TOKEN}"
-    }
-    params = {
-        "query": query,
-        "max_results": max_results,
-        "tweet.fields": "author_id,created_at,geo,lang",
-        "expansions": "geo.place_id",
-        "place.fields": "full_name,country,country_code,geo,place_type"
-    }
-
-    resp = requests.get(url, headers=headers, params=params)
-    if resp.status_code != 200:
-        raise Exception(f"Error: {resp.status_code} {resp.text}")
-    return resp.json()
+    return get_twitter_client().search_recent(query, max_results=max_results)
+
 
 if __name__ == "__main__":
-    query = '(banjir OR flood OR 水灾 OR natural disaster) -is:retweet'
+    query = f'({" OR ".join(FLOOD_KEYWORDS)}) -is:retweet'
     tweets = search_tweets(query, max_results=20)
     print(tweets)
@@ -0,0 +1,306 @@
+"""
+Incremental tweet polling for report verification.
+
+Each watched location has a recent-search query and the newest tweet id seen
+for it. ``IncrementalTweetPoller`` searches with ``since_id`` so every poll
+downloads only tweets newer than the last one, following pages until they run
+out. When a burst exceeds ``catch_up_limit`` the poll stores the newest part,
+leaves ``since_id`` where it was and resumes below the oldest stored tweet
+(``until_id``) next time, so no tweet is skipped. ``TweetStore`` keeps them
+in SQLite (WAL) keyed by tweet id, so a tweet matched by several locations or
+polls is stored once. Verification reads a location's count and newest
+samples from the store; a location is polled inline only when its last poll is
+older than ``max_age``. With ``TWEET_POLL_INTERVAL`` set, a background thread
+keeps recently verified locations (and ``TWEET_WATCH_LOCATIONS``) fresh, so
+verification is a local query.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from config_setting import Config
+from utils.orchestration.tweet import MAX_PAGE_SIZE, TwitterClient, flood_query, get_twitter_client
+
+# Tweet ids are snowflakes: milliseconds since this epoch, shifted left 22 bits
+TWITTER_EPOCH_MS = 1288834974657
+# Recent search rejects a since_id older than its seven-day window
+SEARCH_WINDOW = 7 * 24 * 3600
+
+
+def snowflake_time(tweet_id: str) -> float:
+    """Creation time (epoch seconds) encoded in a tweet id."""
+    return ((int(tweet_id) >> 22) + TWITTER_EPOCH_MS) / 1000.0
+
+
+class TweetStore:
+    """SQLite store of polled tweets, deduplicated by id, with per-query poll state."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS tweet ("
+            " id INTEGER PRIMARY KEY, created_at REAL NOT NULL, payload TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS query_tweet ("
+            " query TEXT NOT NULL, tweet_id INTEGER NOT NULL, created_at REAL NOT NULL,"
+            " PRIMARY KEY (query, tweet_id));"
+            "CREATE INDEX IF NOT EXISTS query_tweet_time ON query_tweet (query, created_at);"
+            "CREATE TABLE IF NOT EXISTS poll_state ("
+            " query TEXT PRIMARY KEY, since_id TEXT, polled_at REAL, watched_at REAL,"
+            " until_id TEXT, pending_id TEXT);"
+        )
+        # Stores created before catch-up polling lack its columns
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(poll_state)")}
+        for column in ("until_id", "pending_id"):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE poll_state ADD COLUMN {column} TEXT")
+        self.conn.commit()
+
+    def add(self, query: str, tweets: List[Dict[str, Any]]) -> int:
+        """Store tweets found by ``query``; returns how many were not already stored."""
+        rows = [(int(tweet["id"]), snowflake_time(tweet["id"]), json.dumps(tweet, ensure_ascii=False)) for tweet in tweets]
+        with self._lock:
+            before = self.conn.total_changes
+            self.conn.executemany("INSERT OR IGNORE INTO tweet VALUES (?, ?, ?)", rows)
+            added = self.conn.total_changes - before
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO query_tweet VALUES (?, ?, ?)",
+                [(query, tweet_id, created_at) for tweet_id, created_at, _ in rows]
+            )
+            self.conn.commit()
+        return added
+
+    def poll_state(self, query: str) -> Dict[str, Any]:
+        """
+        ``since_id`` (newest tweet fully caught up to), ``until_id`` and
+        ``pending_id`` (oldest stored and newest seen tweet of an unfinished
+        catch-up), ``polled_at`` and ``watched_at``.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT since_id, polled_at, watched_at, until_id, pending_id FROM poll_state WHERE query = ?", (query,)
+            ).fetchone()
+        since_id, polled_at, watched_at, until_id, pending_id = row or (None, None, None, None, None)
+        return {
+            "since_id": since_id,
+            "polled_at": polled_at,
+            "watched_at": watched_at,
+            "until_id": until_id,
+            "pending_id": pending_id
+        }
+
+    def record_poll(
+        self,
+        query: str,
+        since_id: Optional[str],
+        until_id: Optional[str] = None,
+        pending_id: Optional[str] = None,
+    ) -> None:
+        """
+        Advance the query's since_id (never backwards), set or clear its
+        catch-up cursor and stamp the poll time.
+        """
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO poll_state (query, since_id, polled_at, until_id, pending_id) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(query) DO UPDATE SET polled_at = excluded.polled_at,"
+                " until_id = excluded.until_id, pending_id = excluded.pending_id, since_id = CASE "
+                " WHEN excluded.since_id IS NULL THEN since_id"
+                " WHEN since_id IS NULL OR CAST(excluded.since_id AS INTEGER) > CAST(since_id AS INTEGER) THEN excluded.since_id"
+                " ELSE since_id END",
+                (query, since_id, time.time(), until_id, pending_id)
+            )
+            self.conn.commit()
+
+    def watch(self, query: str) -> None:
+        """Mark a query as wanted by verification, so the background poller keeps it fresh."""
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO poll_state (query, watched_at) VALUES (?, ?) "
+                "ON CONFLICT(query) DO UPDATE SET watched_at = excluded.watched_at",
+                (query, time.time())
+            )
+            self.conn.commit()
+
+    def watched(self, since: float) -> List[str]:
+        with self._lock:
+            rows = self.conn.execute("SELECT query FROM poll_state WHERE watched_at >= ?", (since,)).fetchall()
+        return [row[0] for row in rows]
+
+    def search_result(self, query: str, window: float, sample_size: int = 10) -> Dict[str, Any]:
+        """Count of the query's tweets in the window and its newest samples, shaped like a search response."""
+        since = time.time() - window
+        with self._lock:
+            count = self.conn.execute(
+                "SELECT COUNT(*) FROM query_tweet WHERE query = ? AND created_at >= ?", (query, since)
+            ).fetchone()[0]
+            rows = self.conn.execute(
+                "SELECT t.payload FROM query_tweet q JOIN tweet t ON t.id = q.tweet_id "
+                "WHERE q.query = ? AND q.created_at >= ? ORDER BY q.tweet_id DESC LIMIT ?",
+                (query, since, sample_size)
+            ).fetchall()
+        result: Dict[str, Any] = {"meta": {"result_count": count}}
+        if rows:
+            result["data"] = [json.loads(row[0]) for row in rows]
+            result["meta"]["newest_id"] = result["data"][0]["id"]
+        return result
+
+    def prune(self, older_than: float) -> int:
+        """Drop tweets created before ``older_than`` (epoch seconds); returns the number removed."""
+        with self._lock:
+            self.conn.execute("DELETE FROM query_tweet WHERE created_at < ?", (older_than,))
+            removed = self.conn.execute("DELETE FROM tweet WHERE created_at < ?", (older_than,)).rowcount
+            self.conn.commit()
+        return removed
+
+
+class IncrementalTweetPoller:
+    """Polls watched locations with since_id and serves verification from the store."""
+
+    def __init__(
+        self,
+        client: TwitterClient,
+        store: TweetStore,
+        window: float = 6 * 3600,
+        max_age: float = 300,
+        interval: float = 0,
+        watch_ttl: float = 6 * 3600,
+        fixed_locations: Optional[List[str]] = None,
+        catch_up_limit: int = 10 * MAX_PAGE_SIZE,
+    ):
+        self.client = client
+        self.store = store
+        self.window = window
+        self.max_age = max_age
+        self.interval = interval
+        self.watch_ttl = watch_ttl
+        self.fixed_locations = fixed_locations or []
+        self.catch_up_limit = catch_up_limit
+        self.polls = 0
+        self.tweets_downloaded = 0
+        self.tweets_added = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._poll_locks: Dict[str, threading.Lock] = {}
+        self._poll_locks_lock = threading.Lock()
+
+    def _poll_lock(self, query: str) -> threading.Lock:
+        """Per-query lock, so concurrent lookups and the background thread poll a query once."""
+        with self._poll_locks_lock:
+            return self._poll_locks.setdefault(query, threading.Lock())
+
+    def _is_stale(self, query: str) -> bool:
+        polled_at = self.store.poll_state(query)["polled_at"]
+        return polled_at is None or time.time() - polled_at > self.max_age
+
+    def poll(self, query: str, max_results: int = MAX_PAGE_SIZE) -> int:
+        """
+        Fetch tweets newer than the query's since_id; returns how many were
+        new to the store. A first poll takes the newest ``max_results``; later
+        polls follow pages up to ``catch_up_limit`` and, if more remain, leave
+        since_id in place and continue below the oldest stored tweet next time.
+        """
+        state = self.store.poll_state(query)
+        since_id, until_id, pending_id = state["since_id"], state["until_id"], state["pending_id"]
+        if since_id and time.time() - snowflake_time(since_id) > SEARCH_WINDOW - 3600:
+            # About to fall outside recent search; start over within the window
+            since_id = until_id = pending_id = None
+
+        if since_id is None:
+            result = self.client.search_recent(query, max_results=max_results)
+        else:
+            result = self.client.search_recent(
+                query, max_results=self.catch_up_limit, since_id=since_id, until_id=until_id
+            )
+        tweets = result.get("data", [])
+        added = self.store.add(query, tweets)
+        newest_ids = [int(tweet_id) for tweet_id in (pending_id, result["meta"].get("newest_id")) if tweet_id]
+        newest_id = str(max(newest_ids)) if newest_ids else None
+
+        if since_id is not None and result["meta"].get("truncated"):
+            # Tweets between since_id and the oldest stored one are still owed
+            self.store.record_poll(query, None, result["meta"].get("oldest_id") or until_id, newest_id)
+        else:
+            self.store.record_poll(query, newest_id)
+        self.polls += 1
+        self.tweets_downloaded += len(tweets)
+        self.tweets_added += added
+        return added
+
+    def lookup(self, location) -> Dict[str, Any]:
+        """
+        Verification result for a location: polled inline only if its last
+        poll is older than ``max_age``, then answered from the store. Callers
+        racing on a stale query wait for one poll instead of each making one.
+        """
+        query = flood_query(location)
+        self.store.watch(query)
+        if self._is_stale(query):
+            with self._poll_lock(query):
+                if self._is_stale(query):
+                    self.poll(query)
+        return self.store.search_result(query, self.window)
+
+    def poll_watched(self) -> int:
+        """Poll every fixed location and every query verified within ``watch_ttl``."""
+        queries = {flood_query(location) for location in self.fixed_locations}
+        queries.update(self.store.watched(time.time() - self.watch_ttl))
+        added = 0
+        for query in sorted(queries):
+            try:
+                with self._poll_lock(query):
+                    added += self.poll(query)
+            except Exception as e:
+                print(f"❌ Tweet poll failed for {query!r}: {e}")
+        return added
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_watched()
+                self.store.prune(time.time() - SEARCH_WINDOW)
+            except Exception as e:
+                print(f"❌ Tweet polling failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        if self.interval and (self._thread is None or not self._thread.is_alive()):
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="tweet-poller", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "polls": self.polls,
+            "tweets_downloaded": self.tweets_downloaded,
+            "tweets_added": self.tweets_added
+        }
+
+
+_tweet_poller: Optional[IncrementalTweetPoller] = None
+_tweet_poller_lock = threading.Lock()
+
+
+def get_tweet_poller() -> IncrementalTweetPoller:
+    """Return the process-wide poller and store, starting background polling if configured."""
+    global _tweet_poller
+    with _tweet_poller_lock:
+        if _tweet_poller is None:
+            _tweet_poller = IncrementalTweetPoller(
+                get_twitter_client(),
+                TweetStore(Config.TWEET_STORE_PATH),
+                window=Config.TWEET_COUNT_WINDOW,
+                max_age=Config.TWEET_POLL_MAX_AGE,
+                interval=Config.TWEET_POLL_INTERVAL,
+                fixed_locations=[name.strip() for name in Config.TWEET_WATCH_LOCATIONS.split(",") if name.strip()]
+            )
+            _tweet_poller.start()
+        return _tweet_poller
@@ -0,0 +1,415 @@
+"""
+Filtered-stream ingestion of flood tweets.
+
+``TweetStreamConsumer`` keeps one long-lived connection to the filtered-stream
+endpoint, with rules built from the flood keywords and the watched locations.
+It matches each tweet to the locations it mentions, counts it in a rolling
+per-location window (``TweetCounts``) and hands it to subscribers. Report
+verification then reads the count and samples for a location from memory
+instead of running a search.
+
+Reconnects follow the API's guidance: linear backoff from 250 ms for network
+errors (capped at 16 s), exponential from 5 s for HTTP errors (capped at
+320 s) and from 60 s after a 429 (capped at one 15-minute rate-limit window).
+
+``ReplaySource`` plays recorded stream lines from a JSONL file in place of the
+live stream. Set ``TWEET_STREAM_SOURCE`` to ``api`` or to such a file to start
+ingestion with the orchestrator.
+"""
+
+import json
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import requests
+
+from config_setting import Config
+from utils.orchestration.tweet import FLOOD_KEYWORDS, TwitterClient, get_twitter_client
+from utils.weather.gazetteer import get_gazetteer, normalize_location_name
+
+# Longest rule value accepted on the lower API tiers
+MAX_RULE_LENGTH = 512
+WATCHED_CATEGORIES = ("State", "District", "Town")
+
+Subscriber = Callable[[Dict[str, Any], List[str]], None]
+
+# Reconnect backoff: (first delay, cap) in seconds
+NETWORK_BACKOFF = (0.25, 16.0)
+HTTP_BACKOFF = (5.0, 320.0)
+RATE_LIMIT_BACKOFF = (60.0, 900.0)
+
+
+def _phrase(term: str) -> str:
+    return f'"{term}"' if " " in term else term
+
+
+def build_rules(locations: List[str], max_length: int = MAX_RULE_LENGTH) -> List[Dict[str, str]]:
+    """
+    Stream rules matching flood keywords together with any watched location,
+    packing as many locations into each rule as its length limit allows.
+    """
+    prefix = f'({" OR ".join(_phrase(keyword) for keyword in FLOOD_KEYWORDS)}) ('
+    suffix = ") -is:retweet"
+    budget = max_length - len(prefix) - len(suffix)
+
+    groups: List[List[str]] = [[]]
+    for location in sorted(set(locations)):
+        term = _phrase(location)
+        if len(term) > budget:
+            continue
+        if groups[-1] and len(" OR ".join(groups[-1] + [term])) > budget:
+            groups.append([])
+        groups[-1].append(term)
+    return [
+        {"value": f'{prefix}{" OR ".join(group)}{suffix}', "tag": f"flood-locations-{index}"}
+        for index, group in enumerate(groups, 1) if group
+    ]
+
+
+def watched_locations() -> List[str]:
+    """Location names to watch: ``TWEET_WATCH_LOCATIONS``, else the catalog's states, districts and towns."""
+    if Config.TWEET_WATCH_LOCATIONS:
+        return [name.strip() for name in Config.TWEET_WATCH_LOCATIONS.split(",") if name.strip()]
+    return sorted({
+        record["location_name"] for record in get_gazetteer().records
+        if record["category"] in WATCHED_CATEGORIES
+    })
+
+
+class LocationMatcher:
+    """Finds the watched locations a tweet mentions, with one compiled pattern."""
+
+    def __init__(self, locations: Iterable[str]):
+        self.keys = {normalize_location_name(location): location for location in locations}
+        names = sorted(self.keys, key=len, reverse=True)
+        self.pattern = re.compile(r"\b(" + "|".join(re.escape(name) for name in names) + r")\b") if names else None
+
+    def find(self, text: str) -> List[str]:
+        """Normalized keys of the watched locations mentioned in ``text``."""
+        if self.pattern is None or not text:
+            return []
+        return sorted(set(self.pattern.findall(normalize_location_name(text))))
+
+
+class TweetCounts:
+    """Rolling per-location tweet counts and recent samples."""
+
+    def __init__(self, window: float = 6 * 3600, sample_size: int = 10):
+        self.window = window
+        self.sample_size = sample_size
+        # location key -> deque of (received_at, tweet), oldest first
+        self._tweets: Dict[str, deque] = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def _expire(self, key: str, now: float) -> deque:
+        tweets = self._tweets[key]
+        while tweets and tweets[0][0] < now - self.window:
+            tweets.popleft()
+        return tweets
+
+    def add(self, tweet: Dict[str, Any], location_keys: List[str], received_at: Optional[float] = None) -> None:
+        received_at = received_at or time.time()
+        with self._lock:
+            for key in location_keys:
+                self._expire(key, received_at).append((received_at, tweet))
+
+    def count(self, location: str, since: Optional[float] = None) -> int:
+        """Tweets mentioning ``location`` in the window (or since a timestamp)."""
+        key = normalize_location_name(location)
+        with self._lock:
+            if key not in self._tweets:
+                return 0
+            tweets = self._expire(key, time.time())
+            return sum(1 for received_at, _ in tweets if since is None or received_at >= since)
+
+    def search_result(self, locations: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        The first of ``locations`` with tweets in the window, shaped like a
+        recent-search response (newest first), or None when none has any.
+        """
+        now = time.time()
+        with self._lock:
+            for location in locations:
+                key = normalize_location_name(location)
+                if key not in self._tweets:
+                    continue
+                tweets = self._expire(key, now)
+                if not tweets:
+                    continue
+                samples = [tweet for _, tweet in reversed(tweets)][:self.sample_size]
+                return {
+                    "data": samples,
+                    "meta": {"result_count": len(tweets), "newest_id": samples[0].get("id")},
+                    "location": location
+                }
+        return None
+
+
+class Backoff:
+    """Reconnect delays as recommended for the filtered stream."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.network_attempts = 0
+        self.http_attempts = 0
+        self.rate_limit_attempts = 0
+
+    def next_delay(self, error: Exception) -> float:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+        if status == 429:
+            self.rate_limit_attempts += 1
+            first, cap = RATE_LIMIT_BACKOFF
+            return min(first * 2 ** min(self.rate_limit_attempts - 1, 16), cap)
+        if status is not None:
+            self.http_attempts += 1
+            first, cap = HTTP_BACKOFF
+            return min(first * 2 ** min(self.http_attempts - 1, 16), cap)
+        self.network_attempts += 1
+        first, cap = NETWORK_BACKOFF
+        return min(first * self.network_attempts, cap)
+
+
+class ApiStreamSource:
+    """The live filtered stream; syncs the rules before every connection."""
+
+    def __init__(self, client: TwitterClient, rules: List[Dict[str, str]]):
+        self.client = client
+        self.rules = rules
+        self._response: Optional[requests.Response] = None
+
+    def connect(self) -> Iterator[bytes]:
+        self.client.sync_stream_rules(self.rules)
+        self._response = self.client.open_stream()
+        return self._response.iter_lines()
+
+    def close(self) -> None:
+        if self._response is not None:
+            self._response.close()
+
+
+class ReplaySource:
+    """
+    Recorded stream messages (one JSON object per line, as the stream sends
+    them) played back in place of the live stream. With ``speed`` > 0 the
+    gaps between ``created_at`` times are replayed, divided by ``speed``.
+    """
+
+    def __init__(self, path: str, speed: float = 0.0):
+        self.path = path
+        self.speed = speed
+        self.finished = False
+
+    def connect(self) -> Optional[Iterator[bytes]]:
+        """The recorded lines, or None once they have been played to the end."""
+        return None if self.finished else self._lines()
+
+    def _lines(self) -> Iterator[bytes]:
+        previous = None
+        with open(self.path, "rb") as f:
+            for line in f:
+                if self.speed > 0 and line.strip():
+                    created_at = json.loads(line).get("data", {}).get("created_at")
+                    if created_at:
+                        current = datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+                        if previous is not None:
+                            time.sleep(max(0.0, (current - previous).total_seconds()) / self.speed)
+                        previous = current
+                yield line
+        self.finished = True
+
+    def close(self) -> None:
+        pass
+
+
+class TweetStreamConsumer:
+    """Reads a stream source on a daemon thread, counting and dispatching matching tweets."""
+
+    def __init__(self, source, matcher: LocationMatcher, counts: TweetCounts):
+        self.source = source
+        self.matcher = matcher
+        self.counts = counts
+        self.backoff = Backoff()
+        self.received = 0
+        self.matched = 0
+        self.reconnects = 0
+        self.connected = False
+        self._subscribers: List[Subscriber] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: Subscriber) -> Callable[[], None]:
+        """Register a callback for matched tweets. Returns a function that unsubscribes it."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    def handle_line(self, line: bytes) -> Optional[Dict[str, Any]]:
+        """Process one stream line; returns the tweet when it mentions a watched location."""
+        if not line or not line.strip():
+            return None  # keep-alive
+        message = json.loads(line)
+        tweet = message.get("data")
+        if tweet is None:
+            if message.get("errors"):
+                print(f"⚠️ Tweet stream error message: {message['errors']}")
+            return None
+        self.received += 1
+        locations = self.matcher.find(tweet.get("text", ""))
+        if not locations:
+            return None
+        self.matched += 1
+        self.counts.add(tweet, locations)
+
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(tweet, locations)
+            except Exception as e:
+                print(f"❌ Tweet stream subscriber failed: {e}")
+        return tweet
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                lines = self.source.connect()
+            except Exception as e:
+                delay = self.backoff.next_delay(e)
+                print(f"❌ Tweet stream connection failed ({e}); retrying in {delay:.2f}s")
+                self._stop.wait(delay)
+                continue
+
+            if lines is None:
+                break  # a replay has been played to the end
+
+            self.connected = True
+            try:
+                for line in lines:
+                    if self._stop.is_set():
+                        break
+                    try:
+                        self.handle_line(line)
+                    except ValueError as e:
+                        print(f"⚠️ Skipping malformed tweet stream line: {e}")
+                    self.backoff.reset()
+                if not self._stop.is_set() and not getattr(self.source, "finished", False):
+                    # The server closed the connection; back off as for a network error
+                    delay = self.backoff.next_delay(ConnectionError("stream closed by server"))
+                    print(f"⚠️ Tweet stream closed by the server; reconnecting in {delay:.2f}s")
+                    self._stop.wait(delay)
+            except (requests.exceptions.RequestException, OSError) as e:
+                delay = self.backoff.next_delay(e)
+                print(f"⚠️ Tweet stream disconnected ({e}); reconnecting in {delay:.2f}s")
+                self._stop.wait(delay)
+            finally:
+                self.connected = False
+                self.source.close()
+            if not self._stop.is_set() and not getattr(self.source, "finished", False):
+                self.reconnects += 1
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="tweet-stream", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop after the current line; keep-alives bound the wait on an idle stream."""
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected,
+            "received": self.received,
+            "matched": self.matched,
+            "reconnects": self.reconnects
+        }
+
+
+_counts: Optional[TweetCounts] = None
+_consumer: Optional[TweetStreamConsumer] = None
+_module_lock = threading.Lock()
+
+
+def get_tweet_counts() -> TweetCounts:
+    """Return the process-wide per-location tweet counts."""
+    global _counts
+    with _module_lock:
+        if _counts is None:
+            _counts = TweetCounts(window=Config.TWEET_COUNT_WINDOW)
+        return _counts
+
+
+def get_tweet_stream() -> Optional[TweetStreamConsumer]:
+    """The running stream consumer, if ingestion was started."""
+    return _consumer
+
+
+def start_tweet_stream(source: Optional[str] = None) -> Optional[TweetStreamConsumer]:
+    """
+    Start ingesting from ``source`` (``TWEET_STREAM_SOURCE`` by default):
+    ``api`` for the live stream or the path of a replay file. Empty disables it.
+    """
+    global _consumer
+    source = Config.TWEET_STREAM_SOURCE if source is None else source
+    if not source:
+        return None
+    counts = get_tweet_counts()
+    with _module_lock:
+        if _consumer is None:
+            locations = watched_locations()
+            if source == "api":
+                stream_source = ApiStreamSource(get_twitter_client(), build_rules(locations))
+            else:
+                stream_source = ReplaySource(source, speed=Config.TWEET_REPLAY_SPEED)
+            _consumer = TweetStreamConsumer(stream_source, LocationMatcher(locations), counts)
+        _consumer.start()
+        return _consumer
+
+
+def write_replay(path: str, tweets: List[Dict[str, Any]]) -> None:
+    """Record tweets as stream lines (oldest first) for ``ReplaySource``."""
+    ordered = sorted(tweets, key=lambda tweet: int(tweet["id"]))
+    with open(path, "w", encoding="utf-8") as f:
+        for tweet in ordered:
+            f.write(json.dumps({"data": tweet, "matching_rules": [{"tag": "replay"}]}, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from utils.orchestration.twitter_mock import sample_tweets
+
+    parser = argparse.ArgumentParser(description="Ingest flood tweets from the filtered stream or a replay file")
+    parser.add_argument("source", help="'api' or the path of a replay file")
+    parser.add_argument("--record-sample", type=int, default=0, help="First write this many synthetic tweets to the replay file")
+    parser.add_argument("--speed", type=float, default=0.0, help="Replay speed-up; 0 replays as fast as possible")
+    args = parser.parse_args()
+
+    if args.record_sample:
+        write_replay(args.source, sample_tweets(args.record_sample))
+    locations = watched_locations()
+    source = (
+        ApiStreamSource(get_twitter_client(), build_rules(locations)) if args.source == "api"
+        else ReplaySource(args.source, speed=args.speed)
+    )
+    consumer = TweetStreamConsumer(source, LocationMatcher(locations), get_tweet_counts())
+    consumer.start()
+    try:
+        while consumer._thread.is_alive():
+            consumer._thread.join(5)
+            print(f"📡 {consumer.stats()}")
+    except KeyboardInterrupt:
+        consumer.stop()
@@ -0,0 +1,244 @@
+"""
+Local stand-in for the Twitter/X API v2.
+
+Serves ``GET /2/tweets/search/recent`` over a fixed set of synthetic flood
+tweets with ``next_token`` pagination, ``since_id`` / ``until_id`` and the
+``x-rate-limit-*`` headers, returning 429 once a window's requests are spent.
+The filtered stream (``/2/tweets/search/stream`` and its ``/rules``) streams
+the same tweets, oldest first, then sends keep-alives until the client leaves.
+Point the client at it with ``TWITTER_API_BASE_URL=http://127.0.0.1:<port>/2``.
+
+Run from ``mcp/`` with ``python -m utils.orchestration.twitter_mock``.
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from utils.orchestration.tweet_store import TWITTER_EPOCH_MS
+
+SAMPLE_LOCATIONS = ["Kota Bharu", "Pasir Mas", "Kuala Krai", "Shah Alam", "Kuantan", "Johor Bahru", "Kuala Lumpur"]
+SAMPLE_TEXTS = [
+    "Banjir kilat di {location}, air naik paras lutut",
+    "Flood near {location} town centre, road closed",
+    "Jalan ke {location} ditutup sebab banjir",
+    "Heavy rain and flood warning in {location} tonight",
+]
+# Query words that are search operators rather than terms
+OPERATORS = {"or", "and", "-is:retweet", "malaysia"}
+
+
+def sample_tweets(count: int = 200, seed: int = 0) -> List[Dict[str, Any]]:
+    """Synthetic flood tweets, one a minute up to now, newest first, with snowflake ids."""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    tweets = []
+    for index in range(count):
+        location = rng.choice(SAMPLE_LOCATIONS)
+        created_at = now - timedelta(minutes=count - index)
+        tweets.append({
+            "id": str(((int(created_at.timestamp() * 1000) - TWITTER_EPOCH_MS) << 22) + index),
+            "text": rng.choice(SAMPLE_TEXTS).format(location=location),
+            "author_id": str(rng.randint(10_000, 99_999)),
+            "created_at": created_at.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "lang": "ms",
+        })
+    return tweets[::-1]
+
+
+def query_terms(query: str) -> List[List[str]]:
+    """
+    Search terms as groups that must each match: parenthesised OR-groups and
+    bare words. A rough subset of the real query language.
+    """
+    groups = [[term.strip().lower() for term in group.split(" OR ")] for group in re.findall(r"\(([^)]*)\)", query)]
+    rest = re.sub(r"\([^)]*\)", " ", query)
+    groups += [[word.lower()] for word in rest.split() if word.lower() not in OPERATORS]
+    return [[term for term in group if term] for group in groups if group]
+
+
+def matches(tweet: Dict[str, Any], groups: List[List[str]]) -> bool:
+    text = tweet["text"].lower()
+    return all(any(term in text for term in group) for group in groups)
+
+
+class MockTwitterServer:
+    """Threaded HTTP server emulating recent search and its rate limit."""
+
+    def __init__(
+        self,
+        tweets: Optional[List[Dict[str, Any]]] = None,
+        port: int = 0,
+        rate_limit: int = 180,
+        window: float = 900,
+        latency: float = 0.0,
+        stream_interval: float = 0.0,
+    ):
+        self.tweets = tweets if tweets is not None else sample_tweets()
+        self.rate_limit = rate_limit
+        self.window = window
+        self.latency = latency
+        self.stream_interval = stream_interval
+        self.rules: Dict[str, Dict[str, str]] = {}
+        self.stream_connections = 0
+        self._stopping = threading.Event()
+        self.requests = 0
+        self.rejected = 0
+        self._window_start = time.time()
+        self._used = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/2"
+
+    def _take_request(self) -> tuple:
+        """Count a request against the window. Returns (allowed, rate-limit headers)."""
+        with self._lock:
+            now = time.time()
+            if now >= self._window_start + self.window:
+                self._window_start, self._used = now, 0
+            self.requests += 1
+            allowed = self._used < self.rate_limit
+            self._used += allowed
+            self.rejected += not allowed
+            return allowed, {
+                "x-rate-limit-limit": str(self.rate_limit),
+                "x-rate-limit-remaining": str(self.rate_limit - self._used),
+                "x-rate-limit-reset": str(math.ceil(self._window_start + self.window)),
+            }
+
+    def search(self, params: Dict[str, str]) -> Dict[str, Any]:
+        groups = query_terms(params.get("query", ""))
+        since_id = int(params.get("since_id") or 0)
+        until_id = int(params.get("until_id") or 0)
+        found = [
+            tweet for tweet in self.tweets
+            if int(tweet["id"]) > since_id and (not until_id or int(tweet["id"]) < until_id) and matches(tweet, groups)
+        ]
+        offset = int(params.get("next_token") or 0)
+        page_size = int(params.get("max_results") or 10)
+        page = found[offset:offset + page_size]
+
+        meta: Dict[str, Any] = {"result_count": len(page)}
+        body: Dict[str, Any] = {"meta": meta}
+        if page:
+            body["data"] = page
+            meta.update(newest_id=page[0]["id"], oldest_id=page[-1]["id"])
+        if offset + page_size < len(found):
+            meta["next_token"] = str(offset + page_size)
+        return body
+
+    def update_rules(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            for rule_id in body.get("delete", {}).get("ids", []):
+                self.rules.pop(rule_id, None)
+            added = []
+            for rule in body.get("add", []):
+                rule_id = str(len(self.rules) + 1 + int(time.time() * 1000))
+                self.rules[rule_id] = {"id": rule_id, **rule}
+                added.append(self.rules[rule_id])
+        return {"data": added, "meta": {"summary": {"created": len(added)}}}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, status: int, body: Dict[str, Any], headers: Dict[str, str]):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                if not self.headers.get("Authorization", "").startswith("Bearer "):
+                    return self._send(401, {"title": "Unauthorized"}, {})
+                if url.path == "/2/tweets/search/stream/rules":
+                    with server._lock:
+                        rules = list(server.rules.values())
+                    return self._send(200, {"data": rules, "meta": {"result_count": len(rules)}}, {})
+                if url.path == "/2/tweets/search/stream":
+                    return self._stream()
+                if url.path != "/2/tweets/search/recent":
+                    return self._send(404, {"title": "Not Found"}, {})
+
+                allowed, headers = server._take_request()
+                if not allowed:
+                    return self._send(429, {"title": "Too Many Requests"}, headers)
+                if server.latency:
+                    time.sleep(server.latency)
+                self._send(200, server.search(params), headers)
+
+            def do_POST(self):
+                if urlsplit(self.path).path != "/2/tweets/search/stream/rules":
+                    return self._send(404, {"title": "Not Found"}, {})
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                self._send(201, server.update_rules(body), {})
+
+            def _stream(self):
+                with server._lock:
+                    server.stream_connections += 1
+                    tags = [{"id": rule["id"], "tag": rule.get("tag")} for rule in server.rules.values()]
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(b"\r\n")  # keep-alive
+                for tweet in reversed(server.tweets):
+                    message = {"data": tweet, "matching_rules": tags}
+                    self.wfile.write(json.dumps(message).encode() + b"\r\n")
+                    self.wfile.flush()
+                    if server.stream_interval:
+                        time.sleep(server.stream_interval)
+                while not server._stopping.wait(1.0):
+                    try:
+                        self.wfile.write(b"\r\n")
+                        self.wfile.flush()
+                    except OSError:
+                        break
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "MockTwitterServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="twitter-mock", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local mock of the Twitter/X v2 API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tweets", type=int, default=200)
+    parser.add_argument("--rate-limit", type=int, default=180, help="Requests per window")
+    parser.add_argument("--window", type=float, default=900, help="Rate-limit window in seconds")
+    args = parser.parse_args()
+
+    mock = MockTwitterServer(sample_tweets(args.tweets), args.port, args.rate_limit, args.window)
+    print(f"✅ Mock Twitter API at {mock.base_url}")
+    try:
+        mock.httpd.serve_forever()
+    except KeyboardInterrupt:
+        mock.stop()
@@ -0,0 +1,203 @@
+"""
+Flood-warning level transitions.
+
+``WarningTransitionDiffer`` keeps each station's last warning level in memory
+and compares every new feed snapshot against it, emitting one event per station
+whose level changed. Subscribers (the orchestrator, the MCP resource) receive
+only those events, so reacting to a station moving from NORMAL to ALERT or
+DANGER costs work in the number of changed stations, not in the feed or its
+history. Snapshot subscribers (the alert sender) receive each snapshot's
+events as one list instead.
+
+Subscribers run on the thread that called ``update``, often a request
+handler, so anything slow should hand the events off and return.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from config_setting import Config
+from utils.http_client import get_http_client
+from utils.orchestration.flood_warning import FLOOD_WARNING_URL
+
+# Warning levels in increasing severity; unknown indicators rank as NORMAL
+LEVELS = ["NORMAL", "ALERT", "WARNING", "DANGER"]
+LEVEL_FIELDS = ("water_level_indicator", "flood_warning_level", "level")
+
+Subscriber = Callable[[Dict[str, Any]], None]
+SnapshotSubscriber = Callable[[List[Dict[str, Any]]], None]
+
+
+def station_level(station: Dict[str, Any]) -> str:
+    for field in LEVEL_FIELDS:
+        value = station.get(field)
+        if value:
+            level = str(value).strip().upper()
+            return level if level in LEVELS else "NORMAL"
+    return "NORMAL"
+
+
+def level_rank(level: str) -> int:
+    return LEVELS.index(level) if level in LEVELS else 0
+
+
+class WarningTransitionDiffer:
+    """Diffs consecutive warning snapshots and notifies subscribers of level changes."""
+
+    def __init__(self, history_size: int = 500):
+        self.levels: Dict[str, str] = {}
+        self.recent: deque = deque(maxlen=history_size)
+        self._subscribers: List[Subscriber] = []
+        self._snapshot_subscribers: List[SnapshotSubscriber] = []
+        self._last_snapshot: Optional[list] = None
+        self._lock = threading.Lock()
+
+    def _add(self, subscribers: list, callback) -> Callable[[], None]:
+        with self._lock:
+            subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in subscribers:
+                    subscribers.remove(callback)
+        return unsubscribe
+
+    def subscribe(self, callback: Subscriber) -> Callable[[], None]:
+        """Register a callback for transition events. Returns a function that unsubscribes it."""
+        return self._add(self._subscribers, callback)
+
+    def subscribe_snapshot(self, callback: SnapshotSubscriber) -> Callable[[], None]:
+        """
+        Register a callback for all of a snapshot's transition events at once;
+        it is not called for snapshots without transitions. Returns a function
+        that unsubscribes it.
+        """
+        return self._add(self._snapshot_subscribers, callback)
+
+    def update(self, stations: List[Dict[str, Any]], observed_at: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Compare a snapshot (full or filtered) with the known station levels.
+
+        The first level seen for a station seeds its state without an event.
+        Returns the transition events, after delivering them to subscribers.
+        """
+        observed_at = observed_at or time.time()
+        events = []
+        with self._lock:
+            # A revalidated (304) fetch hands back the same payload object
+            if stations is self._last_snapshot:
+                return []
+            self._last_snapshot = stations
+
+            for station in stations:
+                station_id = station.get("station_id")
+                if not station_id:
+                    continue
+                level = station_level(station)
+                previous = self.levels.get(station_id)
+                self.levels[station_id] = level
+                if previous is None or previous == level:
+                    continue
+                events.append({
+                    "station_id": station_id,
+                    "station_name": station.get("station_name"),
+                    "district": station.get("district"),
+                    "state": station.get("state"),
+                    "previous_level": previous,
+                    "level": level,
+                    "escalated": level_rank(level) > level_rank(previous),
+                    "station": station,
+                    "observed_at": observed_at
+                })
+            self.recent.extend(events)
+            subscribers = list(self._subscribers)
+            snapshot_subscribers = list(self._snapshot_subscribers) if events else []
+
+        for event in events:
+            for callback in subscribers:
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f"❌ Warning transition subscriber failed: {e}")
+        for callback in snapshot_subscribers:
+            try:
+                callback(events)
+            except Exception as e:
+                print(f"❌ Warning snapshot subscriber failed: {e}")
+        return events
+
+    def recent_events(
+        self,
+        since: Optional[float] = None,
+        station_ids: Optional[set] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """Most recent transitions first, optionally since a timestamp or for given stations."""
+        with self._lock:
+            events = list(self.recent)
+        events = [
+            event for event in reversed(events)
+            if (since is None or event["observed_at"] >= since)
+            and (station_ids is None or event["station_id"] in station_ids)
+        ]
+        return events[:limit]
+
+
+class WarningPoller:
+    """Polls the flood-warning feed on a daemon thread and feeds the differ."""
+
+    def __init__(self, differ: WarningTransitionDiffer, interval: float):
+        self.differ = differ
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def poll_once(self) -> List[Dict[str, Any]]:
+        return self.differ.update(get_http_client().get_json(FLOOD_WARNING_URL))
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"❌ Flood-warning poll failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="warning-poller", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+_differ: Optional[WarningTransitionDiffer] = None
+_poller: Optional[WarningPoller] = None
+_module_lock = threading.Lock()
+
+
+def get_warning_differ() -> WarningTransitionDiffer:
+    """Return the process-wide transition differ."""
+    global _differ
+    with _module_lock:
+        if _differ is None:
+            _differ = WarningTransitionDiffer()
+        return _differ
+
+
+def start_warning_poller(interval: Optional[float] = None) -> Optional[WarningPoller]:
+    """Start polling the feed into the process-wide differ, unless the interval is 0."""
+    global _poller
+    interval = Config.WARNING_POLL_INTERVAL if interval is None else interval
+    if not interval:
+        return None
+    differ = get_warning_differ()
+    with _module_lock:
+        if _poller is None:
+            _poller = WarningPoller(differ, interval)
+        _poller.start()
+        return _poller
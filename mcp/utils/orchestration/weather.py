@@ -1,43 +1,25 @@
-import requests
+from typing import List, Union
 
-def get_weather(locations: str):
+from utils.orchestration.weather_store import get_weather_store
+
+
+def get_weather(locations: Union[str, List[str]]):
     """
-    Fetch realtime weather for a given location from data.gov.my API.
-    
+    Look up the weather forecast for a location from the local forecast store.
+
+    The store holds the data.gov.my forecast feed and refreshes it at most once
+    per ``WEATHER_REFRESH_INTERVAL``.
+
     Args:
-        location_name (str): Location name (e.g., "Langkawi") or ID (e.g., "Ds001").
-    
+        locations: Location name (e.g., "Langkawi") or ID (e.g., "Ds001"), or a
+            list of them ordered from most specific (town) to broadest (state).
+
     Returns:
-        dict: Weather data for the location, or None if not found.
+        dict: Weather data for the first matching location, or None if not found.
     """
-    url = "https://api.data.gov.my/weather/forecast"
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        print("❌ API request failed:", e)
-        return None
-
-    data = response.json()
-    
-    # Try from most specific (town) to broader (state)
-    for location_name in locations:
-        location_weather = []
-        for entry in data:
-            loc = entry.get("location", {})
-            if (loc.get("location_name", "").lower() == location_name.lower()) or (loc.get("location_id") == location_name):
-                location_weather.append(entry)
-
-        if location_weather:  # Found match
-            location_weather.sort(key=lambda x: x["date"])  # sort by date
-            print(f"✅ Found weather for '{location_name}'")
-            return {
-                "matched_location": location_name,
-                "weather_data": location_weather
-            }
-
-    print(f"⚠️ None of the locations {locations} were found in API response.")
-    return None
+    if isinstance(locations, str):
+        locations = [locations]
+    return get_weather_store().get_weather(locations)
 
 
 # Example usage
@@ -0,0 +1,284 @@
+"""
+Local store of the data.gov.my nationwide weather forecast.
+
+The full ``weather/forecast`` feed is downloaded at most once per refresh
+interval (revalidated with its ETag) and written into a SQLite file in WAL
+mode, indexed by location_id, normalized location name and date, so each
+lookup is an indexed query instead of a full-feed download and scan. Workers
+on the same host share the file; only one of them refreshes per interval.
+
+While the snapshot is stale, lookups ask the API for just the requested
+locations (``ifilter=<name>@location__location_name``, ``date_start``,
+``include`` and ``limit``) and the full refresh runs in the background.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from config_setting import Config
+from utils.http_client import get_http_client
+from utils.weather.gazetteer import get_gazetteer, normalize_location_name
+
+FORECAST_URL = "https://api.data.gov.my/weather/forecast"
+FORECAST_COLUMNS = [
+    "location", "date", "morning_forecast", "afternoon_forecast", "night_forecast",
+    "summary_forecast", "summary_when", "min_temp", "max_temp"
+]
+# Seven days per location, with room for a location name shared by two ids
+MAX_FORECAST_ROWS = 20
+# Past forecast days kept as rainfall history for the flood features
+HISTORY_DAYS = 60
+LOCATION_ID_PATTERN = re.compile(r"^(St|Rc|Ds|Tn|Dv)\d{3}$")
+
+
+class WeatherStore:
+    """SQLite-backed forecast snapshot with a bounded-staleness guarantee."""
+
+    def __init__(self, path: str, refresh_interval: float = 3600, max_staleness: float = 6 * 3600):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self._lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._background_lock = threading.Lock()
+        self._background_refresh: Optional[threading.Thread] = None
+        # Lookups share one connection under the read lock; refreshes write on their own
+        self.conn = self._connect()
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS forecast ("
+            " location_id TEXT NOT NULL, location_name TEXT NOT NULL, name_key TEXT NOT NULL,"
+            " date TEXT NOT NULL, entry TEXT NOT NULL, PRIMARY KEY (location_id, date));"
+            "CREATE INDEX IF NOT EXISTS forecast_name_date ON forecast (name_key, date);"
+            "CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT);"
+        )
+        self.conn.commit()
+        self.writer = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _read(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._read_lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def _meta(self, key: str) -> Optional[str]:
+        rows = self._read("SELECT value FROM store_meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else None
+
+    def age(self) -> float:
+        """Seconds since the last successful refresh (infinite if never refreshed)."""
+        refreshed_at = self._meta("refreshed_at")
+        return time.time() - float(refreshed_at) if refreshed_at else float("inf")
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Download the feed and replace the snapshot if it changed.
+
+        The feed is downloaded and parsed before the write transaction opens,
+        so lookups in other workers are never held behind the download.
+        Returns True if the snapshot is current afterwards.
+        """
+        with self._lock:
+            if not force and self.age() < self.refresh_interval:
+                return True
+            try:
+                response = get_http_client().conditional_get(
+                    FORECAST_URL,
+                    etag=None if force else self._meta("etag"),
+                    timeout=60
+                )
+                rows = None if response.status_code == 304 else self.forecast_rows(response.json())
+            except Exception as e:
+                print("❌ Weather forecast download failed:", e)
+                return False
+
+            # The write lock serializes refreshes across workers; re-check once we hold it
+            conn = self.writer
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                refreshed_at = conn.execute("SELECT value FROM store_meta WHERE key = 'refreshed_at'").fetchone()
+                if not force and refreshed_at and time.time() - float(refreshed_at[0]) < self.refresh_interval:
+                    conn.commit()
+                    return True
+                if rows is not None:
+                    self.load_rows(conn, rows)
+                    conn.execute("INSERT OR REPLACE INTO store_meta VALUES ('etag', ?)", (response.headers.get("ETag", ""),))
+                conn.execute("INSERT OR REPLACE INTO store_meta VALUES ('refreshed_at', ?)", (str(time.time()),))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print("❌ Weather forecast refresh failed:", e)
+                return False
+
+            print(f"✅ Weather store refreshed ({self.count()} forecasts)")
+            return True
+
+    @staticmethod
+    def forecast_rows(entries: List[Dict[str, Any]]) -> List[tuple]:
+        """Table rows for the feed's entries, skipping entries without an id, name or date."""
+        rows = []
+        for entry in entries:
+            loc = entry.get("location", {})
+            if not (loc.get("location_id") and loc.get("location_name") and entry.get("date")):
+                continue
+            rows.append((
+                loc["location_id"],
+                loc["location_name"],
+                normalize_location_name(loc["location_name"]),
+                entry["date"],
+                json.dumps(entry, ensure_ascii=False)
+            ))
+        return rows
+
+    @staticmethod
+    def load_rows(conn: sqlite3.Connection, rows: List[tuple]) -> None:
+        """
+        Replace the forecast from the rows' first date onward (the caller
+        commits). Earlier days are kept as history for ``HISTORY_DAYS``.
+        """
+        if not rows:
+            return
+        first_date = min(row[3] for row in rows)
+        cutoff = (date.fromisoformat(first_date[:10]) - timedelta(days=HISTORY_DAYS)).isoformat()
+        conn.execute("DELETE FROM forecast WHERE date >= ? OR date < ?", (first_date, cutoff))
+        conn.executemany("INSERT OR REPLACE INTO forecast VALUES (?, ?, ?, ?, ?)", rows)
+
+    def ensure_fresh(self) -> bool:
+        """
+        Refresh if the snapshot is older than the refresh interval.
+
+        Returns False only when the snapshot is older than ``max_staleness``
+        and could not be refreshed.
+        """
+        if self.age() < self.refresh_interval:
+            return True
+        if self.refresh():
+            return True
+        return self.age() < self.max_staleness
+
+    def count(self) -> int:
+        return self._read("SELECT COUNT(*) FROM forecast")[0][0]
+
+    def query(self, location: str, start_date: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Forecast entries for a location id or name, ordered by date."""
+        rows = self._read(
+            "SELECT entry FROM forecast WHERE (location_id = ? OR name_key = ?) AND date >= ? ORDER BY date",
+            (location, normalize_location_name(location), start_date or "")
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    def refresh_in_background(self) -> None:
+        """Start a full refresh on a daemon thread unless one is already running."""
+        with self._background_lock:
+            if self._background_refresh and self._background_refresh.is_alive():
+                return
+            self._background_refresh = threading.Thread(target=self.refresh, name="weather-refresh", daemon=True)
+            self._background_refresh.start()
+
+    @staticmethod
+    def _api_names(location: str) -> List[str]:
+        """Catalog spellings to filter on, since the API matches names exactly."""
+        if LOCATION_ID_PATTERN.match(location):
+            return [location]
+        match = get_gazetteer().lookup(location)
+        if match["ambiguous"]:
+            return [location]
+        return list(dict.fromkeys(record["location_name"] for record in match["records"]))
+
+    def query_api(self, location: str, start_date: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Forecast entries for one location, filtered and projected by the API."""
+        client = get_http_client()
+        entries = []
+        for name in self._api_names(location):
+            field = "location__location_id" if LOCATION_ID_PATTERN.match(name) else "location__location_name"
+            params = {
+                "ifilter": f"{name}@{field}",
+                "include": ",".join(FORECAST_COLUMNS),
+                "limit": MAX_FORECAST_ROWS
+            }
+            if start_date:
+                params["date_start"] = f"{start_date}@date"
+            entries.extend(client.get_json(FORECAST_URL, params=params))
+        entries.sort(key=lambda entry: entry.get("date", ""))
+        return entries
+
+    def location_ids(self, location: str) -> List[str]:
+        """Location ids stored under a location id or name, towns before districts."""
+        # Category prefixes sort Tn > St > Rc > Dv > Ds
+        rows = self._read(
+            "SELECT DISTINCT location_id FROM forecast WHERE location_id = ? OR name_key = ? ORDER BY location_id DESC",
+            (location, normalize_location_name(location))
+        )
+        return [row[0] for row in rows]
+
+    def daily_entries(self, location_ids: List[str], start_date: str, end_date: str) -> List[tuple]:
+        """(location_id, date, entry) for many locations over a date range, in one query."""
+        if not location_ids:
+            return []
+        placeholders = ",".join("?" * len(location_ids))
+        rows = self._read(
+            f"SELECT location_id, date, entry FROM forecast "
+            f"WHERE location_id IN ({placeholders}) AND date >= ? AND date <= ?",
+            (*location_ids, start_date, end_date)
+        )
+        return [(location_id, entry_date, json.loads(entry)) for location_id, entry_date, entry in rows]
+
+    def get_weather(self, locations: List[str]) -> Optional[Dict[str, Any]]:
+        """Forecast for the first of ``locations`` (most specific first) the store knows."""
+        if self.age() >= self.refresh_interval:
+            today = date.today().isoformat()
+            try:
+                for location_name in locations:
+                    location_weather = self.query_api(location_name, start_date=today)
+                    if location_weather:
+                        print(f"✅ Found weather for '{location_name}' (filtered API query)")
+                        self.refresh_in_background()
+                        return {
+                            "matched_location": location_name,
+                            "weather_data": location_weather,
+                            "as_of": time.time()
+                        }
+            except Exception as e:
+                print(f"⚠️ Filtered weather query failed ({e}), using the full feed")
+
+        if not self.ensure_fresh():
+            print(f"⚠️ Weather store is older than {self.max_staleness:.0f}s and could not be refreshed.")
+            return None
+
+        today = date.today().isoformat()
+        for location_name in locations:
+            location_weather = self.query(location_name, start_date=today) or self.query(location_name)
+            if location_weather:
+                print(f"✅ Found weather for '{location_name}'")
+                return {
+                    "matched_location": location_name,
+                    "weather_data": location_weather,
+                    "as_of": time.time() - self.age()
+                }
+
+        print(f"⚠️ None of the locations {locations} were found in the weather store.")
+        return None
+
+
+_weather_store: Optional[WeatherStore] = None
+_weather_store_lock = threading.Lock()
+
+
+def get_weather_store() -> WeatherStore:
+    """Return the process-wide weather store."""
+    global _weather_store
+    with _weather_store_lock:
+        if _weather_store is None:
+            _weather_store = WeatherStore(
+                Config.WEATHER_STORE_PATH,
+                refresh_interval=Config.WEATHER_REFRESH_INTERVAL,
+                max_staleness=Config.WEATHER_MAX_STALENESS
+            )
+        return _weather_store
@@ -0,0 +1,280 @@
+"""
+In-process gazetteer over the data.gov.my weather location catalog.
+
+Resolves a free-text place name to the same category fields that
+``classify_location`` returns (town, recreation centre, district, division,
+state) using exact, prefix and fuzzy (character trigram + edit distance)
+matching. Ambiguous or unknown names are left to the LLM.
+"""
+
+import hashlib
+import json
+import re
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+CATALOG_PATH = Path(__file__).parent / "weather_api_locations.json"
+# Indexed artifact written by get_weather_location.py; preferred when present
+ARTIFACT_PATH = Path(__file__).parent / "weather_location_catalog.json"
+
+CATEGORY_FIELDS = {
+    "Town": "town",
+    "Recreation Centre": "recreation_centre",
+    "District": "district",
+    "Division": "division",
+    "State": "state",
+}
+# Same granularity order classify_location uses for ordered_locations
+PRIORITY_ORDER = ["town", "recreation_centre", "district", "division", "state"]
+
+# Common Malay/English abbreviations and spelling variants, applied per token.
+# Keys are multi-character only: single letters ("p", "k", ...) are initials
+# too ambiguous to expand.
+TOKEN_VARIANTS = {
+    "kg": "kampung", "kpg": "kampung", "kampong": "kampung",
+    "sg": "sungai", "sungei": "sungai",
+    "bt": "batu",
+    "bkt": "bukit",
+    "jln": "jalan", "jl": "jalan",
+    "tmn": "taman",
+    "bdr": "bandar",
+    "pt": "parit",
+    "tg": "tanjung", "tanjong": "tanjung",
+    "bharu": "bahru", "baharu": "bahru", "baru": "bahru",
+    "ayer": "air",
+    "seri": "sri",
+    "highlands": "highland",
+}
+
+# Whole-name aliases (after token normalization)
+NAME_ALIASES = {
+    "kl": "kuala lumpur",
+    "jb": "johor bahru",
+    "kb": "kota bahru",
+    "pj": "petaling jaya",
+    "penang": "pulau pinang",
+    "pinang": "pulau pinang",
+    "malacca": "melaka",
+    "negri sembilan": "negeri sembilan",
+    "n9": "negeri sembilan",
+    "alor setar": "alor star",
+    "george town": "georgetown",
+    "genting highland": "tanah tinggi genting",
+    "fraser hill": "bukit fraser",
+    "wilayah persekutuan kuala lumpur": "wp kuala lumpur",
+    "wilayah persekutuan putrajaya": "wp putrajaya",
+    "wilayah persekutuan labuan": "wp labuan",
+}
+
+MIN_PREFIX_LENGTH = 4
+
+# Bump when normalize_location_name changes in a way the tables above do not show
+NORMALIZER_VERSION = 1
+# Stored in the catalog artifact; a prebuilt name table with another value is stale
+NORMALIZER_FINGERPRINT = hashlib.sha256(json.dumps(
+    {"version": NORMALIZER_VERSION, "token_variants": TOKEN_VARIANTS, "name_aliases": NAME_ALIASES},
+    sort_keys=True
+).encode("utf-8")).hexdigest()[:16]
+
+
+def normalize_location_name(name: str) -> str:
+    """Normalize case, accents, punctuation, whitespace and common spelling variants."""
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii").lower()
+    name = re.sub(r"[^a-z0-9]+", " ", name)
+    tokens = [TOKEN_VARIANTS.get(token, token) for token in name.split()]
+    normalized = " ".join(tokens)
+    return NAME_ALIASES.get(normalized, normalized)
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, giving up early once it exceeds ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class Gazetteer:
+    """Indexes catalog records by normalized name, alias and character trigram."""
+
+    def __init__(self, records: List[Dict[str, Any]], by_name: Optional[Dict[str, List[int]]] = None):
+        self.records = records
+        self.by_name: Dict[str, List[int]] = defaultdict(list)
+        self.by_trigram: Dict[str, Set[str]] = defaultdict(set)
+
+        if by_name is not None:
+            self.by_name.update(by_name)
+        else:
+            for index, record in enumerate(records):
+                for key in self._index_keys(record):
+                    self.by_name[key].append(index)
+
+        for key in self.by_name:
+            for trigram in _trigrams(key):
+                self.by_trigram[trigram].add(key)
+        self.sorted_names = sorted(self.by_name)
+
+    @classmethod
+    def from_catalog(cls, path: Path = CATALOG_PATH) -> "Gazetteer":
+        """Load the grouped ``{category: [{location_id, location_name}]}`` catalog."""
+        with open(path, encoding="utf-8") as f:
+            grouped = json.load(f)
+        records = [
+            {**location, "category": category}
+            for category, locations in grouped.items()
+            if category in CATEGORY_FIELDS
+            for location in locations
+        ]
+        return cls(records)
+
+    @classmethod
+    def from_artifact(cls, path: Path = ARTIFACT_PATH) -> "Gazetteer":
+        """
+        Load the indexed catalog artifact, adopting its prebuilt name table
+        unless it was built with a different normalizer.
+        """
+        with open(path, encoding="utf-8") as f:
+            artifact = json.load(f)
+        records = artifact["records"]
+        if artifact.get("normalizer") != NORMALIZER_FINGERPRINT:
+            print("⚠️ Catalog artifact was indexed with a different normalizer; re-indexing names")
+            return cls([record for record in records if record["category"] in CATEGORY_FIELDS])
+        by_name = {
+            key: [index for index in indexes if records[index]["category"] in CATEGORY_FIELDS]
+            for key, indexes in artifact["by_name"].items()
+        }
+        return cls(records, {key: indexes for key, indexes in by_name.items() if indexes})
+
+    @staticmethod
+    def _index_keys(record: Dict[str, Any]) -> Set[str]:
+        key = normalize_location_name(record["location_name"])
+        keys = {key}
+        # "WP Kuala Lumpur" is also reachable as "Kuala Lumpur"
+        if record["category"] == "State" and key.startswith("wp "):
+            keys.add(key[3:])
+        return keys
+
+    def _match_keys(self, query: str) -> tuple[List[str], str]:
+        """Return the catalog keys matching a normalized query and the match kind."""
+        if query in self.by_name:
+            return [query], "exact"
+
+        if len(query) >= MIN_PREFIX_LENGTH:
+            prefixed = [key for key in self.sorted_names if key.startswith(query)]
+            if prefixed:
+                return prefixed, "prefix"
+
+        limit = max(1, len(query) // 5)
+        query_trigrams = _trigrams(query)
+        shared: Dict[str, int] = defaultdict(int)
+        for trigram in query_trigrams:
+            for key in self.by_trigram.get(trigram, ()):
+                shared[key] += 1
+        candidates = [key for key, count in shared.items() if count * 2 >= len(query_trigrams)]
+
+        scored = [(key, _edit_distance(query, key, limit)) for key in candidates]
+        scored = [(key, distance) for key, distance in scored if distance <= limit]
+        if not scored:
+            return [], "none"
+        best = min(distance for _, distance in scored)
+        return [key for key, distance in scored if distance == best], "fuzzy"
+
+    def lookup(self, location: str) -> Dict[str, Any]:
+        """
+        Match a place name against the catalog.
+
+        Returns ``{"kind", "ambiguous", "records"}`` where kind is one of
+        exact/prefix/fuzzy/none; a match is ambiguous when it is missing,
+        non-exact matching resolves to more than one distinct name, or the
+        name belongs to more than one place of the same category.
+        """
+        query = normalize_location_name(location)
+        keys, kind = self._match_keys(query) if query else ([], "none")
+        records = [self.records[index] for key in keys for index in self.by_name[key]]
+        categories = [record["category"] for record in records]
+        return {
+            "kind": kind,
+            "ambiguous": (
+                not records
+                or (kind != "exact" and len(keys) > 1)
+                or len(set(categories)) < len(categories)
+            ),
+            "records": records
+        }
+
+    def classify(self, location: str) -> Optional[Dict[str, Any]]:
+        """
+        Resolve a place name into the ``classify_location`` result structure.
+
+        Returns None when the match is ambiguous or missing so the caller can
+        fall back to the LLM.
+        """
+        match = self.lookup(location)
+        if match["ambiguous"]:
+            # "Shah Alam, Selangor": accept only if every part resolves on its own
+            parts = [part for part in location.split(",") if part.strip()]
+            if len(parts) < 2:
+                return None
+            matches = [self.lookup(part) for part in parts]
+            if any(part_match["ambiguous"] for part_match in matches):
+                return None
+            match = {
+                "kind": "+".join(part_match["kind"] for part_match in matches),
+                "records": [record for part_match in matches for record in part_match["records"]]
+            }
+
+        fields: Dict[str, Optional[str]] = {field: None for field in PRIORITY_ORDER}
+        for record in match["records"]:
+            field = CATEGORY_FIELDS[record["category"]]
+            fields[field] = fields[field] or record["location_name"]
+
+        ordered_locations = []
+        for field in PRIORITY_ORDER:
+            if fields[field] and fields[field] not in ordered_locations:
+                ordered_locations.append(fields[field])
+
+        return {
+            **fields,
+            "ordered_locations": ordered_locations,
+            "location_ids": [record["location_id"] for record in match["records"]],
+            "match_type": match["kind"],
+            "raw_response": None
+        }
+
+
+@lru_cache(maxsize=1)
+def get_gazetteer() -> Gazetteer:
+    """Return the process-wide gazetteer, built from the catalog on first use."""
+    if ARTIFACT_PATH.exists():
+        return Gazetteer.from_artifact()
+    return Gazetteer.from_catalog()
+
+
+if __name__ == "__main__":
+    import time
+
+    gazetteer = get_gazetteer()
+    for name in ["Johor Bahru", "JB", "kota bahru", "Kuala Teren", "Sungai Petani", "Cameron Highlands", "Mid Valley"]:
+        started = time.perf_counter()
+        result = gazetteer.classify(name)
+        elapsed = (time.perf_counter() - started) * 1e6
+        print(f"{name!r}: {result['ordered_locations'] if result else 'ambiguous -> LLM'} ({elapsed:.0f} µs)")
@@ -1,55 +1,227 @@
-import requests
+"""
+Builds the weather location catalog from the data.gov.my forecast feed.
+
+The feed is fetched conditionally (ETag / Last-Modified from the previous
+build), locations added or removed since that build are reported, and the
+result is written as a compact, versioned artifact with prebuilt lookup
+tables so resolvers can load it without re-walking or re-normalizing:
+
+    {
+      "version", "built_at", "content_hash", "normalizer", "source": {"url", "etag", "last_modified"},
+      "records":     [{"location_id", "location_name", "category"}, ...],
+      "by_id":       {location_id: record index},
+      "by_name":     {normalized name: [record index, ...]},
+      "by_category": {category: [record index, ...]}
+    }
+
+The grouped ``weather_api_locations.json`` is still written for existing readers.
+
+Run from ``mcp/`` with ``python -m utils.weather.get_weather_location``; pass
+``--from-file`` to rebuild the artifact offline from the grouped JSON.
+"""
+
+import argparse
+import hashlib
 import json
+import os
 from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import requests
+
+from utils.http_client import get_http_client
+from utils.weather.gazetteer import NORMALIZER_FINGERPRINT, Gazetteer
+
+FORECAST_URL = "https://api.data.gov.my/weather/forecast"
+WEATHER_DIR = Path(__file__).parent
+ARTIFACT_PATH = WEATHER_DIR / "weather_location_catalog.json"
+GROUPED_PATH = WEATHER_DIR / "weather_api_locations.json"
+ARTIFACT_FORMAT = 1
 
-# Example: call the weather forecast endpoint
-url = "https://api.data.gov.my/weather/forecast"
-response = requests.get(url)
+# location_id prefix -> category
+CATEGORY_PREFIXES = {
+    "St": "State",
+    "Rc": "Recreation Centre",
+    "Ds": "District",
+    "Tn": "Town",
+    "Dv": "Division",
+}
 
-if response.status_code == 200:
-    data = response.json()
 
-    # Dictionary of categories -> dict of unique locations
-    categories = defaultdict(dict)
+def categorize(location_id: str) -> str:
+    return CATEGORY_PREFIXES.get(location_id[:2], "Other")
 
-    for entry in data:
+
+def extract_locations(entries: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Distinct locations in a forecast feed, sorted by id."""
+    locations = {}
+    for entry in entries:
         loc = entry.get("location", {})
         loc_id = loc.get("location_id")
         loc_name = loc.get("location_name")
-
         if not (loc_id and loc_name):
             continue
-
-        # Detect category based on prefix
-        if loc_id.startswith("St"):
-            cat = "State"
-        elif loc_id.startswith("Rc"):
-            cat = "Recreation Centre"
-        elif loc_id.startswith("Ds"):
-            cat = "District"
-        elif loc_id.startswith("Tn"):
-            cat = "Town"
-        elif loc_id.startswith("Dv"):
-            cat = "Division"
-        else:
-            cat = "Other"
-
-        # Deduplicate: use loc_id+name as unique key
-        categories[cat][loc_id + "_" + loc_name] = {
+        locations[(loc_id, loc_name)] = {
             "location_id": loc_id,
-            "location_name": loc_name
+            "location_name": loc_name,
+            "category": categorize(loc_id)
         }
+    return [locations[key] for key in sorted(locations)]
+
+
+def load_artifact(path: Path = ARTIFACT_PATH) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        artifact = json.load(f)
+    return artifact if artifact.get("format") == ARTIFACT_FORMAT else None
+
+
+def build_artifact(
+    records: List[Dict[str, Any]],
+    previous: Optional[Dict[str, Any]] = None,
+    source: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Index the records; the version only moves when the location set changes."""
+    content_hash = hashlib.sha256(
+        json.dumps(records, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()[:16]
+    version = 1
+    if previous:
+        version = previous["version"] + (previous["content_hash"] != content_hash)
+
+    by_name: Dict[str, List[int]] = defaultdict(list)
+    by_category: Dict[str, List[int]] = defaultdict(list)
+    for index, record in enumerate(records):
+        # Same keys the gazetteer indexes, so it can adopt this table as-is
+        for key in sorted(Gazetteer._index_keys(record)):
+            by_name[key].append(index)
+        by_category[record["category"]].append(index)
 
-    # Convert to JSON-serializable dict (list of dicts for each category)
-    grouped_locations = {
-        cat: list(locations.values())
-        for cat, locations in categories.items()
+    return {
+        "format": ARTIFACT_FORMAT,
+        "version": version,
+        "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "content_hash": content_hash,
+        "normalizer": NORMALIZER_FINGERPRINT,
+        "source": source or {},
+        "records": records,
+        "by_id": {record["location_id"]: index for index, record in enumerate(records)},
+        "by_name": dict(by_name),
+        "by_category": dict(by_category)
     }
 
-    # Save into JSON file
-    with open("weather_api_locations.json", "w", encoding="utf-8") as f:
-        json.dump(grouped_locations, f, ensure_ascii=False, indent=4)
 
-    print("✅ locations.json file has been created with distinct locations.")
-else:
-    print("❌ Failed to fetch API:", response.status_code)
+def diff_records(previous: Optional[Dict[str, Any]], records: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Locations added, removed or renamed relative to the previous artifact."""
+    old = {record["location_id"]: record for record in (previous or {}).get("records", [])}
+    new = {record["location_id"]: record for record in records}
+    return {
+        "added": [new[loc_id] for loc_id in sorted(new.keys() - old.keys())],
+        "removed": [old[loc_id] for loc_id in sorted(old.keys() - new.keys())],
+        "renamed": [
+            new[loc_id] for loc_id in sorted(new.keys() & old.keys())
+            if new[loc_id]["location_name"] != old[loc_id]["location_name"]
+        ]
+    }
+
+
+def _write_json(path: Path, data: Any, **kwargs) -> None:
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, **kwargs)
+    os.replace(tmp_path, path)
+
+
+def write_catalog(artifact: Dict[str, Any], artifact_path: Path = ARTIFACT_PATH, grouped_path: Path = GROUPED_PATH) -> None:
+    """Atomically write the compact artifact and the grouped JSON."""
+    _write_json(artifact_path, artifact, separators=(",", ":"))
+
+    grouped: Dict[str, List[Dict[str, str]]] = defaultdict(list)
+    for record in artifact["records"]:
+        grouped[record["category"]].append(
+            {"location_id": record["location_id"], "location_name": record["location_name"]}
+        )
+    _write_json(grouped_path, grouped, indent=4)
+
+
+def records_from_grouped(path: Path = GROUPED_PATH) -> List[Dict[str, Any]]:
+    """Records from the grouped ``{category: [...]}`` JSON, for offline bootstrap."""
+    with open(path, encoding="utf-8") as f:
+        grouped = json.load(f)
+    records = [
+        {"location_id": location["location_id"], "location_name": location["location_name"], "category": category}
+        for category, locations in grouped.items()
+        for location in locations
+    ]
+    return sorted(records, key=lambda record: (record["location_id"], record["location_name"]))
+
+
+def fetch_forecast(previous: Optional[Dict[str, Any]], timeout: float = 30.0) -> Optional[tuple[list, Dict[str, Any]]]:
+    """
+    Fetch the forecast feed, revalidating against the previous build.
+
+    Returns None when the server reports the feed unchanged (304).
+    """
+    source = (previous or {}).get("source", {})
+    response = get_http_client().conditional_get(
+        FORECAST_URL,
+        etag=source.get("etag"),
+        last_modified=source.get("last_modified"),
+        timeout=timeout
+    )
+    if response.status_code == 304:
+        return None
+    return response.json(), {
+        "url": FORECAST_URL,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified")
+    }
+
+
+def build_catalog(from_file: bool = False, force: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Rebuild the catalog artifact if the source or the name normalizer changed.
+    Returns the diff, or None if unchanged.
+    """
+    previous = load_artifact()
+    if from_file:
+        records, source = records_from_grouped(), (previous or {}).get("source", {})
+    else:
+        fetched = fetch_forecast(None if force else previous)
+        if fetched is None:
+            if previous.get("normalizer") == NORMALIZER_FINGERPRINT:
+                print(f"✅ Forecast feed unchanged; catalog v{previous['version']} is current.")
+                return None
+            # Same locations, but the name table was built with another normalizer
+            records, source = previous["records"], previous["source"]
+        else:
+            entries, source = fetched
+            records = extract_locations(entries)
+
+    artifact = build_artifact(records, previous, source)
+    changes = diff_records(previous, records)
+    write_catalog(artifact)
+
+    print(
+        f"✅ Catalog v{artifact['version']} written with {len(records)} locations "
+        f"(+{len(changes['added'])} / -{len(changes['removed'])} / ~{len(changes['renamed'])})."
+    )
+    for kind in ("added", "removed", "renamed"):
+        for record in changes[kind] if previous else []:
+            print(f"   {kind}: {record['location_id']} {record['location_name']}")
+    return changes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the weather location catalog")
+    parser.add_argument("--from-file", action="store_true", help="Rebuild offline from weather_api_locations.json")
+    parser.add_argument("--force", action="store_true", help="Skip the conditional request")
+    args = parser.parse_args()
+
+    try:
+        build_catalog(from_file=args.from_file, force=args.force)
+    except requests.RequestException as e:
+        print("❌ Failed to fetch API:", e)